@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
 from flask import Flask, request, jsonify
-import logging, os, requests
-from dateutil import parser as dateparser
-from app_config import MY_SECRET, BOT_TOKEN, VADIM_CHAT_ID, ASSISTANT_CHAT_IDS
-from db import insert_task, add_or_update_assignee
+import logging, os, io, json, time, hashlib, threading, requests
+from html import escape as h
+from app_config import (
+    MY_SECRET, BOT_TOKEN, VADIM_CHAT_ID, ASSISTANT_CHAT_IDS, IDEMPOTENCY_TTL_H,
+    TRANSCRIPT_LLM_WORKERS, TRANSCRIPT_CHUNK_TOKENS, TRANSCRIPT_OVERLAP_TOKENS,
+)
+from db import (
+    insert_task_idempotent, insert_tasks_bulk, add_or_update_assignee, list_unique_assignees,
+    get_task_signature, list_tasks_page, get_reassignments_for_task, get_deadline_changes_for_task,
+    get_data_version, get_change_cursor, get_changes_since,
+)
+from transcripts import extract_transcript_tasks
+from deadlines import parse_deadline, today_local
 
 LOG_FILE = os.path.join(os.path.dirname(__file__), "api.log")
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
@@ -15,7 +24,7 @@ TG_API = f"https://api.telegram.org/bot{BOT_TOKEN}"
 
 from zoneinfo import ZoneInfo
 from datetime import datetime, timedelta, timezone
-from db import enqueue_outbox
+from db import enqueue_outbox_many, claim_due_outbox, mark_outbox_sent, defer_outbox
 from app_config import TZ
 
 TZINFO = ZoneInfo(TZ)
@@ -42,68 +51,132 @@ def _next_work_morning(dt_local):
     return d.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
 import re
-from datetime import date as _date
 
 ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
 def norm_deadline(s: str) -> str:
-    s = (s or "").strip()
-    if not s:
-        return ""
-    try:
-        if ISO_DATE_RE.match(s):
-            y, m, d = map(int, s.split("-"))
-            _ = _date(y, m, d)  # валидация
-            cand = s
-        else:
-            dtt = dateparser.parse(s, dayfirst=True, fuzzy=True)
-            if not dtt:
-                return ""
-            cand = dtt.strftime("%Y-%m-%d")
+    """Дедлайн из Zapier/LLM → 'YYYY-MM-DD'; нераспознанный или в прошлом — пусто."""
+    today = today_local()
+    cand = parse_deadline(s, today)
+    if not cand or cand < today.strftime("%Y-%m-%d"):
+        return ""  # в прошлом — не принимаем
+    return cand
 
-        today = datetime.now(ZoneInfo(TZ)).date()
-        y, m, d = map(int, cand.split("-"))
-        if _date(y, m, d) < today:
-            return ""  # в прошлом — не принимаем
-        return cand
-    except Exception:
-        return ""
 
-
-def notify_assistant_proposed(task_id: int, task_text: str, assignee: str, deadline: str, priority: str):
+def proposed_outbox_items(task_id: int, task_text: str, assignee: str, deadline: str, priority: str):
+    """Уведомления помощникам о новой задаче — строки outbox (пишутся вместе с задачей)."""
     pr = "Важная 🔥" if (priority or "normal") == "high" else "Обычная"
     txt = (
         "Обнаружена задача — нужно подтвердить\n\n"
-        f"🧩 Описание: {task_text}\n"
-        f"🤡 Исполнитель: {assignee or '—'}\n"
-        f"📅 Дедлайн: {deadline or '—'}\n"
+        f"🧩 Описание: {h(task_text)}\n"
+        f"🤡 Исполнитель: {h(assignee or '—')}\n"
+        f"📅 Дедлайн: {h(deadline or '—')}\n"
         f"❗️ Приоритет: {pr}\n\n"
         f"ID: #{task_id}\n\n"
         "Введите команду /checktasks, чтобы подтвердить и отправить в работу"
     )
+    return _assistant_outbox_items(txt)
+
+MEETING_NOTIFY_MAX_LINES = 30  # длиннее — «…и ещё N», чтобы уложиться в лимит Telegram
+
+def notify_assistant_meeting(meeting_id: str, meeting_title: str, created: list[tuple[int, dict]]):
+    """Одно сводное уведомление на пачку задач со встречи вместо N отдельных."""
+    title = h(meeting_title or meeting_id or "—")
+    lines = [f"Обнаружено задач со встречи «{title}»: {len(created)} — нужно подтвердить", ""]
+    for task_id, it in created[:MEETING_NOTIFY_MAX_LINES]:
+        pr = " 🔥" if (it.get("priority") or "normal") == "high" else ""
+        text = it["task"] if len(it["task"]) <= 120 else it["task"][:119] + "…"
+        lines.append(f"#{task_id}{pr} {h(text)} — {h(it.get('assignee') or '—')}, {h(it.get('deadline') or '—')}")
+    if len(created) > MEETING_NOTIFY_MAX_LINES:
+        lines.append(f"…и ещё {len(created) - MEETING_NOTIFY_MAX_LINES}")
+    lines += ["", "Введите команду /checktasks, чтобы подтвердить и отправить в работу"]
+    _notify_assistants("\n".join(lines), f"meeting {meeting_id}")
+
+def _assistant_outbox_items(txt: str):
     now = datetime.now(TZINFO)
     if _in_task_alert_window(now):
-        # слать сразу
-        for chat_id in ASSISTANT_CHAT_IDS:
-            try:
-                r = requests.post(
-                    f"{TG_API}/sendMessage",
-                    json={"chat_id": str(chat_id), "text": txt},
-                    timeout=15,
-                )
-                if not r.ok:
-                    log.error("notify_assistant_proposed -> %s for %s: %s", r.status_code, chat_id, r.text[:300])
-            except Exception as e:
-                log.error("notify_assistant_proposed failed for %s: %s", chat_id, e)
+        # слать сразу — но не из запроса: кладём в outbox «на сейчас», отправит фоновый sender
+        not_before = now.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
     else:
         # положить в outbox до 09:00 ближайшего рабочего дня
         not_before = _next_work_morning(now)
-        for chat_id in ASSISTANT_CHAT_IDS:
-            try:
-                enqueue_outbox(str(chat_id), txt, None, not_before)
-            except Exception as e:
-                log.error("enqueue_outbox failed for %s: %s", chat_id, e)
+    return [(str(chat_id), txt, None, not_before) for chat_id in ASSISTANT_CHAT_IDS]
+
+def _notify_assistants(txt: str, what: str):
+    try:
+        enqueue_outbox_many(_assistant_outbox_items(txt))
+    except Exception as e:
+        log.error("enqueue_outbox failed for %s: %s", what, e)
+        return
+    _outbox_wakeup.set()
 
+# --------------------------------------------------------------------------------
+# Фоновый отправитель outbox: Telegram не держит HTTP-запрос Zapier'а.
+# Строки забираем через claim_due_outbox (аренда), поэтому несколько воркеров
+# и почасовой scheduler не шлют одно и то же дважды.
+# --------------------------------------------------------------------------------
+OUTBOX_POLL_S = 5.0       # страховочный опрос (отложенные «до утра», ретраи)
+OUTBOX_LEASE_S = 60       # не отправили — через столько секунд попробуем снова
+
+_outbox_wakeup = threading.Event()
+_outbox_thread = None
+_outbox_lock = threading.Lock()
+
+def _send_outbox_row(row) -> bool:
+    """
+    True — сообщение обработано (отправлено или отклонено навсегда), False — ретрай позже.
+    Payload как у scheduler.send: outbox общий, строку может отправить любой из двух.
+    """
+    payload = {
+        "chat_id": str(row["chat_id"]),
+        "text": row["text"],
+        "disable_web_page_preview": True,
+        "parse_mode": "HTML",
+    }
+    if row["markup"]:
+        try:
+            payload["reply_markup"] = json.loads(row["markup"])
+        except Exception:
+            pass
+    try:
+        r = requests.post(f"{TG_API}/sendMessage", json=payload, timeout=15)
+    except Exception as e:
+        log.error("outbox send failed for %s: %s", row["chat_id"], e)
+        return False
+    if r.ok:
+        return True
+    log.error("outbox send -> %s for %s: %s", r.status_code, row["chat_id"], r.text[:300])
+    if r.status_code == 429:
+        # Telegram сам говорит, когда можно снова — откладываем строку ровно на retry_after, а не на аренду
+        try:
+            retry = int(r.json().get("parameters", {}).get("retry_after", 1))
+        except Exception:
+            retry = 1
+        not_before = (datetime.now(timezone.utc) + timedelta(seconds=retry + 1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        defer_outbox(row["id"], not_before)
+        return False
+    # 5xx — временное, остальное (чат не найден, бот заблокирован) повторять бессмысленно
+    return not r.status_code >= 500
+
+def _outbox_loop():
+    while True:
+        _outbox_wakeup.wait(OUTBOX_POLL_S)
+        _outbox_wakeup.clear()
+        try:
+            now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            for row in claim_due_outbox(now_utc, lease_s=OUTBOX_LEASE_S):
+                if _send_outbox_row(row):
+                    mark_outbox_sent(row["id"])
+        except Exception as e:
+            log.error("outbox sender error: %s", e)
+
+def start_outbox_sender():
+    """Запускает фоновый поток один раз на процесс (вызывается лениво из обработчика и из __main__)."""
+    global _outbox_thread
+    with _outbox_lock:
+        if _outbox_thread is None or not _outbox_thread.is_alive():
+            _outbox_thread = threading.Thread(target=_outbox_loop, name="outbox-sender", daemon=True)
+            _outbox_thread.start()
 
 
 @app.post("/zap/new_task")
@@ -126,14 +199,332 @@ def zap_new_task():
     if assignee and telegram_id:
         add_or_update_assignee(assignee, telegram_id)
 
-    # КЛЮЧЕВОЕ: создаём "proposed" — всегда через помощника
-    task_id = insert_task(
+    # КЛЮЧЕВОЕ: создаём "proposed" — всегда через помощника.
+    # Ретрай Zapier с тем же ключом вернёт прежний task_id без вставки и без уведомления.
+    # Уведомления пишутся в outbox той же транзакцией, что и задача.
+    key = _idempotency_key(payload)
+    task_id, created = insert_task_idempotent(
+        key, IDEMPOTENCY_TTL_H * 3600,
         task, assignee or "", telegram_id or "", deadline,
-        priority=priority, source="api", status="proposed"
+        priority=priority, source="api", status="proposed",
+        outbox=lambda tid: proposed_outbox_items(tid, task, assignee, deadline, priority),
     )
+    if not created:
+        log.info("ZAP duplicate (%s) -> task %s", key, task_id)
+        return jsonify({"status": "ok", "task_id": task_id, "duplicate": True}), 202
+
+    # отправка — в фоне; ответ не ждёт Telegram
+    start_outbox_sender()
+    _outbox_wakeup.set()
+    return jsonify({"status": "ok", "task_id": task_id}), 202
+
+# --------------------------------------------------------------------------------
+# Идемпотентность: заголовок Idempotency-Key или поле idempotency_key в payload,
+# иначе — хэш содержимого (сырые поля без секрета: ретрай шлёт ровно то же самое).
+# --------------------------------------------------------------------------------
+_IDEM_SKIP_FIELDS = {"SECRET_KEY", "idempotency_key"}
+
+def _content_hash(obj) -> str:
+    if isinstance(obj, dict):
+        obj = {k: v for k, v in obj.items() if k not in _IDEM_SKIP_FIELDS}
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _explicit_key(payload: dict) -> str:
+    return (request.headers.get("Idempotency-Key") or str(payload.get("idempotency_key") or "")).strip()
+
+def _idempotency_key(payload: dict) -> str:
+    key = _explicit_key(payload)
+    return f"task:{key}" if key else f"hash:{_content_hash(payload)}"
+
+def _bulk_idempotency_keys(payload: dict, raw_items: list) -> list[str]:
+    """Ключ на каждый элемент пачки: ключ запроса + индекс, свой ключ элемента или хэш (встреча + элемент)."""
+    batch_key = _explicit_key(payload)
+    meeting_id = str(payload.get("meeting_id") or "")
+    keys = []
+    for idx, raw in enumerate(raw_items):
+        own = str(raw.get("idempotency_key") or "").strip() if isinstance(raw, dict) else ""
+        if own:
+            keys.append(f"task:{own}")
+        elif batch_key:
+            keys.append(f"bulk:{batch_key}:{idx}")
+        else:
+            keys.append(f"hash:{_content_hash({'meeting_id': meeting_id, 'item': raw})}")
+    return keys
+
+BULK_MAX_TASKS = 200
+
+ZAP_PRIORITIES = ("normal", "high")
+
+def _parse_zap_item(raw) -> tuple[dict | None, str | None]:
+    """Нормализация одной задачи из payload → (item, None) или (None, ошибка)."""
+    if not isinstance(raw, dict):
+        return None, "item must be an object"
+    # ошибка типа в одном элементе — ошибка этого элемента, а не 500 на всю пачку
+    for field in ("task", "assignee", "deadline", "priority"):
+        if raw.get(field) is not None and not isinstance(raw[field], str):
+            return None, f"{field} must be a string"
+    task = (raw.get("task") or "").strip()
+    if not task:
+        return None, "missing task"
+    priority = (raw.get("priority") or "normal").strip().lower()
+    if priority not in ZAP_PRIORITIES:
+        return None, f"priority must be one of: {', '.join(ZAP_PRIORITIES)}"
+    return {
+        "task": task,
+        "assignee": (raw.get("assignee") or "").strip(),
+        "telegram_id": str(raw.get("telegram_id") or "").strip(),
+        "deadline": norm_deadline((raw.get("deadline") or "").strip()),
+        "priority": priority,
+    }, None
+
+@app.post("/zap/new_tasks")
+def zap_new_tasks():
+    """
+    Пачка задач с одной встречи: {"SECRET_KEY", "meeting_id", "meeting_title"?, "tasks": [ {...}, ... ]}.
+    Всё валидное — одной транзакцией (insert_tasks_bulk), одно сводное уведомление помощникам.
+    Ответ: по элементу на каждую входную задачу — {"index", "task_id"} или {"index", "error"}.
+    """
+    payload = request.get_json(silent=True) or {}
+    log.info("ZAP bulk payload: meeting=%s items=%s", payload.get("meeting_id"), len(payload.get("tasks") or []))
+    if payload.get("SECRET_KEY") != MY_SECRET:
+        return jsonify({"error": "unauthorized"}), 401
+
+    raw_items = payload.get("tasks")
+    if not isinstance(raw_items, list) or not raw_items:
+        return jsonify({"error": "missing tasks"}), 400
+    if len(raw_items) > BULK_MAX_TASKS:
+        return jsonify({"error": f"too many tasks (max {BULK_MAX_TASKS})"}), 413
+
+    meeting_id = str(payload.get("meeting_id") or "").strip()
+    meeting_title = str(payload.get("meeting_title") or "").strip()
+
+    results: list[dict] = [{} for _ in raw_items]
+    valid: list[tuple[int, dict]] = []
+    for idx, raw in enumerate(raw_items):
+        item, err = _parse_zap_item(raw)
+        if err:
+            results[idx] = {"index": idx, "error": err}
+        else:
+            valid.append((idx, item))
+
+    created: list[tuple[int, dict]] = []
+    duplicates = 0
+    if valid:
+        keys = _bulk_idempotency_keys(payload, raw_items)
+        out = insert_tasks_bulk(
+            [it for _, it in valid], source="api", status="proposed", meeting_id=meeting_id,
+            keys=[keys[idx] for idx, _ in valid], key_ttl_s=IDEMPOTENCY_TTL_H * 3600,
+        )
+        for (idx, item), (task_id, is_new) in zip(valid, out):
+            if is_new:
+                results[idx] = {"index": idx, "task_id": task_id}
+                created.append((task_id, item))
+            else:
+                results[idx] = {"index": idx, "task_id": task_id, "duplicate": True}
+                duplicates += 1
+        if created:
+            start_outbox_sender()
+            notify_assistant_meeting(meeting_id, meeting_title, created)
+
+    return jsonify({
+        "status": "ok",
+        "meeting_id": meeting_id,
+        "created": len(created),
+        "duplicates": duplicates,
+        "failed": len(raw_items) - len(valid),
+        "results": results,
+    }), 202
+
+@app.post("/zap/transcript")
+def zap_transcript():
+    """
+    Сырая расшифровка встречи → proposed-задачи.
+    Два формата:
+      - application/json: {"SECRET_KEY", "transcript", "meeting_id", "meeting_title"?, "meeting_date"?};
+      - text/plain (потоково, тело читается построчно): секрет в заголовке X-Secret-Key,
+        meeting_id / meeting_title / meeting_date — в query string.
+    Ответ: задачи (как у /zap/new_tasks) + время по стадиям конвейера.
+    """
+    t_total = time.perf_counter()
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        secret = payload.get("SECRET_KEY")
+        lines = io.StringIO(str(payload.get("transcript") or ""))
+    else:
+        payload = request.args
+        secret = request.headers.get("X-Secret-Key")
+        lines = io.TextIOWrapper(request.stream, encoding=request.mimetype_params.get("charset") or "utf-8", errors="replace")
+    if secret != MY_SECRET:
+        return jsonify({"error": "unauthorized"}), 401
+
+    meeting_id = str(payload.get("meeting_id") or "").strip()
+    meeting_title = str(payload.get("meeting_title") or "").strip()
+    meeting_date = str(payload.get("meeting_date") or "").strip() or datetime.now(TZINFO).strftime("%Y-%m-%d")
+    log.info("ZAP transcript: meeting=%s", meeting_id)
+
+    people = {n: (tid or "") for n, tid in list_unique_assignees()}
+    tasks, stats = extract_transcript_tasks(
+        lines, sorted(people), meeting=(meeting_title or meeting_id), meeting_date=meeting_date,
+        workers=TRANSCRIPT_LLM_WORKERS, max_tokens=TRANSCRIPT_CHUNK_TOKENS, overlap_tokens=TRANSCRIPT_OVERLAP_TOKENS,
+    )
+
+    t0 = time.perf_counter()
+    items = []
+    for t in tasks:
+        name = t["assignee"] if t["assignee"] in people else ""
+        items.append({
+            "task": t["task"],
+            "assignee": name,
+            "telegram_id": people.get(name, ""),
+            "deadline": norm_deadline(t["deadline"]),
+            "priority": t["priority"],
+        })
+    # ключ — встреча + описание: повторная отправка той же расшифровки не плодит задачи
+    keys = [f"hash:{_content_hash({'meeting_id': meeting_id, 'transcript_task': it['task']})}" for it in items]
+    out = insert_tasks_bulk(items, source="api", status="proposed", meeting_id=meeting_id,
+                            keys=keys, key_ttl_s=IDEMPOTENCY_TTL_H * 3600)
+    results, created = [], []
+    for item, (task_id, is_new) in zip(items, out):
+        results.append({"task_id": task_id, "task": item["task"], "assignee": item["assignee"] or None,
+                        "deadline": item["deadline"] or None, **({} if is_new else {"duplicate": True})})
+        if is_new:
+            created.append((task_id, item))
+    if created:
+        start_outbox_sender()
+        notify_assistant_meeting(meeting_id, meeting_title, created)
+    stats["timings_ms"]["insert_ms"] = round((time.perf_counter() - t0) * 1e3, 1)
+    stats["timings_ms"]["total_ms"] = round((time.perf_counter() - t_total) * 1e3, 1)
+    log.info("ZAP transcript: meeting=%s chunks=%s tasks=%s timings=%s",
+             meeting_id, stats["chunks"], len(results), stats["timings_ms"])
+
+    return jsonify({
+        "status": "ok",
+        "meeting_id": meeting_id,
+        "created": len(created),
+        "duplicates": len(results) - len(created),
+        "results": results,
+        **stats,
+    }), 202
+
+# --------------------------------------------------------------------------------
+# Чтение: GET /tasks (keyset) и GET /tasks/<id> (с историей), условные запросы по ETag.
+# Секрет — в заголовке X-Secret-Key.
+# --------------------------------------------------------------------------------
+TASKS_PAGE_DEFAULT = 100
+TASKS_PAGE_MAX = 500
+
+def _not_modified(etag: str):
+    """304, если клиент прислал тот же ETag; иначе None."""
+    if etag in {t.strip() for t in (request.headers.get("If-None-Match") or "").split(",")}:
+        resp = app.response_class(status=304)
+        resp.headers["ETag"] = etag
+        return resp
+    return None
+
+def _with_etag(payload, etag: str):
+    resp = jsonify(payload)
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = "no-cache"  # кэшировать можно, но каждый раз сверяться
+    return resp
+
+def _task_json(r) -> dict:
+    return {k: r[k] for k in r.keys()}
+
+@app.get("/tasks")
+def api_list_tasks():
+    """
+    ?status=open,in_progress &assignee=Имя &telegram_id=… &deadline_from=YYYY-MM-DD &deadline_to=…
+    &after=<id> &limit=N (≤ 500). Ответ: {"tasks": [...], "next_after": id | null}.
+    ETag = версия данных (её бампают триггеры на любую запись) + параметры запроса:
+    пока в базе ничего не менялось, повторный опрос — 304 без единого запроса к tasks.
+    """
+    if request.headers.get("X-Secret-Key") != MY_SECRET:
+        return jsonify({"error": "unauthorized"}), 401
+    try:
+        after = int(request.args.get("after") or 0)
+        limit = min(int(request.args.get("limit") or TASKS_PAGE_DEFAULT), TASKS_PAGE_MAX)
+    except ValueError:
+        return jsonify({"error": "after/limit must be integers"}), 400
+    if limit <= 0:
+        return jsonify({"error": "limit must be positive"}), 400
+    statuses = [x.strip() for x in (request.args.get("status") or "").split(",") if x.strip()]
+    deadline_from = (request.args.get("deadline_from") or "").strip()
+    deadline_to = (request.args.get("deadline_to") or "").strip()
+    for d in (deadline_from, deadline_to):
+        if d and not ISO_DATE_RE.match(d):
+            return jsonify({"error": "deadline_from/deadline_to must be YYYY-MM-DD"}), 400
+
+    query = json.dumps(sorted(request.args.items(multi=True)), ensure_ascii=False)
+    etag = f'W/"{get_data_version()}-{hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]}"'
+    cached = _not_modified(etag)
+    if cached is not None:
+        return cached
+
+    rows = list_tasks_page(
+        statuses=statuses, assignee=(request.args.get("assignee") or "").strip(),
+        telegram_id=(request.args.get("telegram_id") or "").strip(),
+        deadline_from=deadline_from, deadline_to=deadline_to, after_id=after, limit=limit,
+    )
+    next_after = rows[-1]["id"] if len(rows) == limit else None
+    return _with_etag({"tasks": [_task_json(r) for r in rows], "next_after": next_after}, etag)
+
+@app.get("/tasks/<int:task_id>")
+def api_get_task(task_id: int):
+    """
+    Задача + история (переназначения, переносы). ETag — updated_at задачи + хэш строки и размер истории
+    (updated_at с точностью до секунды, поэтому одного его мало); историю грузим только при промахе.
+    """
+    if request.headers.get("X-Secret-Key") != MY_SECRET:
+        return jsonify({"error": "unauthorized"}), 401
+    sig = get_task_signature(task_id)
+    if not sig:
+        return jsonify({"error": "not found"}), 404
+    digest = hashlib.sha1(repr(tuple(sig)).encode("utf-8")).hexdigest()[:12]
+    etag = f'W/"{task_id}-{sig["updated_at"] or sig["created_at"] or ""}-{digest}"'
+    cached = _not_modified(etag)
+    if cached is not None:
+        return cached
+
+    out = _task_json(sig)
+    out.pop("n_reassign", None)
+    out.pop("n_deadline", None)
+    out["reassignments"] = [_task_json(x) for x in get_reassignments_for_task(task_id)]
+    out["deadline_changes"] = [_task_json(x) for x in get_deadline_changes_for_task(task_id)]
+    return _with_etag(out, etag)
+
+CHANGES_PAGE_DEFAULT = 500
+CHANGES_PAGE_MAX = 5000
+
+@app.get("/changes")
+def api_changes():
+    """
+    Инкрементальная синхронизация: ?since=<cursor>&limit=N (≤ 5000).
+    Без since — только текущий курсор: снять его, выгрузить всё через /tasks, дальше ходить сюда.
+    Ответ: {"changes": [{seq, entity, id, task_id, at, row}], "next_since": cursor, "has_more": bool};
+    изменения одной строки схлопнуты до последнего, row — её текущее состояние (null — удалена).
+    410 — курсор старше хранимого журнала, нужна полная пересинхронизация.
+    """
+    if request.headers.get("X-Secret-Key") != MY_SECRET:
+        return jsonify({"error": "unauthorized"}), 401
+    if request.args.get("since") in (None, ""):
+        return jsonify({"changes": [], "next_since": get_change_cursor(), "has_more": False})
+    try:
+        since = int(request.args["since"])
+        limit = min(int(request.args.get("limit") or CHANGES_PAGE_DEFAULT), CHANGES_PAGE_MAX)
+    except ValueError:
+        return jsonify({"error": "since/limit must be integers"}), 400
+    if since < 0 or limit <= 0:
+        return jsonify({"error": "since must be >= 0, limit positive"}), 400
 
-    notify_assistant_proposed(task_id, task, assignee, deadline, priority)
-    return jsonify({"status": "ok", "task_id": task_id})
+    res = get_changes_since(since, limit)
+    if res is None:
+        return jsonify({"error": "cursor expired, full resync required", "next_since": get_change_cursor()}), 410
+    changes, next_since, has_more = res
+    for ch in changes:
+        ch["row"] = _task_json(ch["row"]) if ch["row"] is not None else None
+    return jsonify({"changes": changes, "next_since": next_since, "has_more": has_more})
 
 if __name__ == "__main__":
+    start_outbox_sender()
     app.run(host="0.0.0.0", port=5005)
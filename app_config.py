@@ -2,7 +2,7 @@
 import os
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "tasks.db")
+DB_PATH = os.environ.get("DB_PATH") or os.path.join(BASE_DIR, "tasks.db")
 
 # Secrets (no hardcodes here)
 MY_SECRET = os.environ.get("MY_SECRET", "")
@@ -27,8 +27,32 @@ BRAND_VOICE_PREFIX = os.environ.get(
     "⚠️ Friendly reminder: I’ll ping again if ignored 🙂"
 )
 
+# Reports: параллельный рендер персональных PDF (0/1 = последовательно)
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", "0"))
+# Reports: сколько готовых отчётов держать в кэше (0 = кэш выключен)
+REPORT_CACHE_MAX_ENTRIES = int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", "16"))
+
+# API: сколько часов помним ключи идемпотентности (ретраи Zapier)
+IDEMPOTENCY_TTL_H = int(os.environ.get("IDEMPOTENCY_TTL_H", "24"))
+
+# API: сколько дней хранить журнал изменений для GET /changes (0 = не чистить)
+CHANGE_LOG_RETENTION_DAYS = int(os.environ.get("CHANGE_LOG_RETENTION_DAYS", "30"))
+
+# API: расшифровки встреч — параллельность LLM и размер фрагментов (в токенах, оценочно)
+TRANSCRIPT_LLM_WORKERS    = int(os.environ.get("TRANSCRIPT_LLM_WORKERS", "4"))
+TRANSCRIPT_CHUNK_TOKENS   = int(os.environ.get("TRANSCRIPT_CHUNK_TOKENS", "1500"))
+TRANSCRIPT_OVERLAP_TOKENS = int(os.environ.get("TRANSCRIPT_OVERLAP_TOKENS", "150"))
+
+# Локальный классификатор задач (classifier.py train); файла нет — не используется
+CLASSIFIER_PATH = os.environ.get("CLASSIFIER_PATH") or os.path.join(BASE_DIR, "task_classifier.json")
+# Дайджест: сообщения с оценкой ниже порога в LLM не отправляем (0 = пре-фильтр выключен)
+CLASSIFIER_PREFILTER = float(os.environ.get("CLASSIFIER_PREFILTER", "0"))
+
 # LLM (OpenAI-compatible)
 OPENAI_API_KEY   = os.environ.get("OPENAI_API_KEY", "")
 OPENAI_BASE_URL  = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
 OPENAI_MODEL     = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
 OPENAI_TIMEOUT_S = int(os.environ.get("OPENAI_TIMEOUT_S", "12"))
+# таблица ролей для маршрутизации (кто что берёт) и сколько подходящих ролей класть в промпт (0 = все)
+ROUTING_PATH     = os.environ.get("ROUTING_PATH") or os.path.join(BASE_DIR, "routing.json")
+ROUTING_TOP_N    = int(os.environ.get("ROUTING_TOP_N", "5"))
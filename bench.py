@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""
+Микро-бенчмарки горячих мест. Работают на ВРЕМЕННОЙ базе с синтетическими данными,
+рабочую tasks.db не трогают.
+
+    python bench.py pdf [--assignees 50] [--tasks 5000] [--workers N]
+    python bench.py wrap [--tasks 5000]
+    python bench.py epoch [--assignees 50] [--calls 2000]
+    python bench.py nlp [--messages 10000] [--assignees 50]
+    python bench.py deadlines [--messages 10000]
+    python bench.py nlp-batch [--sizes 1000,10000,100000] [--assignees 50]
+    python bench.py recommend [--tasks 20000] [--assignees 30] [--queries 2000]
+    python bench.py prompt [--top-n 5] [--live N]
+"""
+import os, sys, time, random, sqlite3, tempfile, argparse
+
+BENCH_SCHEMA = """
+CREATE TABLE tasks (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  task TEXT NOT NULL, assignee TEXT NOT NULL, telegram_id TEXT NOT NULL,
+  deadline TEXT, initial_text_sent TEXT, postponed INTEGER DEFAULT 0, when_postponed TEXT,
+  status TEXT DEFAULT 'open', created_at TEXT, updated_at TEXT,
+  priority TEXT DEFAULT 'normal', source TEXT DEFAULT 'api',
+  source_chat_id TEXT, source_message_id INTEGER, cancel_reason TEXT
+);
+CREATE TABLE assignees (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT NOT NULL, telegram_id TEXT NOT NULL UNIQUE, telegram_nickname TEXT, position TEXT
+);
+CREATE TABLE deadline_changes (
+  id INTEGER PRIMARY KEY AUTOINCREMENT, task_id INTEGER, old_deadline TEXT, new_deadline TEXT, at TEXT
+);
+CREATE TABLE task_reassignments (
+  id INTEGER PRIMARY KEY AUTOINCREMENT, task_id INTEGER, old_assignee TEXT, old_telegram_id TEXT,
+  new_assignee TEXT, new_telegram_id TEXT, at TEXT
+);
+CREATE TABLE chat_offsets (chat_id TEXT PRIMARY KEY, last_message_id INTEGER, updated_at TEXT);
+CREATE TABLE tracked_chats (chat_id TEXT PRIMARY KEY, title TEXT, added_at TEXT);
+CREATE TABLE user_states (user_id TEXT PRIMARY KEY, state TEXT, payload TEXT, updated_at TEXT);
+CREATE INDEX idx_tasks_status ON tasks(status);
+"""
+
+WORDS = ("подготовить отчёт по выручке за сентябрь согласовать с бухгалтерией акт приёма-передачи "
+         "виллы проверить кондиционеры на объекте заказать трансфер из аэропорта для гостей "
+         "обновить тарифы на OTA организовать уборку после выезда").split()
+
+def _bench_db(assignees: int, tasks: int) -> str:
+    """Создаёт временную БД и выставляет DB_PATH ДО импорта db/scheduler."""
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_"), "tasks.db")
+    rnd = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.executescript(BENCH_SCHEMA)
+    people = [(f"Исполнитель {i:02d}", str(100000 + i), f"user{i}") for i in range(assignees)]
+    conn.executemany("INSERT INTO assignees(name, telegram_id, telegram_nickname) VALUES (?,?,?)", people)
+    rows = []
+    for i in range(tasks):
+        name, tid, _ = people[i % assignees]
+        text = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(6, 40)))
+        if rnd.random() < 0.1:
+            text += " https://docs.example.com/" + "x" * rnd.randint(80, 200)
+        rows.append((text, name, tid, f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                     rnd.choice(("open", "in_progress")), "2026-01-01T00:00:00Z"))
+    conn.executemany(
+        "INSERT INTO tasks(task, assignee, telegram_id, deadline, status, created_at) VALUES (?,?,?,?,?,?)", rows
+    )
+    conn.executemany(
+        "INSERT INTO deadline_changes(task_id, old_deadline, new_deadline, at) VALUES (?,?,?,?)",
+        [(rnd.randint(1, tasks), "2026-01-01", "2026-02-01", "2026-01-01T00:00:00Z") for _ in range(tasks // 3)]
+    )
+    conn.executemany(
+        "INSERT INTO task_reassignments(task_id, old_assignee, old_telegram_id, new_assignee, new_telegram_id, at)"
+        " VALUES (?,?,?,?,?,?)",
+        [(rnd.randint(1, tasks), people[0][0], people[0][1], people[1][0], people[1][1], "2026-01-01T00:00:00Z")
+         for _ in range(tasks // 5)]
+    )
+    conn.commit()
+    conn.close()
+    os.environ["DB_PATH"] = path
+    return path
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    return time.perf_counter() - t0, res
+
+def bench_pdf(args):
+    _bench_db(args.assignees, args.tasks)
+    import scheduler
+
+    workers = args.workers or (os.cpu_count() or 1)
+    scheduler._ensure_pdf_font()  # регистрация шрифта — вне замера
+
+    dt_serial, docs = _timed(scheduler.build_personal_pdf_reports, workers=1)
+    size = sum(len(b.read()) for _, (_, b) in docs)
+    for _, (_, b) in docs:
+        b.close()
+    print(f"serial      : {dt_serial:7.2f} s  ({len(docs)} PDFs, {size / 1e6:.1f} MB)")
+
+    dt_pool, docs = _timed(scheduler.build_personal_pdf_reports, workers=workers)
+    for _, (_, b) in docs:
+        b.close()
+    print(f"pool x{workers:<5}: {dt_pool:7.2f} s  speed-up x{dt_serial / dt_pool:.2f} (cpu_count={os.cpu_count()})")
+
+def _legacy_wrap(text, max_width_pt, font_name, font_size):
+    """Прежний алгоритм _pdf_draw_wrapped (до pdf_layout) — эталон для сравнения."""
+    from reportlab.pdfbase import pdfmetrics
+
+    def split_hard(word, remain_pt):
+        out = []
+        start = 0
+        while start < len(word):
+            lo, hi = 1, len(word) - start
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                if pdfmetrics.stringWidth(word[start:start + mid], font_name, font_size) <= remain_pt:
+                    lo = mid + 1
+                else:
+                    hi = mid - 1
+            take = max(1, hi)
+            out.append(word[start:start + take])
+            start += take
+            remain_pt = max_width_pt
+        return out
+
+    lines = []
+    for para in (text or "").split("\n"):
+        words = para.split(" ") if para else [""]
+        cur, cur_w = "", 0.0
+        for w in words:
+            token = (w + " ") if w else " "
+            token_w = pdfmetrics.stringWidth(token, font_name, font_size)
+            if token_w <= (max_width_pt - cur_w):
+                cur += token
+                cur_w += token_w
+            elif pdfmetrics.stringWidth(w, font_name, font_size) > max_width_pt:
+                if cur.strip():
+                    lines.append(cur.rstrip())
+                    cur, cur_w = "", 0.0
+                chunks = split_hard(w, max_width_pt)
+                for i, ch in enumerate(chunks):
+                    if i < len(chunks) - 1:
+                        lines.append(ch)
+                    else:
+                        cur = ch + " "
+                        cur_w = pdfmetrics.stringWidth(cur, font_name, font_size)
+            else:
+                if cur.strip():
+                    lines.append(cur.rstrip())
+                cur, cur_w = token, token_w
+        if cur.strip() or para == "":
+            lines.append(cur.rstrip())
+    return lines
+
+def bench_wrap(args):
+    _bench_db(1, 1)
+    import scheduler
+    from pdf_layout import LineWrapper
+
+    font, _ = scheduler._ensure_pdf_font()
+    font = font or "Helvetica"
+    rnd = random.Random(7)
+    texts = []
+    for i in range(args.tasks):
+        body = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(6, 40)))
+        if rnd.random() < 0.1:
+            body += " https://docs.example.com/" + "x" * rnd.randint(80, 200)
+        texts += [(f"• [ID {i}] {body}", 180 * scheduler.MM_TO_PT),
+                  (f"Дедлайн: 2026-10-{rnd.randint(1, 28):02d}", 175 * scheduler.MM_TO_PT),
+                  (f"Переносов дедлайна: {rnd.randint(0, 3)}", 175 * scheduler.MM_TO_PT),
+                  (f"Переназначения: Исполнитель {rnd.randint(0, 49):02d} → Исполнитель 01", 175 * scheduler.MM_TO_PT)]
+
+    dt_old, old = _timed(lambda: [_legacy_wrap(t, w, font, 10) for t, w in texts])
+    wr = LineWrapper(font, 10)
+    dt_new, new = _timed(wr.wrap_section, texts)
+    dt_warm, _ = _timed(wr.wrap_section, texts)
+    assert old == new, "LineWrapper разошёлся с прежним алгоритмом"
+    n_lines = sum(map(len, new))
+    print(f"{len(texts)} blocks, {n_lines} lines, identical output")
+    print(f"legacy stringWidth : {dt_old * 1e3:8.1f} ms")
+    print(f"LineWrapper (cold) : {dt_new * 1e3:8.1f} ms  x{dt_old / dt_new:.1f}")
+    print(f"LineWrapper (warm) : {dt_warm * 1e3:8.1f} ms  x{dt_old / dt_warm:.1f}")
+
+def bench_epoch(args):
+    _bench_db(args.assignees, 1)
+    import db
+
+    names = [f"Исполнитель {i:02d}" for i in range(args.assignees)]
+    tids = [str(100000 + i) for i in range(args.assignees)]
+    calls = [(db.list_unique_assignees, ()), (db.get_nickname_by_tid, (tids[0],))]
+    for fn, a in calls:
+        dt_raw, _ = _timed(lambda: [fn.uncached(*a) for _ in range(args.calls)])
+        fn(*a)  # прогрев
+        dt_hit, res = _timed(lambda: [fn(*a) for _ in range(args.calls)])
+        assert res[-1] == fn.uncached(*a)
+        print(f"{fn.__name__:22}: uncached {dt_raw / args.calls * 1e6:7.1f} us/call, "
+              f"cached {dt_hit / args.calls * 1e6:7.1f} us/call  x{dt_raw / dt_hit:.1f}")
+
+    db.add_or_update_assignee(names[0] + " (new)", tids[0], "renamed")
+    assert db.get_nickname_by_tid(tids[0]) == "renamed", "кэш не увидел запись"
+    print("invalidation after write: OK", db.get_nickname_by_tid.cache_info())
+
+def _legacy_nlp(text, names):
+    """Прежние эвристики nlp.py (до TextMatcher): looks_like_task, extract_priority, detect_assignee."""
+    import re
+    from nlp import TASK_KEYWORDS, PRIORITY_WORDS
+    t = (text or "").lower()
+    is_task = len(t.split()) >= 3 and any(k in t for k in TASK_KEYWORDS)
+    pr = "high" if any(w in t for w in PRIORITY_WORDS) else "normal"
+    hits = [n for n in names if n.lower().strip() and re.search(rf"\b{re.escape(n.lower().strip())}\b", t)]
+    return is_task, pr, hits
+
+RU_NAMES = ("Вадим Андрей Игорь Маша Ольга Катя Сергей Николай Дмитрий Анна Елена Павел Юлия Илья Артём "
+            "Никита Ксения Денис Алина Роман").split()
+
+def _bench_names(n):
+    # имена без вложений: «Иван» внутри «Иван Петров» TextMatcher намеренно считает одним (длинным) именем
+    return [RU_NAMES[i] if i < len(RU_NAMES) else f"Сотрудник{i}" for i in range(n)]
+
+def _chat_messages(rnd, n, names, deadline_share=0.0):
+    """Синтетические сообщения чата: ключевые слова задач/приоритета, имена, иногда дедлайн."""
+    import nlp
+    vocab = WORDS + nlp.TASK_KEYWORDS + sorted(nlp.PRIORITY_WORDS) + ["ок", "спасибо", "привет", "завтра"]
+    msgs = []
+    for _ in range(n):
+        words = [rnd.choice(vocab) for _ in range(rnd.randint(1, 25))]
+        if rnd.random() < 0.4:
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(names))
+        if rnd.random() < deadline_share:
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(DEADLINE_PHRASES))
+        msgs.append(" ".join(words).capitalize())
+    return msgs
+
+def bench_nlp(args):
+    _bench_db(1, 1)
+    import nlp
+
+    names = _bench_names(args.assignees)
+    msgs = _chat_messages(random.Random(3), args.messages, names)
+
+    dt_old, old = _timed(lambda: [_legacy_nlp(m, names) for m in msgs])
+    nlp._matcher_for.cache_clear()
+    dt_new, new = _timed(lambda: [(nlp.looks_like_task(m), nlp.extract_priority(m), nlp.detect_assignee(m, names)[1])
+                                  for m in msgs])
+    assert old == new, "TextMatcher разошёлся с прежними эвристиками"
+    print(f"{len(msgs)} messages, {args.assignees} assignees, identical results")
+    print(f"legacy any()/re.search : {dt_old * 1e3:8.1f} ms")
+    print(f"TextMatcher (3 calls)  : {dt_new * 1e3:8.1f} ms  x{dt_old / dt_new:.1f}")
+    m = nlp.get_matcher(names)
+    dt_one, _ = _timed(lambda: [m.scan(x.lower()) for x in msgs])
+    print(f"TextMatcher.scan (1x)  : {dt_one * 1e3:8.1f} ms  x{dt_old / dt_one:.1f}")
+
+DEADLINE_PHRASES = ("к пятнице", "до конца недели", "через 3 дня", "завтра", "15.10", "15 октября",
+                    "на следующей неделе", "by friday", "Oct 30", "в среду", "через 2 недели", "")
+# число рядом со словом на «мар…/дек…/ма…» — не дата; ожидаемый ответ для today = 2026-10-19
+DEADLINE_CHECKS = (
+    ("подготовь 3 маркетинговых плана", None), ("нужно 5 марок купить", None),
+    ("prepare 2 marketing decks", None), ("we need 3 decisions today?", "2026-10-19"),
+    ("до 15 окт. сдать", "2026-10-15"), ("к 3 марта", "2026-03-03"), ("9 мая", "2026-05-09"),
+    ("by Dec 1st", "2026-12-01"), ("due 5 sept", "2026-09-05"),
+)
+
+def bench_deadlines(args):
+    _bench_db(1, 1)
+    from datetime import date
+    from dateutil import parser as dateparser
+    import deadlines
+
+    def legacy(text):
+        try:
+            d = dateparser.parse(text, dayfirst=True, fuzzy=True)
+            return d.strftime("%Y-%m-%d") if d else None
+        except Exception:
+            return None
+
+    rnd = random.Random(5)
+    msgs = []
+    for _ in range(args.messages):
+        words = [rnd.choice(WORDS) for _ in range(rnd.randint(3, 20))]
+        words.insert(rnd.randrange(len(words) + 1), rnd.choice(DEADLINE_PHRASES))
+        msgs.append(" ".join(words))
+    today = date(2026, 10, 19)
+    for text, want in DEADLINE_CHECKS:
+        got = deadlines.parse_deadline(text, today, free_text=True)
+        assert got == want, f"{text!r}: {got} != {want}"
+    dt_old, old = _timed(lambda: [legacy(m) for m in msgs])
+    deadlines._parse.cache_clear()
+    dt_new, new = _timed(lambda: [deadlines.parse_deadline(m, today, free_text=True) for m in msgs])
+    # повторы (ответы «завтра», «к пятнице» в боте, ретраи API) — из LRU
+    hot = msgs[:deadlines.DEADLINE_CACHE_SIZE // 2] * 2
+    deadlines._parse.cache_clear()
+    dt_cold2, _ = _timed(lambda: [legacy(m) for m in hot])
+    dt_warm, _ = _timed(lambda: [deadlines.parse_deadline(m, today, free_text=True) for m in hot])
+    print(f"{len(msgs)} messages: found deadline in {sum(map(bool, new))} (dateutil fuzzy: {sum(map(bool, old))})")
+    print(f"dateutil fuzzy        : {dt_old * 1e3:8.1f} ms")
+    print(f"parse_deadline (cold) : {dt_new * 1e3:8.1f} ms  x{dt_old / dt_new:.1f}")
+    print(f"{len(hot)} messages, each twice: dateutil {dt_cold2 * 1e3:.1f} ms, "
+          f"parse_deadline + LRU {dt_warm * 1e3:.1f} ms  x{dt_cold2 / dt_warm:.1f}")
+
+def bench_nlp_batch(args):
+    _bench_db(1, 1)
+    from datetime import date
+    import nlp, deadlines
+
+    names = _bench_names(args.assignees)
+    today = date(2026, 10, 19)
+
+    def one_by_one(msgs):
+        cols = {f: [] for f in nlp.BATCH_FIELDS}
+        for m in msgs:
+            cand, hits = nlp.detect_assignee(m, names)
+            row = (nlp.looks_like_task(m), nlp.extract_priority(m),
+                   deadlines.parse_deadline(m, today, free_text=True), cand, hits)
+            for f, v in zip(nlp.BATCH_FIELDS, row):
+                cols[f].append(v)
+        return cols
+
+    print(f"{args.assignees} assignees; messages/s, per-message calls vs nlp.analyze_batch")
+    for n in args.sizes:
+        msgs = _chat_messages(random.Random(11), n, names, deadline_share=0.3)
+        nlp._matcher_for.cache_clear()
+        deadlines._parse.cache_clear()
+        dt_old, old = _timed(one_by_one, msgs)
+        nlp._matcher_for.cache_clear()
+        deadlines._parse.cache_clear()
+        dt_new, new = _timed(nlp.analyze_batch, msgs, names, today=today)
+        assert old == new, "analyze_batch разошёлся с поштучными эвристиками"
+        print(f"{n:>7} msgs ({len(set(msgs))} unique): one by one {n / dt_old:9.0f}/s ({dt_old * 1e3:8.1f} ms), "
+              f"batch {n / dt_new:9.0f}/s ({dt_new * 1e3:8.1f} ms)  x{dt_old / dt_new:.1f}")
+
+def bench_recommend(args):
+    _bench_db(1, 1)
+    import bm25, recommender
+
+    rnd = random.Random(13)
+    names = _bench_names(args.assignees)
+    topics = {n: [f"т{a:03d}{j}" for j in range(10)] for a, n in enumerate(names)}  # своя лексика у каждого
+
+    def message(name):
+        words = rnd.sample(topics[name], rnd.randint(1, 3)) + [rnd.choice(WORDS) for _ in range(rnd.randint(3, 12))]
+        if rnd.random() < 0.3:  # чужая тема вперемешку
+            words.append(rnd.choice(topics[rnd.choice(names)]))
+        rnd.shuffle(words)
+        return " ".join(words)
+
+    docs = {n: [] for n in names}
+    for i in range(args.tasks):
+        n = names[i % len(names)]
+        docs[n].append(message(n))
+    queries = [(n, message(n)) for n in (rnd.choice(names) for _ in range(args.queries))]
+
+    dt_build, index = _timed(bm25.AssigneeIndex, docs)
+    dt_query, recs = _timed(lambda: [index.recommend(q, 3) for _, q in queries])
+    top1 = sum(1 for (n, _), r in zip(queries, recs) if r and r[0][0] == n)
+    top3 = sum(1 for (n, _), r in zip(queries, recs) if n in [x for x, _ in r])
+    picks = [(n, recommender.confident_pick(r)) for (n, _), r in zip(queries, recs)]
+    picked = [(n, p) for n, p in picks if p]
+    print(f"{args.tasks} approved tasks, {len(names)} assignees: index built in {dt_build * 1e3:.1f} ms")
+    print(f"{len(queries)} queries: {dt_query / len(queries) * 1e6:.0f} µs/query, "
+          f"top-1 {top1 / len(queries):.0%}, top-3 {top3 / len(queries):.0%}")
+    print(f"confident_pick: filled {len(picked) / len(queries):.0%} of messages, "
+          f"correct {sum(1 for n, p in picked if n == p) / max(1, len(picked)):.0%} of those")
+
+def bench_prompt(args):
+    _bench_db(1, 1)
+    import bm25, llm
+    from transcripts import approx_tokens, CHARS_PER_TOKEN
+
+    entries, fallback, index = llm.load_routing()
+    key = llm._ROUTING[0]
+    names = [e["name"] for e in entries]
+    queries = [(i, x) for i, e in enumerate(entries) for x in e.get("examples") or []]
+    build = lambda x, n: llm.build_route_prompt(x, names, "author", "2026-10-19", top_n=n)
+
+    full = [build(x, 0) for _, x in queries]
+    # leave-one-out: пример убираем из индекса ролей — иначе он находит сам себя
+    top, hits, whole, dt_top = [], 0, 0, 0.0
+    for i, x in queries:
+        docs = {j: [e.get("takes") or ""] + [y for y in e.get("examples") or [] if j != i or y != x]
+                for j, e in enumerate(entries)}
+        llm._ROUTING = (key, (entries, fallback, bm25.AssigneeIndex(docs, stem_len=llm.ROUTING_STEM_LEN)))
+        dt, p = _timed(build, x, args.top_n)
+        dt_top += dt
+        top.append(p)
+        hits += f'«{entries[i]["name"]}», telegram_id=' in p
+        whole += p.count(', telegram_id="') == len(entries)
+    llm._ROUTING = (key, (entries, fallback, index))
+
+    tok_full = sum(approx_tokens(p) for p in full) / len(full)
+    tok_top = sum(approx_tokens(p) for p in top) / len(top)
+    print(f"{len(entries)} roles, {len(queries)} example messages, leave-one-out (≈{CHARS_PER_TOKEN} chars/token)")
+    print(f"whole table : ~{tok_full:6.0f} prompt tokens")
+    print(f"top-{args.top_n:<7}: ~{tok_top:6.0f} prompt tokens  ({1 - tok_top / tok_full:.0%} fewer), "
+          f"built in {dt_top / len(queries) * 1e6:.0f} µs")
+    print(f"owner role in the prompt for {hits / len(queries):.0%} of messages; "
+          f"whole table sent (weak match) for {whole / len(queries):.0%}")
+
+    if args.live and not llm.OPENAI_API_KEY:
+        print("--live: нет OPENAI_API_KEY, замер задержки пропущен")
+    elif args.live:  # реальные запросы: время ответа LLM с полной таблицей и с отобранными ролями
+        for label, prompts in (("whole table", full), (f"top-{args.top_n}", top)):
+            times = []
+            for p in prompts[:args.live]:
+                t0 = time.perf_counter()
+                llm._post_chat([{"role": "system", "content": llm.SYSTEM_PROMPT}, {"role": "user", "content": p}])
+                times.append(time.perf_counter() - t0)
+            times.sort()
+            print(f"live {label:<11}: median {times[len(times) // 2] * 1e3:.0f} ms over {len(times)} calls")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="AI-tasker micro-benchmarks")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("pdf", help="персональные PDF: последовательно vs пул процессов")
+    p.add_argument("--assignees", type=int, default=50)
+    p.add_argument("--tasks", type=int, default=5000)
+    p.add_argument("--workers", type=int, default=0, help="0 = os.cpu_count()")
+    p.set_defaults(func=bench_pdf)
+
+    p = sub.add_parser("wrap", help="перенос строк: stringWidth на каждый токен vs LineWrapper")
+    p.add_argument("--tasks", type=int, default=5000)
+    p.set_defaults(func=bench_wrap)
+
+    p = sub.add_parser("epoch", help="чтения исполнителей: каждый раз в базу vs cached_read со сверкой эпохи")
+    p.add_argument("--assignees", type=int, default=50)
+    p.add_argument("--calls", type=int, default=2000)
+    p.set_defaults(func=bench_epoch)
+
+    p = sub.add_parser("nlp", help="эвристики nlp: any()/re.search на каждое имя vs один TextMatcher")
+    p.add_argument("--messages", type=int, default=10000)
+    p.add_argument("--assignees", type=int, default=50)
+    p.set_defaults(func=bench_nlp)
+
+    p = sub.add_parser("deadlines", help="дедлайн в сообщении: dateutil fuzzy vs deadlines.parse_deadline")
+    p.add_argument("--messages", type=int, default=10000)
+    p.set_defaults(func=bench_deadlines)
+
+    p = sub.add_parser("nlp-batch", help="эвристики nlp на пачке: поштучные вызовы vs analyze_batch")
+    p.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[1000, 10000, 100000])
+    p.add_argument("--assignees", type=int, default=50)
+    p.set_defaults(func=bench_nlp_batch)
+
+    p = sub.add_parser("recommend", help="подсказка исполнителя: сборка BM25-индекса, задержка и точность")
+    p.add_argument("--tasks", type=int, default=20000)
+    p.add_argument("--assignees", type=int, default=30)
+    p.add_argument("--queries", type=int, default=2000)
+    p.set_defaults(func=bench_recommend)
+
+    p = sub.add_parser("prompt", help="промпт маршрутизации: вся таблица ролей vs топ-N подходящих")
+    p.add_argument("--top-n", type=int, default=5)
+    p.add_argument("--live", type=int, default=0, help="N реальных запросов к LLM на вариант (нужен OPENAI_API_KEY)")
+    p.set_defaults(func=bench_prompt)
+
+    args = ap.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
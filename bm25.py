@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+BM25 «текст → кто из документов ближе» без зависимостей и без БД: общий для подсказки
+исполнителя по истории (recommender) и таблицы ролей в промпте (llm.load_routing).
+
+Термы — основы слов (первые stem_len букв: грубо, но «уборку/уборки/уборка» сходятся),
+документ — все тексты одного ключа (исполнителя, роли). Индекс — словарь термов в памяти.
+"""
+import math
+import re
+from collections import Counter
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+STEM_LEN = 5
+
+_WORD_RE = re.compile(r"\w+")
+_SOURCE_SIGNATURE_RE = re.compile(r"\(задача пришла из чата[^)]*\)")  # подпись LLM в каждом описании
+_STOP = frozenset("для что как это все при над под без его её или уже еще ещё надо нужно "
+                  "пожалуйста срочно сегодня завтра задача the and for".split())
+
+
+def terms(text: str, stem_len: int = STEM_LEN) -> list[str]:
+    text = _SOURCE_SIGNATURE_RE.sub(" ", (text or "").lower().replace("ё", "е"))
+    return [w[:stem_len] for w in _WORD_RE.findall(text) if len(w) > 2 and w not in _STOP and not w.isdigit()]
+
+
+class AssigneeIndex:
+    def __init__(self, docs: dict[str, list[str]], stem_len: int = STEM_LEN):
+        """docs — {исполнитель: [описания его задач]}."""
+        self.stem_len = stem_len
+        self.names = list(docs)
+        self.postings: dict[str, list[tuple[int, int]]] = {}  # терм → [(№ исполнителя, tf)]
+        lengths = []
+        for i, name in enumerate(self.names):
+            tf = Counter(t for text in docs[name] for t in terms(text, stem_len))
+            lengths.append(sum(tf.values()))
+            for term, n in tf.items():
+                self.postings.setdefault(term, []).append((i, n))
+        avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self.norm = [BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl) if avgdl else BM25_K1 for dl in lengths]
+        n_docs = len(self.names)
+        self.idf = {t: math.log(1 + (n_docs - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    def recommend(self, text: str, k: int = 3, allowed=None) -> list[tuple[str, float]]:
+        """Топ-k (исполнитель, счёт BM25) по убыванию; allowed — только из этих имён."""
+        scores: dict[int, float] = {}
+        for term in set(terms(text, self.stem_len)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                scores[i] = scores.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + self.norm[i])
+        allowed = set(allowed) if allowed is not None else None
+        ranked = sorted(((s, self.names[i]) for i, s in scores.items()
+                         if allowed is None or self.names[i] in allowed), reverse=True)
+        return [(name, round(s, 3)) for s, name in ranked[:k]]
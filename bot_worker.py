@@ -1,12 +1,12 @@
 # -*- coding: utf-8 -*-
-import asyncio, os, tempfile, csv, io
+import asyncio, os, csv, io, time
 from datetime import datetime, timedelta, time as dtime
 from zoneinfo import ZoneInfo
 from typing import List, Tuple
 from uuid import uuid4
 import re
 from datetime import date
-from app_config import BOT_TOKEN, TZ, WORK_END_HOUR, VADIM_CHAT_ID, ASSISTANT_CHAT_IDS
+from app_config import BOT_TOKEN, TZ, WORK_END_HOUR, VADIM_CHAT_ID, ASSISTANT_CHAT_IDS, CLASSIFIER_PREFILTER
 
 from telegram import (Update, InlineKeyboardButton as B, InlineKeyboardMarkup as KM, Message, InputFile)
 from telegram.error import Forbidden, BadRequest, TelegramError
@@ -21,14 +21,18 @@ from db import (
     set_task_status, set_task_deadline, set_task_text, set_task_priority, mark_cancelled,
     track_chat, set_last_chat_offset, get_last_chat_offset, list_tracked_chats,
     fetch_proposed_tasks, find_open_tasks_for_user, get_priority, get_tasks_by_assignee_openlike,
-    get_all_tasks, get_reassignments_for_task, get_deadline_changes_for_task, enqueue_outbox,
+    enqueue_outbox, iter_tasks_with_history,
     assignee_exists_by_tid, get_nickname_by_tid, get_overdue_open_tasks
 )
 
 
 from llm import llm_route
-from nlp import looks_like_task, extract_deadline, extract_priority, strip_bot_mention, detect_assignee
-from voice import transcribe_telegram_file
+from nlp import extract_deadline, extract_priority, strip_bot_mention, detect_assignee, analyze_batch
+from classifier import get_classifier
+from recommender import recommend_assignees, confident_pick
+from deadlines import parse_deadline
+from voice import transcribe_voice, transcribe_voice_batch, VOICE_TRANSCRIBE_CONCURRENCY, VOICE_MIN_DURATION_S
+from report_cache import cached_report, new_report_buffer
 
 
 import logging, sys
@@ -89,8 +93,13 @@ def _next_work_morning(dt_local):
 # ===== Буферы на день =========================================================
 # MESSAGE_BUFFER: (mid, username, full_name, text, dt)
 MESSAGE_BUFFER: dict[str, list[tuple[int, str, str, str, datetime]]] = {}
-# VOICE_BUFFER:   (mid, username, full_name, file_id, dt)
-VOICE_BUFFER: dict[str, list[tuple[int, str, str, str, datetime]]] = {}
+# VOICE_BUFFER:   (mid, username, full_name, file_id, file_unique_id, duration_s, dt) — ещё не расшифрованные
+VOICE_BUFFER: dict[str, list[tuple[int, str, str, str, str, int, datetime]]] = {}
+# голосовые расшифровываются сразу по получении фоновыми воркерами (см. _voice_worker);
+# дайджест ждёт очередь не дольше VOICE_DIGEST_WAIT_S и добирает то, что осталось в VOICE_BUFFER
+VOICE_QUEUE: asyncio.Queue = asyncio.Queue()
+VOICE_WORKERS: list[asyncio.Task] = []
+VOICE_DIGEST_WAIT_S = 120
 
 # Состояния мастера ревью/правок
 RV_WAIT_DESC, RV_WAIT_ASSIGNEE_PICK, RV_WAIT_DEADLINE, RV_WAIT_PRIORITY, RV_WAIT_CANCEL_REASON, RV_WAIT_PROOF = range(6)
@@ -174,6 +183,18 @@ def get_assignee_name_list() -> list[str]:
     rows = list_unique_assignees()
     return [r[0] for r in rows if r and r[0]]
 
+def reassign_choices(task_text: str, current_assignee: str = "") -> list[tuple[str, str]]:
+    """
+    (подпись кнопки, tid) для переназначения: сначала топ-3 по истории задач (уверенный — с ⭐), дальше по алфавиту.
+    Текущего исполнителя не советуем: его задачи в истории похожи, но переназначают как раз от него.
+    Синхронная (БД + пересборка индекса) — из обработчиков через asyncio.to_thread.
+    """
+    rows = [(n, tid) for n, tid in list_unique_assignees() if str(tid or "").strip()]
+    recs = recommend_assignees(task_text, k=3, names=[n for n, _ in rows if n != current_assignee])
+    top, pick = [n for n, _ in recs], confident_pick(recs)
+    rows.sort(key=lambda r: top.index(r[0]) if r[0] in top else len(top))  # sort стабильный: хвост — как был
+    return [(("⭐ " if n == pick else "") + n, tid) for n, tid in rows]
+
 def km_review_nav(idx: int, total: int, task_id: int, context: str):
     left_dis  = idx <= 0
     right_dis = idx >= total - 1
@@ -328,7 +349,7 @@ def iso_to_human_in_text(text: str) -> str:
         return f"{d} {month_cap} {y}"
     return ISO_DATE_RE.sub(_rep, text or "")
 
-# ---------- Парсер дат (расширенный) ----------
+# ---------- Дедлайны (сам разбор — deadlines.parse_deadline) ----------
 def _ensure_future_or_today(yyyy_mm_dd: str | None) -> str | None:
     if not yyyy_mm_dd:
         return None
@@ -342,66 +363,6 @@ def _ensure_future_or_today(yyyy_mm_dd: str | None) -> str | None:
         return None
 
 
-def parse_any_date(s: str) -> str | None:
-    s = (s or "").strip().lower()
-    now = datetime.now(TZINFO)
-
-    # быстрые ключевые слова
-    if s in ("сегодня","today"):     return now.strftime("%Y-%m-%d")
-    if s in ("завтра","tomorrow"):   return (now + timedelta(days=1)).strftime("%Y-%m-%d")
-    if s in ("послезавтра","day after tomorrow","after tomorrow"):
-        return (now + timedelta(days=2)).strftime("%Y-%m-%d")
-
-    # быстрые относительные
-    if s in ("через неделю","+1 неделя","+1 нед","спустя неделю"):
-        return (now + timedelta(days=7)).strftime("%Y-%m-%d")
-    if s in ("через 2 недели","+2 недели","+2 нед","спустя 2 недели"):
-        return (now + timedelta(days=14)).strftime("%Y-%m-%d")
-
-    m = re.fullmatch(r"(через|за)\s+(\d+)\s*(дн(я|ей)?)", s)
-    if m:
-        n = int(m.group(2))
-        return (now + timedelta(days=n)).strftime("%Y-%m-%d")
-
-    # «к пятнице», «к четвергу» и пр.
-    if s.startswith("к "):
-        wd = s.replace("к ", "").strip()
-        for key, idx in _WEEKDAYS_MAP.items():
-            if wd.startswith(key):
-                d = _next_weekday(now, idx)
-                if d.date() < now.date():
-                    d = d + timedelta(days=7)
-                return d.strftime("%Y-%m-%d")
-
-    if "на следующей неделе" in s:
-        next_mon = _next_weekday(now + timedelta(days=1), 0)
-        next_fri = _next_weekday(next_mon, 4)
-        return next_fri.strftime("%Y-%m-%d")
-
-    if "до конца недели" in s:
-        eow = _end_of_week(now)
-        return eow.strftime("%Y-%m-%d")
-
-    # 1) Строгое ISO YYYY-MM-DD — разбираем сами, без dateutil
-    m = ISO_DATE_RE.fullmatch(s)
-    if m:
-        y, mth, d = map(int, m.groups())
-        from datetime import date as _date
-        try:
-            _ = _date(y, mth, d)  # валидация
-            return f"{y:04d}-{mth:02d}-{d:02d}"
-        except Exception:
-            return None
-
-    # 2) Всё остальное — через dateutil (dayfirst=True)
-    try:
-        from dateutil import parser as dateparser
-        d = dateparser.parse(s, dayfirst=True, fuzzy=True, default=now)
-        return d.strftime("%Y-%m-%d") if d else None
-    except Exception:
-        return None
-
-
 async def approve_and_start(task_id: int, q, context):
     t = get_task(task_id)
     if not t["assignee"] or not t["telegram_id"] or not t["deadline"]:
@@ -516,26 +477,6 @@ def km_deadline_quick(context_tag: str, task_id: int | None = None):
 def _date_add_days(base: datetime, days: int) -> str:
     return (base + timedelta(days=days)).strftime("%Y-%m-%d")
 
-_WEEKDAYS_MAP = {
-    "понедельник":0, "понедельникa":0, "к понедельнику":0,
-    "вторник":1, "ко вторнику":1,
-    "среда":2, "среду":2, "к среде":2,
-    "четверг":3, "к четвергу":3,
-    "пятница":4, "пятницу":4, "к пятнице":4,
-    "суббота":5, "субботу":5, "к субботе":5,
-    "воскресенье":6, "воскресеньеu":6, "к воскресенью":6,
-}
-
-def _next_weekday(from_dt: datetime, target_wd: int) -> datetime:
-    cur = from_dt
-    delta = (target_wd - cur.weekday()) % 7
-    return cur + timedelta(days=delta if delta != 0 else 0)
-
-def _end_of_week(from_dt: datetime) -> datetime:
-    # Воскресенье текущей недели (или сегодня, если уже воскресенье)
-    delta = 6 - from_dt.weekday()
-    return from_dt + timedelta(days=max(0, delta))
-
 async def send_checktasks_carousel_refresh(q, context):
     uid = str(q.from_user.id)
     rows = fetch_proposed_tasks(100)
@@ -696,7 +637,7 @@ async def nt_deadline(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Сейчас не создаём задачу. Если нужна новая — командуй /newtask.")
         return ConversationHandler.END
 
-    nd_raw = parse_any_date(update.message.text or "")
+    nd_raw = parse_deadline(update.message.text or "")
     nd = _ensure_future_or_today(nd_raw)
     if not nd:
         await update.message.reply_text("Дедлайн в прошлом нельзя. Дай 2025-09-01 / «завтра».")
@@ -828,7 +769,10 @@ async def on_group_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 assignee_name, assignee_tid = n, tid
                 break
     if not assignee_name:
+        # LLM не назвал исполнителя: имя в тексте, иначе уверенная подсказка по истории задач
         cand, _ = detect_assignee(task_text, names)
+        cand = cand or confident_pick(
+            await asyncio.to_thread(recommend_assignees, llm.get("description") or task_text, names=names))
         if cand:
             for n, tid in list_unique_assignees():
                 if n == cand:
@@ -876,22 +820,47 @@ async def on_group_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_chat.type not in (ChatType.GROUP, ChatType.SUPERGROUP):
         return
     chat = msg.chat
-    file_id = None
-    if msg.voice:
-        file_id = msg.voice.file_id
-    elif msg.audio:
-        file_id = msg.audio.file_id
-    else:
-        file_id = None
-    if not file_id:
+    media = msg.voice or msg.audio
+    if not media or not media.file_id:
         return
+    if media.duration is not None and media.duration < VOICE_MIN_DURATION_S:
+        return  # слишком короткое — не тратим скачивание и Whisper
 
     uname = msg.from_user.username or ""      # может быть пусто у пользователя без @username
     fname = msg.from_user.full_name or ""
 
-    VOICE_BUFFER.setdefault(str(chat.id), []).append(
-        (msg.message_id, uname, fname, file_id, msg.date)
-)
+    item = (msg.message_id, uname, fname, media.file_id, media.file_unique_id or "", media.duration or 0, msg.date)
+    VOICE_BUFFER.setdefault(str(chat.id), []).append(item)
+    VOICE_QUEUE.put_nowait((context.bot, str(chat.id), item))
+
+async def _transcribe_buffered_voice(bot, chat_id: str, item):
+    pending = VOICE_BUFFER.get(chat_id, [])
+    if item not in pending:
+        return  # уже забрал дайджест
+    pending.remove(item)
+    mid, uname, fname, file_id, fuid, dur, dt = item
+    t0 = time.perf_counter()
+    text, cached = await transcribe_voice(bot, file_id, fuid, dur)
+    if not text:
+        VOICE_BUFFER.setdefault(chat_id, []).append(item)  # не вышло — дайджест попробует ещё раз
+        return
+    MESSAGE_BUFFER.setdefault(chat_id, []).append((mid, uname, fname, text, dt))
+    logger.info("Voice transcribed from chat %s by @%s (%s) in %.1fs (audio %ss, cached=%s): %s",
+                chat_id, uname or "—", fname, time.perf_counter() - t0, dur, cached, text)
+
+async def _voice_worker():
+    while True:
+        bot, chat_id, item = await VOICE_QUEUE.get()
+        try:
+            await _transcribe_buffered_voice(bot, chat_id, item)
+        except Exception:
+            logger.exception("Voice worker failed: chat=%s msg=%s", chat_id, item[0])
+        finally:
+            VOICE_QUEUE.task_done()
+
+async def _start_voice_workers(app: Application):
+    for _ in range(max(1, VOICE_TRANSCRIBE_CONCURRENCY)):
+        VOICE_WORKERS.append(asyncio.create_task(_voice_worker()))
 
 # --------------------------------------------------------------------------------
 # /checktasks — карусель всех proposed
@@ -944,20 +913,23 @@ async def currentflow_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # --------------------------------------------------------------------------------
 # /report — выгрузка CSV
 # --------------------------------------------------------------------------------
-async def report_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    uid = str(update.effective_user.id)
-    if uid not in ALLOWED_FLOW_VIEWERS:
-        await update.message.reply_text("Не-а. Доступ к отчётам только у шефа и помощника.")
-        return
-
-    rows = get_all_tasks()
+def build_tasks_csv_report():
+    """
+    CSV по всем задачам для /report. Строки идут из курсора пачками и сразу пишутся
+    в буфер (utf-8-sig, «;», CRLF) — весь отчёт целиком в памяти не собираем.
+    Без записей в базу с прошлой сборки отдаётся из кэша отчётов.
+    Возвращает (имя_файла, поток), поток закрывает вызывающий.
+    """
+    filename = f"tasks_report_{datetime.now(TZINFO).strftime('%Y%m%d_%H%M')}.csv"
+    return cached_report("tasks_csv", None, filename, _render_tasks_csv)
 
+def _render_tasks_csv():
     def yesno(v: bool) -> str:
         return "Да" if v else "Нет"
 
-    buf = io.StringIO()
-    
-    writer = csv.writer(buf, delimiter=";", lineterminator="\r\n")
+    buf = new_report_buffer()
+    f = io.TextIOWrapper(buf, encoding="utf-8-sig", newline="")
+    writer = csv.writer(f, delimiter=";", lineterminator="\r\n")
 
     writer.writerow([
         "ID", "Текст задачи", "Статус", "Назначен исполнитель?", "Исполнитель", "Дедлайн",
@@ -965,11 +937,10 @@ async def report_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Был ли перенос?", "Даты переносов и кем"
     ])
 
-    for r in rows:
+    for r, reas, dchs in iter_tasks_with_history():
         assigned = bool((r["assignee"] or "").strip() and (r["telegram_id"] or "").strip())
 
         # Переназначения
-        reas = get_reassignments_for_task(r["id"])
         had_reassign = len(reas) > 0
         reassign_strs = []
         for x in reas:
@@ -984,7 +955,6 @@ async def report_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reassign_strs.append(f"{x['old_assignee']} → {x['new_assignee']} {dstr}{by}")
 
         # Переносы дедлайнов
-        dchs = get_deadline_changes_for_task(r["id"])
         had_postpone = len(dchs) > 0
         postpone_strs = []
         for d in dchs:
@@ -1001,13 +971,26 @@ async def report_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             yesno(had_postpone), "; ".join(postpone_strs) or "—"
         ])
 
-    data = buf.getvalue().encode("utf-8-sig")
-    filename = f"tasks_report_{datetime.now(TZINFO).strftime('%Y%m%d_%H%M')}.csv"
+    f.flush()
+    f.detach()  # буфер остаётся открытым
+    buf.seek(0)
+    return buf
 
-    await update.message.reply_document(
-        document=InputFile(io.BytesIO(data), filename=filename),
-        caption="Готов отчёт."
-    )
+async def report_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = str(update.effective_user.id)
+    if uid not in ALLOWED_FLOW_VIEWERS:
+        await update.message.reply_text("Не-а. Доступ к отчётам только у шефа и помощника.")
+        return
+
+    # выборка + сериализация синхронные — уводим из event loop, чтобы бот не замирал на больших базах
+    filename, buf = await asyncio.to_thread(build_tasks_csv_report)
+    try:
+        await update.message.reply_document(
+            document=InputFile(buf, filename=filename),
+            caption="Готов отчёт."
+        )
+    finally:
+        buf.close()
 
 async def outdated_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     today_str = datetime.now(TZINFO).strftime("%Y-%m-%d")
@@ -1228,8 +1211,9 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         if action == "reassign":
-            rows = [(n, tid) for n, tid in list_unique_assignees() if str(tid or "").strip()]
-            kb = [[B(n, callback_data=f"rv_reassign_to:{task_id}:{tid}")] for n, tid in rows]
+            t = get_task(task_id)
+            choices = await asyncio.to_thread(reassign_choices, t["task"] if t else "", t["assignee"] if t else "")
+            kb = [[B(label, callback_data=f"rv_reassign_to:{task_id}:{tid}")] for label, tid in choices]
             src = "flow" if (uid in FLOW_STATE and FLOW_STATE[uid].get("msg_id") == q.message.message_id) else "check"
             context.user_data["rv_origin"] = src
             await q.message.reply_text("Кому переназначаем?", reply_markup=KM(kb))
@@ -1443,8 +1427,9 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if data.startswith("reassign:"):
         task_id = int(data.split(":")[1])
-        buttons = [[B(n, callback_data=f"reassign_to:{task_id}:{tid}")]
-           for n, tid in list_unique_assignees() if str(tid or "").strip()]
+        t = get_task(task_id)
+        choices = await asyncio.to_thread(reassign_choices, t["task"] if t else "", t["assignee"] if t else "")
+        buttons = [[B(label, callback_data=f"reassign_to:{task_id}:{tid}")] for label, tid in choices]
         await q.message.reply_text("Кому перекидываем?", reply_markup=KM(buttons))
         return
 
@@ -1603,7 +1588,7 @@ async def on_private_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if context.user_data.get("rv_step") == "deadline_edit":
         task_id = int(context.user_data.get("rv_edit_task"))
-        nd_raw = parse_any_date(text)
+        nd_raw = parse_deadline(text)
         nd = _ensure_future_or_today(nd_raw)
         if not nd:
             await msg.reply_text("Дедлайн в прошлом нельзя. Дай вид 2025-09-01 или «завтра».")
@@ -1618,7 +1603,7 @@ async def on_private_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if "await_deadline" in context.user_data:
         task_id = int(context.user_data.pop("await_deadline"))
-        nd_raw = parse_any_date(text)
+        nd_raw = parse_deadline(text)
         nd = _ensure_future_or_today(nd_raw)
         if not nd:
             await msg.reply_text("Нельзя ставить дату в прошлом. Дай 2025-09-01 / «завтра».")
@@ -1629,7 +1614,7 @@ async def on_private_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if "await_deadline_take" in context.user_data:
         task_id = int(context.user_data.pop("await_deadline_take"))
-        nd_raw = parse_any_date(text)
+        nd_raw = parse_deadline(text)
         nd = _ensure_future_or_today(nd_raw)
         if not nd:
             await msg.reply_text("Нельзя ставить дату в прошлом. Дай 2025-09-01 / «завтра».")
@@ -1668,85 +1653,101 @@ async def testdigest_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Прогнал вечерний дайджест вручную.")
 
 async def evening_digest(context: ContextTypes.DEFAULT_TYPE):
-    # 1) Голосовые → текст
-    for chat_id, items in list(VOICE_BUFFER.items()):
-        for (mid, uname, fname, file_id, dt) in items:
-            try:
-                text = await transcribe_telegram_file(context.bot, file_id)
-            except Exception:
-                text = ""
+    # 1) Голосовые → текст. Обычно их уже расшифровали фоновые воркеры; ждём хвост очереди
+    #    и добираем оставшееся (не успели / ошибка) одной пачкой через кэш по file_unique_id
+    if VOICE_WORKERS:
+        try:
+            await asyncio.wait_for(VOICE_QUEUE.join(), timeout=VOICE_DIGEST_WAIT_S)
+        except asyncio.TimeoutError:
+            logger.warning("DIGEST voice: очередь не разобрана за %ss, добираем сами", VOICE_DIGEST_WAIT_S)
+    voices = [(chat_id, it) for chat_id, items in list(VOICE_BUFFER.items()) for it in items]
+    VOICE_BUFFER.clear()
+    if voices:
+        texts, vstats = await transcribe_voice_batch(
+            context.bot, [(file_id, fuid, dur) for _, (_, _, _, file_id, fuid, dur, _) in voices]
+        )
+        logger.info("DIGEST voice: %s", vstats)
+        for (chat_id, (mid, uname, fname, _, _, _, dt)), text in zip(voices, texts):
             if text:
                 # сохраняем уже в «текстовый» буфер с username/full_name
                 MESSAGE_BUFFER.setdefault(chat_id, []).append((mid, uname, fname, text, dt))
                 logger.info(f"Voice transcribed from chat {chat_id} by @{uname or '—'} ({fname}): {text}")
-        VOICE_BUFFER[chat_id] = []
 
-    # 2) LLM-фильтр
+    # 2) LLM-фильтр. Буфер забираем целиком сразу: то, что придёт во время разбора
+    #    (тексты, поздние расшифровки), останется на следующий дайджест, а не сотрётся
     created = 0
-    for chat_id, items in list(MESSAGE_BUFFER.items()):
-        for (mid, username, full_name, text, dt) in items:
-            if not text:
-                continue
-
-            msg_link = _tg_message_link(chat_id, mid)
-            names = get_assignee_name_list()
-            llm = llm_route(
-                text, names,
-                author_username=(username or "—"),
-                message_date=dt.astimezone(TZINFO).strftime("%Y-%m-%d"),
-                message_link=msg_link
-            ) or {}
-
-            is_task = bool(llm.get("looks_like_task")) if llm else looks_like_task(text)
-            pr      = (llm.get("priority") or "normal") if llm else extract_priority(text)
-            dl      = (llm.get("deadline") or None)     if llm else extract_deadline(text)
-            ass_llm = llm.get("assignee") if llm else None
-
-            logger.info(
-                "DIGEST LLM: is_task=%s conf=%s pr=%s dl=%s assignee=%s text=%r",
-                is_task, (llm.get("confidence") if llm else None), pr, dl, ass_llm, text
-            )
-
-            if not is_task:
-                continue
+    messages = dict(MESSAGE_BUFFER)
+    MESSAGE_BUFFER.clear()
+    rows = [(chat_id, it) for chat_id, items in messages.items() for it in items if it[3]]
+    names = get_assignee_name_list()
+    # эвристики на всю пачку разом — фолбэк для сообщений, по которым LLM не ответил
+    heur = analyze_batch([it[3] for _, it in rows], names)
+    clf = get_classifier()  # обученная на ревью модель (classifier.py), если есть
+    for i, (chat_id, (mid, username, full_name, text, dt)) in enumerate(rows):
+        score = clf.score(text) if clf else None
+        if score is not None and score < CLASSIFIER_PREFILTER:
+            logger.info("DIGEST prefilter: score=%.3f < %s, skip text=%r", score, CLASSIFIER_PREFILTER, text)
+            continue
+
+        msg_link = _tg_message_link(chat_id, mid)
+        llm = llm_route(
+            text, names,
+            author_username=(username or "—"),
+            message_date=dt.astimezone(TZINFO).strftime("%Y-%m-%d"),
+            message_link=msg_link
+        ) or {}
+
+        fallback_task = score >= clf.threshold if clf else heur["looks_like_task"][i]
+        is_task = bool(llm.get("looks_like_task")) if llm else fallback_task
+        pr      = (llm.get("priority") or "normal") if llm else heur["priority"][i]
+        dl      = (llm.get("deadline") or None)     if llm else heur["deadline"][i]
+        ass_llm = llm.get("assignee") if llm else None
+
+        logger.info(
+            "DIGEST LLM: is_task=%s conf=%s clf=%s pr=%s dl=%s assignee=%s text=%r",
+            is_task, (llm.get("confidence") if llm else None), score, pr, dl, ass_llm, text
+        )
 
-            assignee_name, assignee_tid = None, None
-            if ass_llm:
-                for n, tid in list_unique_assignees():
-                    if n == ass_llm:
-                        assignee_name, assignee_tid = n, tid
-                        break
+        if not is_task:
+            continue
 
-            desc = (llm.get("description") or text).strip()
-            desc = iso_to_human_in_text(desc)
+        # LLM не назвал исполнителя: имя в тексте, иначе уверенная подсказка по истории задач
+        assignee_name, assignee_tid = None, None
+        cand = ass_llm or heur["assignee"][i] or confident_pick(
+            await asyncio.to_thread(recommend_assignees, llm.get("description") or text, names=names))
+        if cand:
+            for n, tid in list_unique_assignees():
+                if n == cand:
+                    assignee_name, assignee_tid = n, tid
+                    break
 
-            task_id = insert_task(
-                desc, assignee_name or "", assignee_tid or "", dl or "",
-                priority=pr, source="digest", source_chat_id=str(chat_id), source_message_id=mid,
-                status="proposed", link=(llm.get("source_link") or msg_link or "")
-            )
-            logger.info("DIGEST: created proposed task_id=%s chat=%s msg=%s desc=%r", task_id, chat_id, mid, desc)
-            created += 1
-
-            # уведомляем ассистентов
-            pr_h = "Важная 🔥" if pr == "high" else "Обычная"
-            assignee_line = fmt_assignee_with_nick(assignee_name or "—", assignee_tid)
-            link_line = f"\n🔗 Оригинал: {msg_link}" if msg_link else ""
-
-            await notify_assistants(
-                context,
-                "Обнаружена задача (вечерний разбор) — нужно подтвердить\n\n"
-                f"🧩 Описание: {h(desc)}\n"
-                f"🤡 Исполнитель: {assignee_line}\n"
-                f"📅 Дедлайн: {fmt_date_human(dl)}\n"
-                f"❗️ Приоритет: {pr_h}\n"
-                f"ID: #{task_id}"
-                f"{link_line}\n\n"
-                "Введите команду /checktasks, чтобы подтвердить и отправить в работу"
-            )
+        desc = (llm.get("description") or text).strip()
+        desc = iso_to_human_in_text(desc)
 
-    # чистим буфер
-    MESSAGE_BUFFER.clear()
+        task_id = insert_task(
+            desc, assignee_name or "", assignee_tid or "", dl or "",
+            priority=pr, source="digest", source_chat_id=str(chat_id), source_message_id=mid,
+            status="proposed", link=(llm.get("source_link") or msg_link or "")
+        )
+        logger.info("DIGEST: created proposed task_id=%s chat=%s msg=%s desc=%r", task_id, chat_id, mid, desc)
+        created += 1
+
+        # уведомляем ассистентов
+        pr_h = "Важная 🔥" if pr == "high" else "Обычная"
+        assignee_line = fmt_assignee_with_nick(assignee_name or "—", assignee_tid)
+        link_line = f"\n🔗 Оригинал: {msg_link}" if msg_link else ""
+
+        await notify_assistants(
+            context,
+            "Обнаружена задача (вечерний разбор) — нужно подтвердить\n\n"
+            f"🧩 Описание: {h(desc)}\n"
+            f"🤡 Исполнитель: {assignee_line}\n"
+            f"📅 Дедлайн: {fmt_date_human(dl)}\n"
+            f"❗️ Приоритет: {pr_h}\n"
+            f"ID: #{task_id}"
+            f"{link_line}\n\n"
+            "Введите команду /checktasks, чтобы подтвердить и отправить в работу"
+        )
 
     # короткий итог ассистентам и шефу
     summary = f"⏰ Вечерний разбор: найдено задач-кандидатов: {created}.\nОткрой /checktasks для подтверждения."
@@ -1774,7 +1775,7 @@ async def nt_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 def build_app():
-    app = Application.builder().token(BOT_TOKEN).build()
+    app = Application.builder().token(BOT_TOKEN).post_init(_start_voice_workers).build()
     app.add_handler(
         MessageHandler(filters.ChatType.PRIVATE & filters.COMMAND, first_touch_check),
         group=-1
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Локальный классификатор «сообщение — задача?», обученный на истории ревью кандидатов.
+
+Метки — решения ассистентов: одобренные (open / in_progress / done) = 1, снятые (cancelled,
+с любой cancel_reason) = 0, неразобранные (proposed) не берём. Признаки — хэшированные
+(crc32, стабилен между запусками, в отличие от hash()) слова, основы (первые 5 букв — грубо
+против падежей) и биграммы; модель — логистическая регрессия, SGD на чистом Python.
+Веса храним разреженно в JSON (CLASSIFIER_PATH). Оценка сообщения — десяток поисков в словаре.
+
+Обучаемся на тексте карточки (после правок ассистентов), а оцениваем сырые сообщения чата —
+поэтому классификатор только отсекает явный шум до LLM и подстраховывает, когда LLM недоступен.
+
+    python classifier.py train [--epochs 8] [--sources digest,mention]
+    python classifier.py eval [--holdout 0.2]     # обучение на старых, проверка на свежих решениях
+    python classifier.py score "Маша, подготовь отчёт к пятнице"
+"""
+import os, re, sys, json, math, time, zlib, random, argparse
+import logging
+
+from app_config import CLASSIFIER_PATH
+
+logger = logging.getLogger("bot.classifier")
+
+N_BUCKETS = 1 << 18
+STEM_LEN = 5
+APPROVED_STATUSES = ("open", "in_progress", "done")
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def features(text: str) -> list[int]:
+    """Текст → номера корзин (без повторов): w:слово, s:основа, b:биграмма."""
+    words = _WORD_RE.findall((text or "").lower().replace("ё", "е"))
+    keys = {"w:" + w for w in words}
+    keys.update("s:" + w[:STEM_LEN] for w in words if len(w) > STEM_LEN)
+    keys.update(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+    return [zlib.crc32(k.encode()) & (N_BUCKETS - 1) for k in keys]
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+class TaskClassifier:
+    def __init__(self, weights: dict[int, float], bias: float, threshold: float = 0.5, meta: dict | None = None):
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+        self.meta = meta or {}
+
+    def score(self, text: str) -> float:
+        """Вероятность, что ассистенты одобрят сообщение как задачу."""
+        w = self.weights
+        return _sigmoid(self.bias + sum(w.get(f, 0.0) for f in features(text)))
+
+    def is_task(self, text: str) -> bool:
+        return self.score(text) >= self.threshold
+
+    def save(self, path: str = CLASSIFIER_PATH):
+        data = {"n_buckets": N_BUCKETS, "stem_len": STEM_LEN, "bias": self.bias, "threshold": self.threshold,
+                "meta": self.meta, "weights": {str(k): round(v, 6) for k, v in self.weights.items() if v}}
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)  # бот читает файл на лету — подменяем целиком
+
+    @classmethod
+    def load(cls, path: str = CLASSIFIER_PATH) -> "TaskClassifier":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("n_buckets") != N_BUCKETS or data.get("stem_len") != STEM_LEN:
+            raise ValueError(f"{path}: модель обучена с другими признаками — переобучите")
+        return cls({int(k): v for k, v in data["weights"].items()}, data["bias"],
+                   data.get("threshold", 0.5), data.get("meta"))
+
+
+def train(samples, *, epochs: int = 8, lr: float = 0.2, l2: float = 1e-5, seed: int = 7) -> TaskClassifier:
+    """
+    samples — [(text, label 0/1)]. Классы взвешиваем обратно частоте: одобряют обычно
+    большинство кандидатов, без весов модель выучит «всегда да».
+    """
+    data = [(features(t), y) for t, y in samples]
+    n_pos = sum(y for _, y in data)
+    n_neg = len(data) - n_pos
+    if not n_pos or not n_neg:
+        raise ValueError("нужны и одобренные, и снятые кандидаты")
+    cw = {1: len(data) / (2 * n_pos), 0: len(data) / (2 * n_neg)}
+
+    weights: dict[int, float] = {}
+    bias = 0.0
+    rnd = random.Random(seed)
+    for epoch in range(epochs):
+        rnd.shuffle(data)
+        step = lr / math.sqrt(1 + epoch)
+        for feats, y in data:
+            p = _sigmoid(bias + sum(weights.get(f, 0.0) for f in feats))
+            g = (p - y) * cw[y] * step
+            bias -= g
+            for f in feats:
+                w = weights.get(f, 0.0)
+                weights[f] = w - g - step * l2 * w  # L2 — только по активным признакам (ленивая)
+    meta = {"samples": len(data), "positives": n_pos, "epochs": epochs,
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    return TaskClassifier(weights, bias, 0.5, meta)
+
+
+_LOADED: tuple = (None, None)  # ((путь, mtime), модель)
+
+def get_classifier(path: str = CLASSIFIER_PATH) -> TaskClassifier | None:
+    """Обученная модель или None (файла нет / битый). Перечитывается, когда файл подменили."""
+    global _LOADED
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _LOADED[0] != (path, mtime):
+        try:
+            _LOADED = ((path, mtime), TaskClassifier.load(path))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("classifier: не загрузил %s: %s", path, e)
+            _LOADED = ((path, mtime), None)
+    return _LOADED[1]
+
+
+# ---------- CLI ----------
+def _samples(sources):
+    from db import get_review_history
+    rows = get_review_history(tuple(sources) if sources else None)
+    return [(r["task"], int(r["status"] in APPROVED_STATUSES)) for r in rows if (r["task"] or "").strip()]
+
+def _metrics(y_true, scores, threshold):
+    tp = sum(1 for y, s in zip(y_true, scores) if y and s >= threshold)
+    fp = sum(1 for y, s in zip(y_true, scores) if not y and s >= threshold)
+    fn = sum(1 for y, s in zip(y_true, scores) if y and s < threshold)
+    tn = len(y_true) - tp - fp - fn
+    prec = tp / (tp + fp) if tp + fp else 0.0
+    rec = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * prec * rec / (prec + rec) if prec + rec else 0.0
+    return {"accuracy": (tp + tn) / len(y_true), "precision": prec, "recall": rec, "f1": f1}
+
+def _auc(y_true, scores):
+    """ROC AUC через ранги (Манн — Уитни), ничьи — средним рангом."""
+    order = sorted(range(len(scores)), key=scores.__getitem__)
+    ranks = [0.0] * len(scores)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and scores[order[j + 1]] == scores[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    n_pos = sum(y_true)
+    n_neg = len(y_true) - n_pos
+    if not n_pos or not n_neg:
+        return float("nan")
+    return (sum(r for r, y in zip(ranks, y_true) if y) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+def cmd_train(args):
+    samples = _samples(args.sources)
+    if len(samples) < args.min_samples:
+        print(f"[classifier] мало данных: {len(samples)} решений (нужно от {args.min_samples})")
+        return 1
+    t0 = time.perf_counter()
+    model = train(samples, epochs=args.epochs)
+    model.save(args.out)
+    print(f"[classifier] train: {model.meta['samples']} samples ({model.meta['positives']} approved), "
+          f"{len(model.weights)} weights → {args.out} ({time.perf_counter() - t0:.2f} s)")
+    return 0
+
+def cmd_eval(args):
+    from nlp import looks_like_task
+    samples = _samples(args.sources)
+    cut = int(len(samples) * (1 - args.holdout))
+    fit, test = samples[:cut], samples[cut:]
+    if len(fit) < args.min_samples or not test:
+        print(f"[classifier] мало данных: {len(samples)} решений")
+        return 1
+    model = train(fit, epochs=args.epochs)
+    texts = [t for t, _ in test]
+    y = [lbl for _, lbl in test]
+    t0 = time.perf_counter()
+    scores = [model.score(t) for t in texts]
+    us = (time.perf_counter() - t0) / len(texts) * 1e6
+    kw = [1.0 if looks_like_task(t) else 0.0 for t in texts]
+
+    print(f"train {len(fit)} / test {len(test)} (последние по времени), одобрено в тесте {sum(y) / len(y):.0%}")
+    for name, s in (("classifier", scores), ("keywords  ", kw)):
+        m = _metrics(y, s, model.threshold if s is scores else 0.5)
+        print(f"{name}: acc {m['accuracy']:.3f}  P {m['precision']:.3f}  R {m['recall']:.3f}  "
+              f"F1 {m['f1']:.3f}  AUC {_auc(y, s):.3f}")
+    print(f"score: {us:.1f} µs/message")
+    # порог пре-фильтра: сколько сообщений не пойдёт в LLM и сколько одобренных потеряем
+    for thr in (0.05, 0.1, 0.2, 0.3):
+        skipped = sum(1 for s in scores if s < thr)
+        lost = sum(1 for s, lbl in zip(scores, y) if lbl and s < thr)
+        print(f"prefilter < {thr:.2f}: skip {skipped / len(scores):.0%} of messages, "
+              f"lose {lost / max(1, sum(y)):.1%} of approved")
+    return 0
+
+def cmd_score(args):
+    model = get_classifier(args.model)
+    if model is None:
+        print(f"[classifier] нет модели {args.model} — сначала train")
+        return 1
+    for text in args.text:
+        print(f"{model.score(text):.3f}  {text}")
+    return 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="local task classifier (review history)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sources = dict(type=lambda v: [s.strip() for s in v.split(",") if s.strip()], default=None,
+                   help="источники кандидатов через запятую (digest,mention,api,manual); по умолчанию все")
+
+    p = sub.add_parser("train", help="обучить на решениях ассистентов и сохранить")
+    p.add_argument("--out", default=CLASSIFIER_PATH)
+    p.add_argument("--epochs", type=int, default=8)
+    p.add_argument("--min-samples", type=int, default=50)
+    p.add_argument("--sources", **sources)
+    p.set_defaults(func=cmd_train)
+
+    p = sub.add_parser("eval", help="офлайн-оценка: обучение на старых, проверка на свежих решениях")
+    p.add_argument("--holdout", type=float, default=0.2)
+    p.add_argument("--epochs", type=int, default=8)
+    p.add_argument("--min-samples", type=int, default=50)
+    p.add_argument("--sources", **sources)
+    p.set_defaults(func=cmd_eval)
+
+    p = sub.add_parser("score", help="оценить тексты сохранённой моделью")
+    p.add_argument("text", nargs="+")
+    p.add_argument("--model", default=CLASSIFIER_PATH)
+    p.set_defaults(func=cmd_score)
+
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Обслуживание счётчиков отчётов (task_counters / task_open_gauge, их ведут триггеры в db.py).
+
+    python counters.py verify    # сверить со сканом базовых таблиц, код выхода 1 при расхождениях
+    python counters.py rebuild   # пересчитать с нуля (после ручных правок базы, восстановления бэкапа и т.п.)
+"""
+import sys, time, argparse
+
+from db import rebuild_counters, verify_counters
+
+
+def cmd_verify(args):
+    t0 = time.perf_counter()
+    diffs = verify_counters()
+    dt = time.perf_counter() - t0
+    for line in diffs[:args.limit]:
+        print(line)
+    if len(diffs) > args.limit:
+        print(f"... ещё {len(diffs) - args.limit}")
+    print(f"[counters] verify: {'OK' if not diffs else f'{len(diffs)} расхождений'} ({dt:.2f} s)")
+    return 1 if diffs else 0
+
+
+def cmd_rebuild(args):
+    t0 = time.perf_counter()
+    rebuild_counters()
+    print(f"[counters] rebuild: done ({time.perf_counter() - t0:.2f} s)")
+    return 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="task counters maintenance")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("verify", help="сверить счётчики со сканом таблиц")
+    p.add_argument("--limit", type=int, default=50, help="сколько расхождений печатать")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("rebuild", help="пересчитать счётчики с нуля")
+    p.set_defaults(func=cmd_rebuild)
+
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 import sqlite3
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import threading
+from collections import OrderedDict
+from functools import wraps
 from app_config import DB_PATH
 import json
 # ---------- ВСПОМОГАТЕЛЬНО: авто-миграции под новые поля ----------
@@ -10,6 +13,123 @@ def _column_names(c, table):
     rows = c.execute(f"PRAGMA table_info({table});").fetchall()
     return {r[1] for r in rows}  # set of column names
 
+# ---------- счётчики для отчётов (поддерживаются триггерами) ----------
+# task_counters: часовые корзины UTC ('YYYY-MM-DDTHH') × исполнитель. Счётчики — функция ТЕКУЩЕГО
+# содержимого таблиц (а не журнал событий), поэтому rebuild детерминирован, а verify сравнивает точно:
+#   opened     — задачи, созданные в этот час, по текущему исполнителю;
+#   closed     — задачи в статусе done, по часу updated_at (ровно как считал count_closed_between);
+#   cancelled  — то же для cancelled;
+#   postponed  — строки deadline_changes по часу at, по текущему исполнителю задачи;
+#   reassigned — строки task_reassignments по часу at, по новому исполнителю.
+# task_open_gauge: open/in_progress по (исполнитель, дедлайн) — для «в работе» и «просрочено».
+_OPEN_LIKE = "('open','in_progress')"
+
+def _h(expr):
+    return f"COALESCE(substr({expr}, 1, 13), '')"
+
+def _t(expr):
+    return f"COALESCE({expr}, '')"
+
+def _bump(col, hour, tid, delta, cond="1"):
+    return f"""
+      INSERT OR IGNORE INTO task_counters(hour, telegram_id) SELECT {hour}, {tid} WHERE {cond};
+      UPDATE task_counters SET {col} = {col} + ({delta}) WHERE hour = {hour} AND telegram_id = {tid} AND {cond};"""
+
+def _gauge(tid, deadline, delta, cond):
+    return f"""
+      INSERT OR IGNORE INTO task_open_gauge(telegram_id, deadline, n) SELECT {tid}, {deadline}, 0 WHERE {cond};
+      UPDATE task_open_gauge SET n = n + ({delta}) WHERE telegram_id = {tid} AND deadline = {deadline} AND {cond};"""
+
+def _move_postponed(task_id, src, dst, cond="1"):
+    """Переносы задачи task_id переезжают со счётчика исполнителя src на dst (смена исполнителя / удаление)."""
+    per_hour = f"(SELECT COUNT(*) FROM deadline_changes d WHERE d.task_id = {task_id} AND {_h('d.at')} = task_counters.hour)"
+    hours = f"(SELECT {_h('d.at')} FROM deadline_changes d WHERE d.task_id = {task_id})"
+    return f"""
+      INSERT OR IGNORE INTO task_counters(hour, telegram_id)
+        SELECT DISTINCT {_h('d.at')}, {dst} FROM deadline_changes d WHERE d.task_id = {task_id} AND {cond};
+      UPDATE task_counters SET postponed = postponed - {per_hour} WHERE telegram_id = {src} AND hour IN {hours} AND {cond};
+      UPDATE task_counters SET postponed = postponed + {per_hour} WHERE telegram_id = {dst} AND hour IN {hours} AND {cond};"""
+
+def _task_state(row, sign):
+    """Вклад одной строки tasks (NEW/OLD) во все счётчики со знаком sign."""
+    tid = _t(f"{row}.telegram_id")
+    return "".join([
+        _bump("opened", _h(f"{row}.created_at"), tid, sign),
+        _bump("closed", _h(f"{row}.updated_at"), tid, sign, f"{row}.status = 'done'"),
+        _bump("cancelled", _h(f"{row}.updated_at"), tid, sign, f"{row}.status = 'cancelled'"),
+        _gauge(tid, _t(f"{row}.deadline"), sign, f"{row}.status IN {_OPEN_LIKE}"),
+    ])
+
+def _task_tid(task_id):
+    return _t(f"(SELECT telegram_id FROM tasks WHERE id = {task_id})")
+
+_COUNTER_TRIGGERS = {
+    "trg_tasks_counters_ins": f"AFTER INSERT ON tasks BEGIN {_task_state('NEW', 1)} END;",
+    "trg_tasks_counters_del": f"""AFTER DELETE ON tasks BEGIN {_task_state('OLD', -1)}
+        {_move_postponed('OLD.id', _t('OLD.telegram_id'), "''")}
+        DELETE FROM task_open_gauge WHERE n = 0; END;""",
+    "trg_tasks_counters_upd": f"""AFTER UPDATE OF status, updated_at, created_at, telegram_id, deadline ON tasks
+        WHEN OLD.status IS NOT NEW.status OR OLD.updated_at IS NOT NEW.updated_at
+          OR OLD.created_at IS NOT NEW.created_at OR OLD.telegram_id IS NOT NEW.telegram_id
+          OR OLD.deadline IS NOT NEW.deadline
+        BEGIN {_task_state('OLD', -1)} {_task_state('NEW', 1)}
+        {_move_postponed('NEW.id', _t('OLD.telegram_id'), _t('NEW.telegram_id'), f"{_t('OLD.telegram_id')} <> {_t('NEW.telegram_id')}")}
+        DELETE FROM task_open_gauge WHERE n = 0; END;""",
+    "trg_deadline_changes_counters_ins": f"""AFTER INSERT ON deadline_changes BEGIN
+        {_bump('postponed', _h('NEW.at'), _task_tid('NEW.task_id'), 1)} END;""",
+    "trg_deadline_changes_counters_del": f"""AFTER DELETE ON deadline_changes BEGIN
+        {_bump('postponed', _h('OLD.at'), _task_tid('OLD.task_id'), -1)} END;""",
+    "trg_deadline_changes_counters_upd": f"""AFTER UPDATE OF at, task_id ON deadline_changes BEGIN
+        {_bump('postponed', _h('OLD.at'), _task_tid('OLD.task_id'), -1)}
+        {_bump('postponed', _h('NEW.at'), _task_tid('NEW.task_id'), 1)} END;""",
+    "trg_task_reassignments_counters_ins": f"""AFTER INSERT ON task_reassignments BEGIN
+        {_bump('reassigned', _h('NEW.at'), _t('NEW.new_telegram_id'), 1)} END;""",
+    "trg_task_reassignments_counters_del": f"""AFTER DELETE ON task_reassignments BEGIN
+        {_bump('reassigned', _h('OLD.at'), _t('OLD.new_telegram_id'), -1)} END;""",
+    "trg_task_reassignments_counters_upd": f"""AFTER UPDATE OF at, new_telegram_id ON task_reassignments BEGIN
+        {_bump('reassigned', _h('OLD.at'), _t('OLD.new_telegram_id'), -1)}
+        {_bump('reassigned', _h('NEW.at'), _t('NEW.new_telegram_id'), 1)} END;""",
+}
+
+# эталон: те же счётчики, посчитанные сканом базовых таблиц (rebuild/verify)
+_COUNTERS_FROM_SCRATCH = f"""
+    SELECT hour, telegram_id, SUM(opened) AS opened, SUM(closed) AS closed, SUM(cancelled) AS cancelled,
+           SUM(postponed) AS postponed, SUM(reassigned) AS reassigned
+      FROM (
+        SELECT {_h('created_at')} AS hour, {_t('telegram_id')} AS telegram_id,
+               1 AS opened, 0 AS closed, 0 AS cancelled, 0 AS postponed, 0 AS reassigned
+          FROM tasks
+        UNION ALL
+        SELECT {_h('updated_at')}, {_t('telegram_id')}, 0, status = 'done', status = 'cancelled', 0, 0
+          FROM tasks WHERE status IN ('done','cancelled')
+        UNION ALL
+        SELECT {_h('d.at')}, {_t('t.telegram_id')}, 0, 0, 0, 1, 0
+          FROM deadline_changes d LEFT JOIN tasks t ON t.id = d.task_id
+        UNION ALL
+        SELECT {_h('at')}, {_t('new_telegram_id')}, 0, 0, 0, 0, 1
+          FROM task_reassignments
+      )
+     GROUP BY hour, telegram_id
+"""
+_GAUGE_FROM_SCRATCH = f"""
+    SELECT {_t('telegram_id')} AS telegram_id, {_t('deadline')} AS deadline, COUNT(*) AS n
+      FROM tasks WHERE status IN {_OPEN_LIKE}
+     GROUP BY 1, 2
+"""
+
+def _rebuild_counters(c):
+    c.execute("DELETE FROM task_counters")
+    c.execute("DELETE FROM task_open_gauge")
+    c.execute(f"""INSERT INTO task_counters(hour, telegram_id, opened, closed, cancelled, postponed, reassigned)
+                  {_COUNTERS_FROM_SCRATCH}""")
+    c.execute(f"INSERT INTO task_open_gauge(telegram_id, deadline, n) {_GAUGE_FROM_SCRATCH}")
+
+# таблицы с эпохой в cache_epoch: любая запись в них инвалидирует кэши (в т.ч. кэш отчётов)
+_EPOCH_TABLES = ("tasks", "task_reassignments", "deadline_changes", "assignees")
+
+# журнал изменений для внешней синхронизации (GET /changes): таблица → колонка с id задачи
+_CHANGE_LOG_TABLES = {"tasks": "id", "deadline_changes": "task_id", "task_reassignments": "task_id"}
+
 def _ensure_schema():
     with sqlite3.connect(DB_PATH) as conn:
         c = conn.cursor()
@@ -28,6 +148,9 @@ def _ensure_schema():
         cols = _column_names(c, "tasks")
         if "link" not in cols:
             c.execute("ALTER TABLE tasks ADD COLUMN link TEXT;")
+        # tasks: meeting_id — задачи, пришедшие пачкой с одной встречи (/zap/new_tasks)
+        if "meeting_id" not in cols:
+            c.execute("ALTER TABLE tasks ADD COLUMN meeting_id TEXT;")
 
         # NEW: outbox для отложенных сообщений
         c.execute("""
@@ -44,11 +167,208 @@ def _ensure_schema():
         #создадим индекс, чтобы быстрее выбирать «дозревшие» записи
         c.execute("CREATE INDEX IF NOT EXISTS idx_outbox_not_before ON outbox(not_before)")
         c.execute("CREATE INDEX IF NOT EXISTS idx_outbox_sent_at ON outbox(sent_at)")
+        # outbox: claimed_at — «аренда» строки отправителем, чтобы scheduler и api_worker не слали дважды
+        cols = _column_names(c, "outbox")
+        if "claimed_at" not in cols:
+            c.execute("ALTER TABLE outbox ADD COLUMN claimed_at TEXT;")
+
+        # NEW: кэш Telegram file_id для уже загруженных отчётов (ключ — sha256 содержимого)
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS report_files (
+          sha256 TEXT PRIMARY KEY,
+          file_id TEXT NOT NULL,
+          filename TEXT,
+          created_at TEXT NOT NULL
+        );
+        """)
+
+        # NEW: эпохи для кэшей — строка на таблицу, триггеры бампают её на любую запись. Процессы
+        # (бот, scheduler, api, cron) делят один файл: перед чтением из кэша в памяти сверяем эпоху
+        # (см. cached_read). Версия данных для кэша отчётов — сумма эпох. PRAGMA data_version не
+        # подходит: он per-connection, а get_conn() каждый раз открывает новое соединение.
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS cache_epoch (
+          entity TEXT PRIMARY KEY,
+          epoch INTEGER NOT NULL
+        );
+        """)
+        c.executemany("INSERT OR IGNORE INTO cache_epoch(entity, epoch) VALUES (?, 0)",
+                      [(t,) for t in _EPOCH_TABLES])
+        # прежняя схема: один общий счётчик data_version — переносим его значение, чтобы версия
+        # отчётов не пошла назад (иначе старая запись report_cache могла бы снова «совпасть»)
+        if c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='data_version'").fetchone():
+            row = c.execute("SELECT version FROM data_version WHERE id=1").fetchone()
+            c.execute("UPDATE cache_epoch SET epoch = epoch + ? WHERE entity='tasks'", (row[0] if row else 0,))
+            for table in _EPOCH_TABLES:
+                for op in ("insert", "update", "delete"):
+                    c.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{op}_version")
+            c.execute("DROP TABLE data_version")
+        for table in _EPOCH_TABLES:
+            for op in ("INSERT", "UPDATE", "DELETE"):
+                c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_epoch
+                AFTER {op} ON {table}
+                BEGIN
+                  UPDATE cache_epoch SET epoch = epoch + 1 WHERE entity = '{table}';
+                END;
+                """)
+
+        # NEW: счётчики для отчётов (см. _COUNTER_TRIGGERS); при первом создании — заполняем сканом
+        fresh = not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='task_counters'").fetchone()
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS task_counters (
+          hour TEXT NOT NULL,          -- UTC 'YYYY-MM-DDTHH'
+          telegram_id TEXT NOT NULL,
+          opened INTEGER NOT NULL DEFAULT 0,
+          closed INTEGER NOT NULL DEFAULT 0,
+          cancelled INTEGER NOT NULL DEFAULT 0,
+          postponed INTEGER NOT NULL DEFAULT 0,
+          reassigned INTEGER NOT NULL DEFAULT 0,
+          PRIMARY KEY (hour, telegram_id)
+        );
+        """)
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS task_open_gauge (
+          telegram_id TEXT NOT NULL,
+          deadline TEXT NOT NULL,
+          n INTEGER NOT NULL DEFAULT 0,
+          PRIMARY KEY (telegram_id, deadline)
+        );
+        """)
+        # переносы задачи ищутся по task_id при смене исполнителя (_move_postponed)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_deadline_changes_task ON deadline_changes(task_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_task_reassignments_task ON task_reassignments(task_id)")
+        for name, body in _COUNTER_TRIGGERS.items():
+            c.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+        if fresh:
+            _rebuild_counters(c)
+
+        # NEW: журнал изменений — триггеры пишут (таблица, id строки) на каждую запись, id монотонно
+        # растёт (AUTOINCREMENT не переиспользует id), он же курсор для GET /changes
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          entity TEXT NOT NULL,        -- tasks / deadline_changes / task_reassignments
+          entity_id INTEGER NOT NULL,
+          task_id INTEGER,
+          at TEXT NOT NULL
+        );
+        """)
+        for table, task_col in _CHANGE_LOG_TABLES.items():
+            for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_changes
+                AFTER {op} ON {table}
+                BEGIN
+                  INSERT INTO change_log(entity, entity_id, task_id, at)
+                  VALUES ('{table}', {row}.id, {row}.{task_col}, strftime('%Y-%m-%dT%H:%M:%SZ', 'now'));
+                END;
+                """)
+
+        # NEW: расшифровки голосовых по file_unique_id (стабилен для пересланного/повторного аудио)
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS voice_transcripts (
+          file_unique_id TEXT PRIMARY KEY,
+          text TEXT NOT NULL,
+          duration INTEGER,            -- секунды, как прислал Telegram
+          created_at TEXT NOT NULL
+        );
+        """)
+
+        # NEW: ключи идемпотентности API (ретраи Zapier) — ключ → task_id, живут до expires_at
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+          key TEXT PRIMARY KEY,
+          task_id INTEGER NOT NULL,
+          created_at TEXT NOT NULL,
+          expires_at TEXT NOT NULL
+        );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires ON idempotency_keys(expires_at)")
+
+        # NEW: кэш готовых отчётов (ключ — вид + параметры + версия данных), вытеснение по last_used_at
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS report_cache (
+          kind TEXT NOT NULL,
+          params TEXT NOT NULL,
+          version INTEGER NOT NULL,
+          data BLOB NOT NULL,
+          created_at TEXT NOT NULL,
+          last_used_at TEXT NOT NULL,
+          PRIMARY KEY (kind, params, version)
+        );
+        """)
 
         conn.commit()
 
 _ensure_schema()
 
+# ---------- кэш чтений в памяти процесса (инвалидация через cache_epoch) ----------
+_epoch_local = threading.local()
+
+def _epoch_conn():
+    """Своё долгоживущее соединение на поток (и процесс — после fork не наследуем) только под сверку эпох."""
+    conn = getattr(_epoch_local, "conn", None)
+    if conn is None or _epoch_local.pid != os.getpid():
+        conn = sqlite3.connect(DB_PATH, isolation_level=None)  # autocommit: каждый SELECT видит свежий коммит
+        _epoch_local.conn, _epoch_local.pid = conn, os.getpid()
+    return conn
+
+def get_cache_epochs(entities) -> tuple:
+    """Эпохи таблиц entities (в том же порядке) — один SELECT по PK."""
+    marks = ",".join("?" * len(entities))
+    got = dict(_epoch_conn().execute(
+        f"SELECT entity, epoch FROM cache_epoch WHERE entity IN ({marks})", tuple(entities)
+    ).fetchall())
+    return tuple(got.get(e, 0) for e in entities)
+
+def cached_read(*entities, maxsize: int = 256):
+    """
+    Кэш результата функции чтения по аргументам, действительный, пока не менялась ни одна из таблиц
+    entities (в ЛЮБОМ процессе — эпохи ведут триггеры). Перед каждым попаданием — сверка эпох
+    (один SELECT по PK), так что устаревшее значение не отдаётся. Списки отдаются копией.
+    """
+    unknown = set(entities) - set(_EPOCH_TABLES)
+    if not entities or unknown:
+        raise ValueError(f"cached_read: нет эпохи для {sorted(unknown) or 'пустого списка'}")
+
+    def deco(fn):
+        cache: OrderedDict = OrderedDict()
+        lock = threading.Lock()
+        stats = {"hits": 0, "misses": 0}
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            # эпоху читаем ДО вызова: запись во время чтения даст лишний промах, но не устаревший кэш
+            epoch = get_cache_epochs(entities)
+            with lock:
+                hit = cache.get(key)
+                if hit is not None and hit[0] == epoch:
+                    cache.move_to_end(key)
+                    stats["hits"] += 1
+                    res = hit[1]
+                    return list(res) if isinstance(res, list) else res
+                stats["misses"] += 1
+            res = fn(*args, **kwargs)
+            with lock:
+                cache[key] = (epoch, res)
+                cache.move_to_end(key)
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return list(res) if isinstance(res, list) else res
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        wrapper.cache_info = lambda: {**stats, "size": len(cache), "maxsize": maxsize}
+        wrapper.uncached = fn
+        return wrapper
+    return deco
+
+@cached_read("assignees")
 def assignee_exists_by_tid(telegram_id: str) -> bool:
     with get_conn() as c:
         row = c.execute(
@@ -110,12 +430,14 @@ def add_or_update_assignee(name: str, telegram_id: str, telegram_nickname: str =
                            position          = CASE WHEN ? <> '' THEN ? ELSE position END
                      WHERE id = ?
                 """, (telegram_nickname, telegram_nickname, position, position, cur["id"]))
+@cached_read("assignees")
 def list_unique_assignees():
     with get_conn() as c:
         return c.execute(
             "SELECT DISTINCT name, telegram_id FROM assignees ORDER BY name"
         ).fetchall()
 
+@cached_read("assignees")
 def get_nickname_by_tid(telegram_id: str) -> str:
     with get_conn() as c:
         row = c.execute(
@@ -127,6 +449,34 @@ def get_nickname_by_tid(telegram_id: str) -> str:
 
 # ЗАМЕНИТЬ функцию insert_task целиком
 # db.py
+def _insert_task_row(c, task, assignee, telegram_id, deadline,
+                     priority="normal", source="api",
+                     source_chat_id=None, source_message_id=None,
+                     status="open", link: str = "") -> int:
+    c.execute(
+        """INSERT INTO tasks(
+               task, assignee, telegram_id, deadline,
+               initial_text_sent, status, created_at,
+               priority, source, source_chat_id, source_message_id, link
+           )
+           VALUES(?,?,?,?,?,?,?,?,?,?,?,?)""",
+        (
+            str(task or "").strip(),
+            str(assignee or "").strip(),
+            str(telegram_id or "").strip(),
+            str(deadline or "").strip(),
+            (now_iso() if status in ("open", "in_progress") else ""),
+            str(status or "open"),
+            now_iso(),
+            str(priority or "normal"),
+            str(source or "api"),
+            str(source_chat_id or ""),
+            (int(source_message_id) if source_message_id is not None else None),
+            str(link or "")
+        ),
+    )
+    return c.execute("SELECT last_insert_rowid() AS id").fetchone()["id"]
+
 def insert_task(task, assignee, telegram_id, deadline,
                 priority="normal", source="api",
                 source_chat_id=None, source_message_id=None,
@@ -136,29 +486,121 @@ def insert_task(task, assignee, telegram_id, deadline,
     initial_text_sent заполняем ТОЛЬКО если статус сразу open/in_progress.
     """
     with get_conn() as c:
-        c.execute(
+        return _insert_task_row(c, task, assignee, telegram_id, deadline, priority, source,
+                                source_chat_id, source_message_id, status, link)
+
+# ===== Идемпотентность API =====================================================
+def _idem_lookup(c, keys, now: str) -> dict[str, int]:
+    """Живые (не истёкшие) ключи из keys → task_id. Заодно чистим протухшие (индекс по expires_at)."""
+    c.execute("DELETE FROM idempotency_keys WHERE expires_at < ?", (now,))
+    found = {}
+    keys = list(keys)
+    for i in range(0, len(keys), 500):
+        part = keys[i:i + 500]
+        for r in c.execute(
+            f"SELECT key, task_id FROM idempotency_keys WHERE key IN ({','.join('?' * len(part))})", part
+        ):
+            found[r["key"]] = r["task_id"]
+    return found
+
+def _idem_expiry(ttl_s: int) -> str:
+    return (datetime.utcnow() + timedelta(seconds=ttl_s)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def insert_task_idempotent(key: str, ttl_s: int, task, assignee, telegram_id, deadline, *,
+                           outbox=None, **kw) -> tuple[int, bool]:
+    """
+    insert_task с ключом идемпотентности. Проверка ключа, вставка и запись ключа — одна транзакция
+    (BEGIN IMMEDIATE), так что два одновременных ретрая не создадут две задачи.
+    outbox(task_id) → [(chat_id, text, markup|None, not_before)] — уведомления о новой задаче,
+    пишутся в outbox той же транзакцией (задача без уведомления не останется).
+    Возвращает (task_id, created): created=False — ключ уже был, задачу не вставляли.
+    """
+    now = now_iso()
+    with get_conn() as c:
+        c.execute("BEGIN IMMEDIATE")
+        prev = _idem_lookup(c, [key], now).get(key)
+        if prev is not None:
+            return prev, False
+        task_id = _insert_task_row(c, task, assignee, telegram_id, deadline, **kw)
+        c.execute("INSERT INTO idempotency_keys(key, task_id, created_at, expires_at) VALUES (?,?,?,?)",
+                  (key, task_id, now, _idem_expiry(ttl_s)))
+        if outbox is not None:
+            _enqueue_outbox_rows(c, outbox(task_id))
+        return task_id, True
+
+def insert_tasks_bulk(items, *, source="api", status="proposed", meeting_id: str = "",
+                      keys: list[str] | None = None, key_ttl_s: int = 0) -> list[tuple[int, bool]]:
+    """
+    Пакетная вставка: items = [dict(task, assignee, telegram_id, deadline, priority), ...].
+    Исполнители (имя + telegram_id) апсертятся и задачи вставляются ОДНОЙ транзакцией через executemany.
+    keys — ключ идемпотентности на каждый элемент: уже виденные не вставляются, отдаётся прежний id.
+    Возвращает [(task_id, created), ...] в порядке items. Под BEGIN IMMEDIATE других писателей нет,
+    а id с AUTOINCREMENT растут монотонно — поэтому новые id = всё, что больше максимума до вставки.
+    """
+    if not items:
+        return []
+    ts = now_iso()
+    initial = ts if status in ("open", "in_progress") else ""
+    rows = [(
+        str(it.get("task") or "").strip(),
+        str(it.get("assignee") or "").strip(),
+        str(it.get("telegram_id") or "").strip(),
+        str(it.get("deadline") or "").strip(),
+        initial,
+        str(status or "open"),
+        ts,
+        str(it.get("priority") or "normal"),
+        str(source or "api"),
+        "",
+        None,
+        str(it.get("link") or ""),
+        str(meeting_id or ""),
+    ) for it in items]
+    with get_conn() as c:
+        c.execute("BEGIN IMMEDIATE")
+        known: dict[str, int] = {}
+        if keys:
+            known = _idem_lookup(c, set(keys), ts)
+        # дубль внутри самой пачки — тоже вставляем один раз
+        fresh_idx, first_by_key = [], {}
+        for i in range(len(rows)):
+            k = keys[i] if keys else None
+            if k is not None and (k in known or k in first_by_key):
+                continue
+            if k is not None:
+                first_by_key[k] = i
+            fresh_idx.append(i)
+        rows_new = [rows[i] for i in fresh_idx]
+        people = {(r[1], r[2]) for r in rows_new if r[1] and r[2]}
+        if people:
+            c.executemany("""
+                INSERT INTO assignees(name, telegram_id, telegram_nickname, position)
+                VALUES (?, ?, '', '')
+                ON CONFLICT(telegram_id) DO UPDATE SET name = excluded.name
+            """, sorted(people))
+        prev_max = c.execute("SELECT COALESCE(MAX(id), 0) AS m FROM tasks").fetchone()["m"]
+        c.executemany(
             """INSERT INTO tasks(
                    task, assignee, telegram_id, deadline,
                    initial_text_sent, status, created_at,
-                   priority, source, source_chat_id, source_message_id, link
+                   priority, source, source_chat_id, source_message_id, link, meeting_id
                )
-               VALUES(?,?,?,?,?,?,?,?,?,?,?,?)""",
-            (
-                str(task or "").strip(),
-                str(assignee or "").strip(),
-                str(telegram_id or "").strip(),
-                str(deadline or "").strip(),
-                (now_iso() if status in ("open", "in_progress") else ""),
-                str(status or "open"),
-                now_iso(),
-                str(priority or "normal"),
-                str(source or "api"),
-                str(source_chat_id or ""),
-                (int(source_message_id) if source_message_id is not None else None),
-                str(link or "")
-            ),
+               VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+            rows_new
         )
-        return c.execute("SELECT last_insert_rowid() AS id").fetchone()["id"]
+        new_ids = [r["id"] for r in c.execute("SELECT id FROM tasks WHERE id > ? ORDER BY id", (prev_max,))]
+        out: list[tuple[int, bool] | None] = [None] * len(rows)
+        for i, task_id in zip(fresh_idx, new_ids):
+            out[i] = (task_id, True)
+        if keys:
+            exp = _idem_expiry(key_ttl_s)
+            c.executemany("INSERT INTO idempotency_keys(key, task_id, created_at, expires_at) VALUES (?,?,?,?)",
+                          [(keys[i], out[i][0], ts, exp) for i in fresh_idx])
+            for i in range(len(rows)):
+                if out[i] is None:
+                    k = keys[i]
+                    out[i] = (known[k], False) if k in known else (out[first_by_key[k]][0], False)
+    return out
 
 def get_tasks_due_on(local_yyyy_mm_dd: str):
     with get_conn() as c:
@@ -176,10 +618,107 @@ def get_task(task_id):
     with get_conn() as c:
         return c.execute("SELECT * FROM tasks WHERE id=?", (task_id,)).fetchone()
 
+def list_tasks_page(*, statuses=None, assignee=None, telegram_id=None,
+                    deadline_from=None, deadline_to=None, after_id: int = 0, limit: int = 100):
+    """
+    Страница задач для API: keyset по id (WHERE id > after_id ORDER BY id LIMIT) — без OFFSET,
+    каждая страница читается по первичному ключу, сколько бы задач ни было до неё.
+    """
+    where, params = ["id > ?"], [int(after_id or 0)]
+    if statuses:
+        where.append(f"status IN ({','.join('?' * len(statuses))})")
+        params += list(statuses)
+    if assignee:
+        where.append("assignee = ?")
+        params.append(assignee)
+    if telegram_id:
+        where.append("telegram_id = ?")
+        params.append(str(telegram_id))
+    if deadline_from:
+        where.append("TRIM(COALESCE(deadline, '')) <> '' AND deadline >= ?")
+        params.append(deadline_from)
+    if deadline_to:
+        where.append("TRIM(COALESCE(deadline, '')) <> '' AND deadline <= ?")
+        params.append(deadline_to)
+    with get_conn() as c:
+        return c.execute(
+            f"SELECT * FROM tasks WHERE {' AND '.join(where)} ORDER BY id LIMIT ?",
+            (*params, int(limit))
+        ).fetchall()
+
+def get_task_signature(task_id: int):
+    """Строка задачи + размер истории (PK + два индексных COUNT) — для ETag карточки без загрузки истории."""
+    with get_conn() as c:
+        return c.execute(
+            """SELECT t.*,
+                      (SELECT COUNT(*) FROM task_reassignments r WHERE r.task_id = t.id) AS n_reassign,
+                      (SELECT COUNT(*) FROM deadline_changes d WHERE d.task_id = t.id) AS n_deadline
+                 FROM tasks t WHERE t.id = ?""",
+            (task_id,)
+        ).fetchone()
+
 def get_all_tasks():
     with get_conn() as c:
         return c.execute("SELECT * FROM tasks ORDER BY id").fetchall()
 
+EXPORT_BATCH_SIZE = 500
+
+_EXPORT_ORDER = {
+    "id": "id",
+    "assignee": """assignee,
+                   CASE WHEN TRIM(COALESCE(deadline, '')) = '' THEN 1 ELSE 0 END,
+                   deadline,
+                   created_at""",
+}
+
+def iter_tasks_with_history(statuses: tuple[str, ...] | None = None, order: str = "id",
+                            batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Потоковая выгрузка для отчётов: курсор читаем пачками (fetchmany), историю
+    (переназначения + переносы дедлайна) подтягиваем одним запросом на пачку.
+    Отдаёт (task_row, [reassignments], [deadline_changes]) — в памяти не больше одной пачки.
+    """
+    where, params = "", ()
+    if statuses:
+        where = f"WHERE status IN ({','.join('?' * len(statuses))})"
+        params = tuple(statuses)
+    with get_conn() as c:
+        cur = c.execute(f"SELECT * FROM tasks {where} ORDER BY {_EXPORT_ORDER[order]}", params)
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            ids = [r["id"] for r in batch]
+            ph = ",".join("?" * len(ids))
+            reas: dict[int, list] = {}
+            for x in c.execute(f"SELECT * FROM task_reassignments WHERE task_id IN ({ph}) ORDER BY at", ids):
+                reas.setdefault(x["task_id"], []).append(x)
+            dchs: dict[int, list] = {}
+            for d in c.execute(f"SELECT * FROM deadline_changes WHERE task_id IN ({ph}) ORDER BY at", ids):
+                dchs.setdefault(d["task_id"], []).append(d)
+            for r in batch:
+                yield r, reas.get(r["id"], []), dchs.get(r["id"], [])
+
+def get_review_history(sources: tuple[str, ...] | None = None):
+    """Кандидаты с решением ассистентов (одобрены или сняты) для classifier.py — по времени создания."""
+    where, params = "WHERE status IN ('open','in_progress','done','cancelled')", ()
+    if sources:
+        where += f" AND source IN ({','.join('?' * len(sources))})"
+        params = tuple(sources)
+    with get_conn() as c:
+        return c.execute(
+            f"SELECT id, task, status, cancel_reason, source, created_at FROM tasks {where} ORDER BY created_at, id",
+            params,
+        ).fetchall()
+
+def get_approved_task_texts():
+    """(исполнитель, описание) одобренных задач — для recommender.py; исполнитель — итоговый, после переназначений."""
+    with get_conn() as c:
+        return c.execute(
+            """SELECT assignee, task FROM tasks
+                WHERE status IN ('open','in_progress','done') AND TRIM(assignee) <> '' AND TRIM(task) <> ''"""
+        ).fetchall()
+
 def update_task_assignment(task_id, new_assignee, new_telegram_id, by_who: str | None = None):
     with get_conn() as c:
         prev = c.execute("SELECT assignee, telegram_id FROM tasks WHERE id=?", (task_id,)).fetchone()
@@ -272,10 +811,57 @@ def get_overdue_open_tasks(today_local_yyyy_mm_dd: str):
 
 def count_open_like():
     with get_conn() as c:
-        row = c.execute("SELECT COUNT(*) AS n FROM tasks WHERE status IN ('open','in_progress')").fetchone()
+        row = c.execute("SELECT COALESCE(SUM(n), 0) AS n FROM task_open_gauge").fetchone()
         return int(row["n"] or 0)
 
+def count_overdue_open(today_local_yyyy_mm_dd: str) -> int:
+    """Сколько open/in_progress с дедлайном раньше today — то же условие, что в get_overdue_open_tasks."""
+    with get_conn() as c:
+        row = c.execute(
+            "SELECT COALESCE(SUM(n), 0) AS n FROM task_open_gauge WHERE TRIM(deadline) <> '' AND deadline < ?",
+            (today_local_yyyy_mm_dd,)
+        ).fetchone()
+        return int(row["n"] or 0)
+
+def _hour_window(start_iso_utc: str, end_iso_utc: str):
+    """
+    Окно [start, end] → полуинтервал часовых корзин или None, если по часам его не выразить.
+    start должен быть ровно HH:00:00; end — HH:59:59 (час включаем) или HH:00:00 (час не включаем:
+    эта секунда уходит в следующее окно, а не считается в обоих).
+    """
+    if len(start_iso_utc) != 20 or len(end_iso_utc) != 20 or not start_iso_utc.endswith(":00:00Z"):
+        return None
+    if end_iso_utc.endswith(":59:59Z"):
+        end_h = (datetime.strptime(end_iso_utc[:13], "%Y-%m-%dT%H") + timedelta(hours=1)).strftime("%Y-%m-%dT%H")
+    elif end_iso_utc.endswith(":00:00Z"):
+        end_h = end_iso_utc[:13]
+    else:
+        return None
+    return start_iso_utc[:13], end_h
+
+def get_counters_between(start_iso_utc: str, end_iso_utc: str, by_assignee: bool = False):
+    """
+    Суммы opened/closed/cancelled/postponed/reassigned за окно из task_counters (O(часов в окне)).
+    by_assignee=True — по строке на telegram_id, иначе одна строка итогов. Окно — как у _hour_window.
+    """
+    win = _hour_window(start_iso_utc, end_iso_utc)
+    if win is None:
+        raise ValueError(f"window is not hour-aligned: {start_iso_utc} .. {end_iso_utc}")
+    group = "GROUP BY telegram_id ORDER BY telegram_id" if by_assignee else ""
+    with get_conn() as c:
+        return c.execute(
+            f"""SELECT {"telegram_id," if by_assignee else ""}
+                       COALESCE(SUM(opened), 0) AS opened, COALESCE(SUM(closed), 0) AS closed,
+                       COALESCE(SUM(cancelled), 0) AS cancelled, COALESCE(SUM(postponed), 0) AS postponed,
+                       COALESCE(SUM(reassigned), 0) AS reassigned
+                  FROM task_counters WHERE hour >= ? AND hour < ? {group}""",
+            win
+        ).fetchall()
+
 def count_closed_between(start_iso_utc: str, end_iso_utc: str):
+    if _hour_window(start_iso_utc, end_iso_utc):
+        return int(get_counters_between(start_iso_utc, end_iso_utc)[0]["closed"])
+    # окно не по часам — считаем сканом, как раньше
     with get_conn() as c:
         row = c.execute(
             "SELECT COUNT(*) AS n FROM tasks WHERE status='done' AND updated_at BETWEEN ? AND ?",
@@ -283,6 +869,30 @@ def count_closed_between(start_iso_utc: str, end_iso_utc: str):
         ).fetchone()
         return int(row["n"] or 0)
 
+def rebuild_counters():
+    """Пересчитать task_counters/task_open_gauge сканом базовых таблиц."""
+    with get_conn() as c:
+        c.execute("BEGIN IMMEDIATE")
+        _rebuild_counters(c)
+
+def verify_counters() -> list[str]:
+    """Сверка счётчиков с пересчётом сканом. Пустой список — всё сходится."""
+    cols = "opened, closed, cancelled, postponed, reassigned"
+    nonzero = "opened <> 0 OR closed <> 0 OR cancelled <> 0 OR postponed <> 0 OR reassigned <> 0"
+    out = []
+    with get_conn() as c:
+        live = f"SELECT hour, telegram_id, {cols} FROM task_counters WHERE {nonzero}"
+        ref = f"SELECT hour, telegram_id, {cols} FROM ({_COUNTERS_FROM_SCRATCH})"
+        for side, a, b in (("counters", live, ref), ("scan", ref, live)):
+            for r in c.execute(f"{a} EXCEPT {b}"):
+                out.append(f"{side}: task_counters {tuple(r)}")
+        live = "SELECT telegram_id, deadline, n FROM task_open_gauge WHERE n <> 0"
+        ref = f"SELECT telegram_id, deadline, n FROM ({_GAUGE_FROM_SCRATCH})"
+        for side, a, b in (("counters", live, ref), ("scan", ref, live)):
+            for r in c.execute(f"{a} EXCEPT {b}"):
+                out.append(f"{side}: task_open_gauge {tuple(r)}")
+    return out
+
 
 def tasks_sent_between(start_iso, end_iso):
     with get_conn() as c:
@@ -303,6 +913,76 @@ def get_reassignments_between(start_iso_utc, end_iso_utc):
             (start_iso_utc, end_iso_utc)
         ).fetchall()
 
+def get_morning_summary(start_iso_utc: str, end_iso_utc: str, today_local: str, yesterday_local: str) -> dict:
+    """
+    Всё для утренней сводки за горсть запросов (вместо get_task/ник на каждую строку):
+      1) счётчики из task_counters/task_open_gauge: в работе / закрыто в окне / просрочено сейчас;
+      2) списки одним запросом на CTE:
+         postponed — открытые задачи, у которых в окне дедлайн «вчера» перенесли на сегодня/позже
+                     (значения — из последнего такого переноса, порядок — по первому);
+         overdue   — открытые задачи с дедлайном «вчера», которые НЕ переносили.
+    Ник исполнителя приходит в строке (nick): подзапрос с LIMIT 1, как в сводке открытых задач, а не
+    JOIN — если в assignees у telegram_id несколько строк (старая база), задача не задвоится.
+    """
+    params = {"s": start_iso_utc, "e": end_iso_utc, "today": today_local, "y": yesterday_local}
+    agg = {
+        "open_like": count_open_like(),
+        "closed": count_closed_between(start_iso_utc, end_iso_utc),
+        "overdue_total": count_overdue_open(today_local),
+    }
+    with get_conn() as c:
+        rows = c.execute(
+            """
+            WITH moves AS (
+              SELECT d.id AS did, d.task_id, d.at,
+                     TRIM(COALESCE(d.old_deadline, '')) AS old_deadline,
+                     TRIM(COALESCE(d.new_deadline, '')) AS new_deadline
+                FROM deadline_changes d
+                JOIN tasks t ON t.id = d.task_id
+               WHERE d.at BETWEEN :s AND :e
+                 AND t.status IN ('open','in_progress')
+                 AND TRIM(COALESCE(d.old_deadline, '')) = :y
+                 AND TRIM(COALESCE(d.new_deadline, '')) <> ''
+                 AND TRIM(d.new_deadline) >= :today
+            ),
+            ranked AS (
+              SELECT m.*,
+                     ROW_NUMBER() OVER (PARTITION BY task_id ORDER BY at DESC, did DESC) AS rn,
+                     MIN(at)  OVER (PARTITION BY task_id) AS first_at,
+                     MIN(did) OVER (PARTITION BY task_id) AS first_did
+                FROM moves m
+            )
+            SELECT 'postponed' AS kind, 0 AS grp, r.first_at AS k1, r.first_did AS k2,
+                   t.id, t.task, t.assignee, t.telegram_id, t.deadline,
+                   r.old_deadline, r.new_deadline,
+                   (SELECT a.telegram_nickname FROM assignees a
+                     WHERE a.telegram_id = t.telegram_id AND t.telegram_id <> ''
+                     LIMIT 1) AS nick
+              FROM ranked r
+              JOIN tasks t ON t.id = r.task_id
+             WHERE r.rn = 1
+            UNION ALL
+            SELECT 'overdue', 1, t.assignee, t.id,
+                   t.id, t.task, t.assignee, t.telegram_id, t.deadline,
+                   NULL, NULL,
+                   (SELECT a.telegram_nickname FROM assignees a
+                     WHERE a.telegram_id = t.telegram_id AND t.telegram_id <> ''
+                     LIMIT 1)
+              FROM tasks t
+             WHERE t.status IN ('open','in_progress')
+               AND TRIM(COALESCE(t.deadline, '')) = :y
+               AND t.id NOT IN (SELECT task_id FROM moves)
+            ORDER BY grp, k1, k2
+            """,
+            params
+        ).fetchall()
+
+    return {
+        **agg,
+        "postponed": [r for r in rows if r["kind"] == "postponed"],
+        "overdue": [r for r in rows if r["kind"] == "overdue"],
+    }
+
 def get_deadline_changes_between(start_iso_utc, end_iso_utc):
     with get_conn() as c:
         return c.execute(
@@ -405,6 +1085,39 @@ def enqueue_outbox(chat_id: str, text: str, markup: dict | None, not_before_iso_
             (str(chat_id), text, (json.dumps(markup) if markup else None), not_before_iso_utc, now_iso())
         )
 
+def _enqueue_outbox_rows(c, items):
+    ts = now_iso()
+    c.executemany(
+        "INSERT INTO outbox(chat_id, text, markup, not_before, created_at) VALUES (?,?,?,?,?)",
+        [(str(chat_id), text, (json.dumps(markup) if markup else None), nb, ts)
+         for chat_id, text, markup, nb in items]
+    )
+
+def enqueue_outbox_many(items):
+    """items = [(chat_id, text, markup|None, not_before_iso_utc), ...] — одной транзакцией."""
+    with get_conn() as c:
+        _enqueue_outbox_rows(c, items)
+
+def claim_due_outbox(now_iso_utc: str, limit: int = 100, lease_s: int = 300):
+    """
+    Забрать дозревшие сообщения с «арендой»: строке ставится claimed_at, другие отправители её
+    не возьмут, пока аренда не истечёт (lease_s). Не отправили и не отметили — через lease_s
+    сообщение снова станет доступно (ретрай). Выборка + отметка под BEGIN IMMEDIATE.
+    """
+    stale = (datetime.strptime(now_iso_utc, "%Y-%m-%dT%H:%M:%SZ") - timedelta(seconds=lease_s)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    with get_conn() as c:
+        c.execute("BEGIN IMMEDIATE")
+        rows = c.execute(
+            """SELECT * FROM outbox
+               WHERE sent_at IS NULL AND not_before <= ?
+                 AND (claimed_at IS NULL OR claimed_at < ?)
+               ORDER BY id LIMIT ?""",
+            (now_iso_utc, stale, limit)
+        ).fetchall()
+        if rows:
+            c.executemany("UPDATE outbox SET claimed_at=? WHERE id=?", [(now_iso_utc, r["id"]) for r in rows])
+        return rows
+
 def pop_due_outbox(now_iso_utc: str, limit: int = 100):
     with get_conn() as c:
         return c.execute(
@@ -416,4 +1129,134 @@ def pop_due_outbox(now_iso_utc: str, limit: int = 100):
 
 def mark_outbox_sent(outbox_id: int):
     with get_conn() as c:
-        c.execute("UPDATE outbox SET sent_at=? WHERE id=?", (now_iso(), outbox_id))
\ No newline at end of file
+        c.execute("UPDATE outbox SET sent_at=? WHERE id=?", (now_iso(), outbox_id))
+
+def defer_outbox(outbox_id: int, not_before_iso_utc: str):
+    """Отложить сообщение (429 retry_after) и снять аренду — раньше not_before его никто не возьмёт."""
+    with get_conn() as c:
+        c.execute("UPDATE outbox SET not_before=?, claimed_at=NULL WHERE id=?", (not_before_iso_utc, outbox_id))
+
+# ===== Кэш file_id отчётов ====================================================
+def get_report_file_id(sha256: str) -> str | None:
+    with get_conn() as c:
+        row = c.execute("SELECT file_id FROM report_files WHERE sha256=?", (sha256,)).fetchone()
+        return row["file_id"] if row else None
+
+def save_report_file_id(sha256: str, file_id: str, filename: str = ""):
+    with get_conn() as c:
+        c.execute("""INSERT INTO report_files(sha256, file_id, filename, created_at)
+                     VALUES (?,?,?,?)
+                     ON CONFLICT(sha256) DO UPDATE SET file_id=excluded.file_id,
+                                                     filename=excluded.filename,
+                                                     created_at=excluded.created_at""",
+                  (sha256, file_id, filename or "", now_iso()))
+
+def forget_report_file_id(sha256: str):
+    with get_conn() as c:
+        c.execute("DELETE FROM report_files WHERE sha256=?", (sha256,))
+
+# ---------- расшифровки голосовых ----------
+def get_voice_transcripts(file_unique_ids) -> dict[str, str]:
+    ids = [x for x in dict.fromkeys(file_unique_ids) if x]
+    found = {}
+    with get_conn() as c:
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            for r in c.execute(
+                f"SELECT file_unique_id, text FROM voice_transcripts WHERE file_unique_id IN ({','.join('?' * len(part))})",
+                part
+            ):
+                found[r["file_unique_id"]] = r["text"]
+    return found
+
+def save_voice_transcript(file_unique_id: str, text: str, duration: int | None = None):
+    with get_conn() as c:
+        c.execute("""INSERT OR REPLACE INTO voice_transcripts(file_unique_id, text, duration, created_at)
+                     VALUES (?,?,?,?)""", (file_unique_id, text, duration, now_iso()))
+
+# ---------- журнал изменений ----------
+def get_change_cursor() -> int:
+    """Текущая голова журнала: снять ДО полной выгрузки, потом догонять через get_changes_since."""
+    with get_conn() as c:
+        row = c.execute("SELECT seq FROM sqlite_sequence WHERE name='change_log'").fetchone()
+        return int(row["seq"]) if row else 0
+
+def prune_change_log(retention_days: int) -> int:
+    """
+    Удалить записи журнала старше retention_days (зовёт почасовой scheduler, не GET /changes).
+    Курсоры клиентов старше хвоста после этого получают 410 — полная пересинхронизация.
+    """
+    if retention_days <= 0:
+        return 0
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    with get_conn() as c:
+        return c.execute("DELETE FROM change_log WHERE at < ?", (cutoff,)).rowcount
+
+def get_changes_since(since: int, limit: int = 500):
+    """
+    Сжатые изменения после курсора since: читаем до limit записей журнала (по PK), схлопываем
+    по (entity, entity_id) до последней и подтягиваем ТЕКУЩЕЕ состояние строки (None — удалена).
+    Возвращает (changes, next_since, has_more) или None, если since старше хвоста журнала
+    (записи уже вычищены prune_change_log — клиенту нужна полная пересинхронизация).
+    """
+    with get_conn() as c:
+        head = c.execute("SELECT seq FROM sqlite_sequence WHERE name='change_log'").fetchone()
+        head = int(head["seq"]) if head else 0
+        oldest = c.execute("SELECT MIN(id) AS m FROM change_log").fetchone()["m"]
+        if since < (oldest if oldest is not None else head + 1) - 1:
+            return None
+
+        log = c.execute(
+            "SELECT id, entity, entity_id, task_id, at FROM change_log WHERE id > ? ORDER BY id LIMIT ?",
+            (since, limit + 1)
+        ).fetchall()
+        has_more = len(log) > limit
+        log = log[:limit]
+        latest = {}
+        for r in log:
+            latest.pop((r["entity"], r["entity_id"]), None)  # переставляем в конец — порядок по последней записи
+            latest[(r["entity"], r["entity_id"])] = r
+
+        rows = {}
+        for entity in _CHANGE_LOG_TABLES:
+            ids = [eid for (e, eid) in latest if e == entity]
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                for r in c.execute(f"SELECT * FROM {entity} WHERE id IN ({','.join('?' * len(part))})", part):
+                    rows[(entity, r["id"])] = r
+
+        changes = [{
+            "seq": r["id"], "entity": r["entity"], "id": r["entity_id"], "task_id": r["task_id"], "at": r["at"],
+            "row": rows.get(key),
+        } for key, r in latest.items()]
+        next_since = log[-1]["id"] if log else max(since, 0)
+        return changes, next_since, has_more
+
+# ---------- кэш отчётов ----------
+def get_data_version() -> int:
+    """Сумма эпох: растёт на любую запись в любую из _EPOCH_TABLES."""
+    with get_conn() as c:
+        row = c.execute("SELECT COALESCE(SUM(epoch), 0) AS v FROM cache_epoch").fetchone()
+        return int(row["v"])
+
+def get_cached_report(kind: str, params: str, version: int) -> bytes | None:
+    with get_conn() as c:
+        row = c.execute(
+            "SELECT data FROM report_cache WHERE kind=? AND params=? AND version=?", (kind, params, version)
+        ).fetchone()
+        if not row:
+            return None
+        c.execute("UPDATE report_cache SET last_used_at=? WHERE kind=? AND params=? AND version=?",
+                  (now_iso(), kind, params, version))
+        return bytes(row["data"])
+
+def put_cached_report(kind: str, params: str, version: int, data: bytes, max_entries: int):
+    """Кладём артефакт; старые версии того же отчёта сразу выкидываем, остальное — LRU до max_entries."""
+    ts = now_iso()
+    with get_conn() as c:
+        c.execute("DELETE FROM report_cache WHERE kind=? AND params=? AND version<?", (kind, params, version))
+        c.execute("""INSERT OR REPLACE INTO report_cache(kind, params, version, data, created_at, last_used_at)
+                     VALUES (?,?,?,?,?,?)""", (kind, params, version, data, ts, ts))
+        c.execute("""DELETE FROM report_cache WHERE rowid NOT IN (
+                       SELECT rowid FROM report_cache ORDER BY last_used_at DESC, created_at DESC LIMIT ?
+                     )""", (max(1, max_entries),))
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Разбор дедлайнов — один на бота, API и эвристики nlp.
+
+Сначала скомпилированные грамматики (рус./англ.): даты «2025-10-15», «15.10», «15 октября»,
+«Oct 15»; относительные «сегодня/завтра», «через 3 дня», «через 2 недели», «к пятнице»,
+«до конца недели», «на следующей неделе», «до конца месяца». dateutil — только в самом
+конце: для поля-дедлайна (весь ввод — дата) по всему тексту, для свободного текста — только
+по фрагменту, похожему на дату (fuzzy по всему сообщению цеплялся к любому числу).
+Результат кэшируется по (текст, сегодня): сегодняшнее «завтра» не протухнет к полуночи.
+"""
+import calendar
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from dateutil import parser as dateparser
+
+from app_config import TZ
+
+DEADLINE_CACHE_SIZE = 4096
+
+_WEEKDAYS = (  # основа → номер дня недели (любой падеж: «пятница/пятницу/пятнице/пятницы»)
+    ("понедельник", 0), ("вторник", 1), ("сред", 2), ("четверг", 3),
+    ("пятниц", 4), ("суббот", 5), ("воскресень", 6),
+    ("monday", 0), ("tuesday", 1), ("wednesday", 2), ("thursday", 3),
+    ("friday", 4), ("saturday", 5), ("sunday", 6),
+)
+_MONTHS = (
+    ("янв", 1), ("фев", 2), ("мар", 3), ("апр", 4), ("ма", 5), ("июн", 6),
+    ("июл", 7), ("авг", 8), ("сен", 9), ("окт", 10), ("ноя", 11), ("дек", 12),
+    ("jan", 1), ("feb", 2), ("mar", 3), ("apr", 4), ("may", 5), ("jun", 6),
+    ("jul", 7), ("aug", 8), ("sep", 9), ("oct", 10), ("nov", 11), ("dec", 12),
+)
+_NUMBERS = {
+    "один": 1, "одну": 1, "одного": 1, "пару": 2, "два": 2, "две": 2, "три": 3, "четыре": 4,
+    "пять": 5, "шесть": 6, "семь": 7, "десять": 10, "a": 1, "an": 1, "one": 1, "two": 2,
+    "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "ten": 10,
+}
+
+_WD = "|".join(w for w, _ in _WEEKDAYS)
+# после «в/во/on» — только винительный падеж: «в среду», но не «в среде (разработки)»
+_WD_ACC = "понедельник|вторник|среду|четверг|пятницу|субботу|воскресенье|" + "|".join(w for w, _ in _WEEKDAYS[7:])
+# месяц — только настоящие формы («октября», «окт.», «Oct», «October»): «3 марок», «2 marketing decks»
+# и «3 decisions» — не даты. Сокращение без точки — только целым словом.
+_MON_RU = (r"(?:(?:январ[ьяе]|феврал[ьяе]|март[аеу]?|апрел[ьяе]|ма[йяе]|июн[ьяе]|июл[ьяе]|август[аеу]?"
+           r"|сентябр[ьяе]|октябр[ьяе]|ноябр[ьяе]|декабр[ьяе])(?![а-я])"
+           r"|(?:янв|февр?|мар|апр|авг|сент?|окт|нояб?|дек)(?:\.|(?![а-я])))")
+_MON_EN = (r"(?:(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+           r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)(?:\.|(?![a-z])))")
+_NUM = r"(\d{1,3}|" + "|".join(_NUMBERS) + r")"
+_B, _E = r"(?<![\w.])", r"(?![\w])"  # границы слова; точка слева — чтобы «1.15.10» не читалось как дата
+
+_ISO_RE = re.compile(_B + r"(\d{4})-(\d{1,2})-(\d{1,2})" + _E)
+_DMY_RE = re.compile(_B + r"(\d{1,2})[./](\d{1,2})(?:[./](\d{4}|\d{2}))?" + _E)
+# в свободном тексте месяц — двумя цифрами или с годом: «1.2 млн» — не 1 февраля
+_DMY_FREE_RE = re.compile(_B + r"(\d{1,2})[./](\d{2}|\d{1,2}(?=[./]\d))(?:[./](\d{4}|\d{2}))?" + _E)
+_D_MON_RE = re.compile(_B + r"(\d{1,2})\s+(" + _MON_RU + "|" + _MON_EN + r")(?:\s+(\d{4}))?" + _E)
+_MON_D_RE = re.compile(_B + r"(" + _MON_EN + r")\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?" + _E)
+_REL_DAY_RE = re.compile(_B + r"(послезавтра|day after tomorrow|сегодня|today|завтра|tomorrow)" + _E)
+_UNIT = r"(дн[а-яё]*|день|сут[а-яё]*|недел[а-яё]*|нед|месяц[а-яё]*|мес|days?|weeks?|months?)"
+_IN_N_RE = re.compile(_B + r"(?:через|спустя|за|in|within|\+)\s*" + _NUM + r"?\s*" + _UNIT + _E)
+# «за» в свободном тексте двусмысленно («отчёт за месяц») — там только «через/спустя/in»
+_IN_N_FREE_RE = re.compile(_B + r"(?:через|спустя|in|within)\s*" + _NUM + r"?\s*" + _UNIT + _E)
+_END_OF_RE = re.compile(
+    _B + r"(?:до|к|by|till|until|the)?\s*(?:конц[аеу]|end of(?: the)?)\s+"
+    r"(недел[а-яё]*|месяц[а-яё]*|week|month)" + _E
+)
+_NEXT_WEEK_RE = re.compile(_B + r"(?:на следующей неделе|next week)" + _E)
+_NEXT_WD_RE = re.compile(_B + r"(?:в\s+|во\s+)?(?:следующ[а-яё]+|next)\s+(" + _WD + r")[а-яё]*" + _E)
+_BY_WD_RE = re.compile(
+    _B + r"(?:(?:к|ко|до|by|till|until)\s+(" + _WD + r")[а-яё]*|(?:в|во|on)\s+(" + _WD_ACC + r"))" + _E
+)
+_BARE_WD_RE = re.compile(r"^(" + _WD + r")[а-яё]*$")
+_DATEISH_RE = re.compile(  # фрагмент для dateutil в свободном тексте: англ. месяц рядом с числом
+    r"\b(?:\d{1,2}(?:st|nd|rd|th)?\s+" + _MON_EN + r"(?:\s+\d{4})?|" + _MON_EN + r"\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s+\d{4})?)"
+)
+
+
+def _iso(d: date) -> str:
+    return d.strftime("%Y-%m-%d")
+
+def _mk(y: int, m: int, d: int) -> str | None:
+    try:
+        return _iso(date(y, m, d))
+    except ValueError:
+        return None
+
+def _month(token: str) -> int | None:
+    token = token.rstrip(".")
+    for stem, n in _MONTHS:
+        if token.startswith(stem):
+            return n
+    return None
+
+def _weekday(token: str) -> int:
+    return next(n for stem, n in _WEEKDAYS if token.startswith(stem))
+
+def _year(y: str | None, today: date) -> int:
+    if not y:
+        return today.year
+    return int(y) + 2000 if len(y) == 2 else int(y)
+
+def _add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    y, m = d.year + y, m + 1
+    return date(y, m, min(d.day, calendar.monthrange(y, m)[1]))
+
+def _upcoming(today: date, wd: int) -> date:
+    """Ближайший такой день недели, сегодня — считается (как было в боте)."""
+    return today + timedelta(days=(wd - today.weekday()) % 7)
+
+def _end_of_week(today: date) -> date:
+    return today + timedelta(days=6 - today.weekday())
+
+def _number(tok: str | None) -> int:
+    if not tok:
+        return 1
+    return int(tok) if tok.isdigit() else _NUMBERS[tok]
+
+
+def _rule_iso(m, today):
+    return _mk(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+
+def _rule_dmy(m, today):
+    return _mk(_year(m.group(3), today), int(m.group(2)), int(m.group(1)))
+
+def _rule_d_mon(m, today):
+    mon = _month(m.group(2))
+    return _mk(_year(m.group(3), today), mon, int(m.group(1))) if mon else None
+
+def _rule_mon_d(m, today):
+    mon = _month(m.group(1))
+    return _mk(_year(m.group(3), today), mon, int(m.group(2))) if mon else None
+
+def _rule_rel_day(m, today):
+    w = m.group(1)
+    days = 2 if w in ("послезавтра", "day after tomorrow") else 1 if w in ("завтра", "tomorrow") else 0
+    return _iso(today + timedelta(days=days))
+
+def _rule_in_n(m, today):
+    n, unit = _number(m.group(1)), m.group(2)
+    if unit.startswith(("мес", "month")):
+        return _iso(_add_months(today, n))
+    if unit.startswith(("нед", "week")):
+        return _iso(today + timedelta(weeks=n))
+    return _iso(today + timedelta(days=n))
+
+def _rule_end_of(m, today):
+    if m.group(1).startswith(("мес", "month")):
+        return _mk(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
+    return _iso(_end_of_week(today))
+
+def _rule_next_week(m, today):
+    # пятница следующей недели
+    return _iso(_end_of_week(today) + timedelta(days=5))
+
+def _rule_next_wd(m, today):
+    return _iso(_end_of_week(today) + timedelta(days=1 + _weekday(m.group(1))))
+
+def _rule_by_wd(m, today):
+    return _iso(_upcoming(today, _weekday(m.group(1) or m.group(2))))
+
+def _rule_bare_wd(m, today):
+    return _iso(_upcoming(today, _weekday(m.group(1))))
+
+# порядок = приоритет: явные даты, потом относительные выражения
+_RULES = (
+    (_ISO_RE, _rule_iso), (_DMY_RE, _rule_dmy), (_D_MON_RE, _rule_d_mon), (_MON_D_RE, _rule_mon_d),
+    (_REL_DAY_RE, _rule_rel_day), (_IN_N_RE, _rule_in_n), (_END_OF_RE, _rule_end_of),
+    (_NEXT_WEEK_RE, _rule_next_week), (_NEXT_WD_RE, _rule_next_wd), (_BY_WD_RE, _rule_by_wd),
+)
+_RULES_FREE = tuple(
+    ({_DMY_RE: _DMY_FREE_RE, _IN_N_RE: _IN_N_FREE_RE}.get(rx, rx), rule) for rx, rule in _RULES
+)
+
+
+def _dateutil(s: str, today: date) -> str | None:
+    try:
+        d = dateparser.parse(s, dayfirst=True, fuzzy=True,
+                             default=datetime(today.year, today.month, today.day))
+        return _iso(d) if d else None
+    except (ValueError, OverflowError):
+        return None
+
+@lru_cache(maxsize=DEADLINE_CACHE_SIZE)
+def _parse(s: str, today: date, free_text: bool) -> str | None:
+    for rx, rule in (_RULES_FREE if free_text else _RULES):
+        m = rx.search(s)
+        if m:
+            return rule(m, today)  # None — дата узнана, но невалидна (31.02): dateutil не додумывает
+    if free_text:
+        m = _DATEISH_RE.search(s)
+        return _dateutil(m.group(0), today) if m else None
+    m = _BARE_WD_RE.match(s)
+    if m:
+        return _rule_bare_wd(m, today)
+    return _dateutil(s, today)
+
+def today_local() -> date:
+    return datetime.now(ZoneInfo(TZ)).date()
+
+def parse_deadline(text: str, today: date | None = None, *, free_text: bool = False) -> str | None:
+    """
+    Текст → 'YYYY-MM-DD' или None. today — «сегодня» в часовом поясе команды (по умолчанию TZ).
+    free_text=False: весь ввод — дедлайн (ответ в боте, поле API); True — ищем дедлайн внутри
+    сообщения и не даём dateutil додумывать дату из случайных чисел.
+    Прошедшие даты не отсекаются — это решает вызывающий.
+    """
+    s = " ".join((text or "").lower().replace("ё", "е").split())
+    if not s:
+        return None
+    return _parse(s, today or today_local(), free_text)
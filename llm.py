@@ -2,7 +2,8 @@
 import json, os, time
 import requests
 from typing import Optional, Tuple, List, Optional as _Optional
-from app_config import OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL, OPENAI_TIMEOUT_S
+from app_config import OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL, OPENAI_TIMEOUT_S, ROUTING_PATH, ROUTING_TOP_N
+from bm25 import AssigneeIndex
 import logging
 logger = logging.getLogger("bot.llm")
 
@@ -25,119 +26,7 @@ USER_PROMPT_TMPL = """Контекст:
 
 Маршрутизация темы → исполнитель (если это задача):
 
-- «Оксана Вострова», telegram_id="787616580"
-  Берёт: Аккаунт-менеджер УК — обращения жильцов/арендаторов, коммуникацию с гостями, сервис-заявки без сложного ремонта, бытовые вопросы в апартаментах, организация внеплановой уборки, ключи/заселение/выселение, правила проживания/Wi-Fi.
-  Примеры: «сломался кондиционер в U-12», «у нас потёк кран в ванной», «гости жалуются на шум», «нужна внеплановая уборка завтра в 10:00», «пришлите правила проживания и Wi-Fi».
-
-- «Александр Колодий», telegram_id="1906230072"
-  Берёт: склад, приём/выдача, инвентаризация, хранение, контроль остатков.
-  Примеры: «выдать со склада», «принять доставку», «провести инвентаризацию».
-
-- «Александр Миронов», telegram_id="724448768"
-  Берёт: транспорт, водители, трансферы, логистика перемещений.
-  Примеры: «заказать машину», «нужен трансфер из аэропорта», «перевезти мебель на склад».
-
-- «Василий Лысый», telegram_id="525287503"
-  Берёт: IT-инфраструктура, сети, доступы, CRM/ПО, рабочие места.
-  Примеры: «настроить VPN/доступ», «починить Wi-Fi», «создать почту/аккаунт», «починить принтер».
-
-- «Максим Куклин», telegram_id="1827484827"
-  Берёт: Front Office/ресепшн, брони, заселение/выселение гостей, графики смен.
-  Примеры: «с 3–5 сентября всех заселить», «подтвердить бронирование», «составить график ресепшн».
-
-- «Марина Рыбалко», telegram_id="783636493"
-  Берёт: финансы (уведомления о платежах, отчёты по выручке/ADR/RevPAR, сверки).
-  Примеры: «дать финансовый отчёт», «сверить поступления», «обновить отчёт по доходам».
-
-- «Юрий Чорней», telegram_id="986994687"
-  Берёт: техподдержка объектов, дефекты/ремонт, чек-листы, инженерные задачи.
-  Примеры: «устранить течь/неисправность», «проверить кондиционеры», «сделать обход, акт дефектов».
-
-- «Татьяна Ивкина», telegram_id="987654321"
-  Берёт: бухгалтерия, акты, счета, закрывающие, сверка контрагентов.
-  Примеры: «подготовить акт приёма-передачи», «выписать счёт», «сверка по поставщику».
-
-- «Виктория Стеценко», telegram_id="779263421"
-  Берёт: доходы и маркетинг: прайсинг, промо, отчёты по выручке/загрузке, OTA.
-  Примеры: «обновить тарифы/акцию», «дать отчёт по загрузке», «включить промо на OTA».
-
-- «Александра Колодий», telegram_id="157422442"
-  Берёт: комплектующие УК, закупка/доставка расходников/мебели по задачам УК.
-  Примеры: «закупить комплектующие», «довезти расходники на объект».
-
-- «Виктория Горелик», telegram_id="566015359"
-  Берёт: ресторан (зал), сервис, брони, инвентарь зала, отчёт по сменам.
-  Примеры: «организовать банкет/резерв», «подготовить зал», «отчёт по смене».
-
-- «Виталий Капшивый», telegram_id=""
-  Берёт: кухня, меню, закупки продуктов, производственный контроль.
-  Примеры: «согласовать меню», «закупить продукты», «внедрить техкарты».
-
-- «Евгений Тиенкаев», telegram_id="1160816343"
-  Берёт: GM Melasti — операционка по комплексу, статусы готовности, приёмы-передачи.
-  Примеры: «дать завтра статус по всем виллам», «организовать приёмку юнитов».
-
-- «Виктория Дмитриева», telegram_id="5071652373"
-  Берёт: клининг/хаускипинг, графики уборок, стандарты, приёмка чистоты.
-  Примеры: «организовать уборку/генеральную», «составить график клининга».
-
-- «Виктор Ивановский», telegram_id="218098576"
-  Берёт: зам. Василия — эскалации IT/операционки, контроль исполнения поручений.
-  Примеры: «принять от строителей к 1 сентября», «проконтролировать устранение замечаний».
-
-- «Наталья Серая», telegram_id="369937072"
-  Берёт: зам. руководителя — организационные поручения, координация подразделений.
-  Примеры: «собрать статус», «координировать отделы по задаче».
-
-- «Александр Миронов», telegram_id=""
-  Берёт: транспорт/логистика, водители, автопарк, трансферы.
-  Примеры: «организовать трансфер», «расписание транспорта», «ТО автомобиля».
-
-- «Алтынай Кожашева», telegram_id="5062802495"
-  Берёт: финдир — бюджеты/лимиты, платежи, финансовые политики.
-  Примеры: «подтвердить оплату», «утвердить бюджет».
-
-- «Инна Остапенко», telegram_id="1030930325"
-  Берёт: бухгалтерия (операционная), первичка/платёжки/закрывающие.
-  Примеры: «сформировать платёжку», «подготовить акт/счёт».
-
-- «Александр Колодий», telegram_id=""
-  Берёт: склад/инвентарь, учёт, выдача, пополнение.
-  Примеры: «инвентаризация», «выдать инвентарь», «дозаказ со склада».
-
-- «Алексей Кумсков», telegram_id=""
-  Берёт: комплектация (закуп-доставка-монтаж).
-  Примеры: «комплектовать юнит», «доставить и смонтировать».
-
-- «Николай Чербаджи», telegram_id="410834944"
-  Берёт: комплектация (закуп-доставка-монтаж).
-  Примеры: «закупить и доставить комплектующие».
-
-- «Оксана Вострова», telegram_id=""
-  Берёт: аккаунт-менеджер УК, коммуникации с клиентами УК.
-  Примеры: «связаться с клиентом УК», «обновить карточку клиента».
-
-- «Александр Свешников», telegram_id="87792668"
-  Берёт: аккаунт-менеджер УК, сопровождение объектов.
-  Примеры: «принять юнит в УК», «обновить информацию по юниту».
-
-- «Александр Колмаков», telegram_id="941507695"
-  Берёт: старший аккаунт Front Office — заселение/выселение, координация агентов.
-  Примеры: «заселить с 13 по 25 сентября», «координировать агентов».
-
-- «Алена Воронович», telegram_id="454391409"
-  Берёт: директор по маркетингу — кампании, креатив, PR.
-  Примеры: «запустить кампанию», «подготовить медиаплан».
-
-- «Анна Михайлова», telegram_id="840396341"
-  Берёт: директор студии дизайна — дизайн-задачи, бренд-материалы, макеты.
-  Примеры: «подготовить дизайн-концепт/макет», «доработать бренд-гайд».
-
-- «Донара», telegram_id="565589989"
-  Берёт: дизайнер интерьеров — дизайн-проекты, визуализации, интерьерные решения.
-  Примеры: «подготовить дизайн-проект спальни», «согласовать визуализацию кухни», «доработать интерьерные чертежи».
-
-- Прочее → «Assistant», telegram_id «369937072»
+{routing}
 Если несколько тем — выбери ОДНОГО наиболее ответственного из трёх. Если не подходит — assignee=null.
 
 КРИТЕРИЙ «ЗАДАЧА» (должны выполняться ВСЕ три «АОИ»):
@@ -200,6 +89,64 @@ C) Owner/Intent — понятно, кому поручено (явное обр
 
 
 
+# ---------- таблица маршрутизации (routing.json) ----------
+# Роли «кто что берёт» лежат в ROUTING_PATH, а не в шаблоне: в промпт идут только ROUTING_TOP_N
+# подходящих к сообщению (BM25 по «Берёт» + примерам) и те, кого назвали по имени; «Прочее» — всегда.
+# Слабое совпадение (короткое сообщение, другие слова) — отдаём всю таблицу: промахнуться с ролью дороже токенов.
+ROUTING_MIN_SCORE = 3.0
+ROUTING_STEM_LEN = 4  # описания ролей короткие — основы короче, чем у recommender по истории задач
+_ROUTING: tuple = (None, None)  # ((путь, mtime), (entries, fallback, index))
+
+def load_routing(path: str = ROUTING_PATH):
+    """(entries, fallback, index); перечитывается, когда файл поменяли. Нет файла — пустая таблица."""
+    global _ROUTING
+    try:
+        key = (path, os.path.getmtime(path))
+    except OSError:
+        logger.warning("LLM routing: нет файла %s — промпт без таблицы ролей", path)
+        return [], None, None
+    if _ROUTING[0] != key:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        entries = data.get("entries") or []
+        index = AssigneeIndex({i: [e.get("takes") or ""] + list(e.get("examples") or []) for i, e in enumerate(entries)},
+                              stem_len=ROUTING_STEM_LEN)
+        _ROUTING = (key, (entries, data.get("fallback"), index))
+    return _ROUTING[1]
+
+def _routing_entry(e: dict) -> str:
+    lines = [f'- «{e["name"]}», telegram_id="{e.get("telegram_id") or ""}"', f'  Берёт: {e.get("takes") or ""}']
+    if e.get("examples"):
+        lines.append("  Примеры: " + ", ".join(f"«{x}»" for x in e["examples"]) + ".")
+    return "\n".join(lines)
+
+def routing_block(text: str, top_n: int = ROUTING_TOP_N) -> str:
+    """Кусок промпта с ролями для сообщения text; top_n=0 — вся таблица."""
+    from nlp import get_matcher
+    entries, fallback, index = load_routing()
+    picked = range(len(entries))
+    recs = index.recommend(text, top_n) if top_n and len(entries) > top_n else []
+    if recs and recs[0][1] >= ROUTING_MIN_SCORE:
+        named = set(get_matcher([e["name"] for e in entries]).scan((text or "").lower())["assignee"])
+        picked = sorted({i for i, _ in recs} |
+                        {i for i, e in enumerate(entries) if e["name"] in named})  # порядок — как в файле
+    parts = [_routing_entry(entries[i]) for i in picked]
+    if fallback:
+        parts.append(f'- Прочее → «{fallback["name"]}», telegram_id «{fallback.get("telegram_id") or ""}»')
+    return "\n\n".join(parts)
+
+def build_route_prompt(text: str, assignee_names: List[str], author_username=None, message_date=None,
+                       message_link=None, top_n: int = ROUTING_TOP_N) -> str:
+    return USER_PROMPT_TMPL.format(
+        names=", ".join(assignee_names),
+        text=text,
+        author=(author_username or "—"),
+        msg_date=(message_date or "—"),
+        msg_link=(message_link or "—"),
+        routing=routing_block(text, top_n),
+    )
+
+
 def _post_chat(messages: list) -> Optional[str]:
     if not OPENAI_API_KEY:
         logger.warning("LLM: no OPENAI_API_KEY set")
@@ -233,13 +180,7 @@ def llm_route(
     message_link: _Optional[str] = None,
 ) -> dict:
     try:
-        prompt = USER_PROMPT_TMPL.format(
-            names=", ".join(assignee_names),
-            text=text,
-            author=(author_username or "—"),
-            msg_date=(message_date or "—"),
-            msg_link=(message_link or "—"),
-        )
+        prompt = build_route_prompt(text, assignee_names, author_username, message_date, message_link)
         content = _post_chat([{"role":"system","content":SYSTEM_PROMPT},
                               {"role":"user","content":prompt}])
         if not content:
@@ -256,4 +197,63 @@ def llm_route(
         return out
     except Exception:
         logger.exception("LLM parse failed for text=%r", text)
-        return {}
\ No newline at end of file
+        return {}
+# ---------- Извлечение задач из расшифровки встречи ----------
+TRANSCRIPT_SYSTEM_PROMPT = (
+    "Ты извлекаешь поручения (action items) из фрагмента расшифровки рабочей встречи. "
+    "Берёшь только явные поручения с действием и объектом; обсуждения, вопросы и статусы — не задачи. "
+    "Не выдумывай фактов. Ответ ВСЕГДА строго JSON по схеме."
+)
+
+TRANSCRIPT_PROMPT_TMPL = """Контекст:
+- Встреча: {meeting}
+- Дата встречи (локальная): {meeting_date}
+- Список потенциальных исполнителей (имена уникальны): {names}
+- Фрагмент {chunk_no} расшифровки (фрагменты перекрываются — повтор на стыке нормален):
+\"\"\"{text}\"\"\"
+
+ПРАВИЛА:
+- Одна задача = одно поручение. Описание — явное действие 1–2 предложения с объектом и контекстом.
+- assignee — ровно написание из списка {names}, если исполнитель назван или однозначен; иначе null.
+- deadline — только явные даты → YYYY-MM-DD (относительные «к пятнице» считай от даты встречи); иначе null.
+- priority — high при явной срочности, иначе normal.
+- confidence < 0.6 — не включай задачу.
+- quote — короткая цитата из фрагмента, откуда взято поручение.
+
+СТРОГИЙ JSON:
+{{
+  "tasks": [
+    {{"description": "...", "assignee": "Имя" | null, "deadline": "YYYY-MM-DD" | null,
+      "priority": "high" | "normal", "confidence": 0.0-1.0, "quote": "..."}}
+  ]
+}}"""
+
+
+def llm_extract_tasks(
+    chunk_text: str,
+    assignee_names: List[str],
+    meeting: _Optional[str] = None,
+    meeting_date: _Optional[str] = None,
+    chunk_no: int = 1,
+) -> List[dict]:
+    """Поручения из одного фрагмента расшифровки. Ошибка/пустой ответ → []."""
+    try:
+        prompt = TRANSCRIPT_PROMPT_TMPL.format(
+            names=", ".join(assignee_names),
+            text=chunk_text,
+            meeting=(meeting or "—"),
+            meeting_date=(meeting_date or "—"),
+            chunk_no=chunk_no,
+        )
+        content = _post_chat([{"role": "system", "content": TRANSCRIPT_SYSTEM_PROMPT},
+                              {"role": "user", "content": prompt}])
+        if not content:
+            logger.warning("LLM transcript: empty content for chunk %s", chunk_no)
+            return []
+        tasks = json.loads(content).get("tasks") or []
+        out = [t for t in tasks if isinstance(t, dict) and (t.get("description") or "").strip()]
+        logger.info("LLM transcript: chunk %s -> %s tasks", chunk_no, len(out))
+        return out
+    except Exception:
+        logger.exception("LLM transcript parse failed for chunk %s", chunk_no)
+        return []
@@ -1,27 +1,19 @@
 # -*- coding: utf-8 -*-
-import os, json, time, requests
+import json, time, requests
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
-from scheduler import build_combined_pdf_report # XLSX больше не нужен
+from scheduler import build_combined_pdf_report, broadcast_document # XLSX больше не нужен
 
 from app_config import TZ, BOT_TOKEN, VADIM_CHAT_ID, ASSISTANT_CHAT_IDS
-from db import (
-    count_open_like,
-    count_closed_between,
-    get_overdue_open_tasks,
-    get_deadline_changes_between,
-    get_tasks_due_on,
-    get_task,
-    get_nickname_by_tid,
-)
+from db import get_morning_summary
 
 TZINFO = ZoneInfo(TZ)
 TG_API = f"https://api.telegram.org/bot{BOT_TOKEN}"
 WEEKDAYS = {0,1,2,3,4}  # пн–пт
 
-def _assignee_with_nick(name: str | None, tid: str | None) -> str:
+def _assignee_with_nick(name: str | None, nick: str | None) -> str:
     n = (name or "—").strip()
-    nick = (get_nickname_by_tid(tid or "") or "").strip()
+    nick = (nick or "").strip()
     if nick:
         if not nick.startswith("@"):
             nick = "@" + nick
@@ -37,18 +29,6 @@ def _fmt_date(d: str) -> str:
     except Exception:
         return d
 
-def _send_document(chat_id: str, file_path: str, caption: str | None = None):
-    try:
-        with open(file_path, "rb") as f:
-            files = {"document": (os.path.basename(file_path), f)}
-            data = {"chat_id": str(chat_id)}
-            if caption:
-                data["caption"] = caption
-                data["parse_mode"] = "HTML"
-            requests.post(f"{TG_API}/sendDocument", data=data, files=files, timeout=60)
-    except Exception:
-        pass
-
 def _send(chat_id: str, text: str):
     payload = {"chat_id": str(chat_id), "text": text, "parse_mode":"HTML", "disable_web_page_preview": True}
     r = requests.post(f"{TG_API}/sendMessage", json=payload, timeout=20)
@@ -97,47 +77,21 @@ def build_morning_summary(now_local: datetime) -> str:
     today_str     = end_local.strftime("%Y-%m-%d")
     yesterday_str = (end_local - timedelta(days=1)).strftime("%Y-%m-%d")
 
-    # метрики
-    total_open_like  = count_open_like()                         # open + in_progress (срез на сейчас)
-    closed_last_day  = count_closed_between(start_utc, end_utc)  # закрыты в окне
-    overall_overdue  = get_overdue_open_tasks(today_str)         # все просроченные на сейчас
-    overall_overdue_count = len(overall_overdue)
-
-    # --- 2-я часть: переносы дедлайна «со вчера» вперёд в данном окне
-    changes = get_deadline_changes_between(start_utc, end_utc)   # уже JOIN с tasks
-    postponed_map = {}  # task_id -> (task_row, old_deadline, new_deadline)
-    for row in changes:
-        try:
-            tid = int(row["task_id"])
-        except Exception:
-            continue
-        t = get_task(tid)
-        if not t:
-            continue
-        if t["status"] not in ("open", "in_progress"):
-            continue
-        oldd = (row["old_deadline"] or "").strip()
-        newd = (row["new_deadline"] or "").strip()
-        if oldd == yesterday_str and (newd and newd >= today_str):
-            postponed_map[tid] = (t, oldd, newd)
-
-    postponed_yesterday = list(postponed_map.values())
-    postponed_ids = set(postponed_map.keys())
+    # все метрики и списки — одним заходом в базу (агрегаты + CTE)
+    return render_morning_summary(get_morning_summary(start_utc, end_utc, today_str, yesterday_str))
 
-    # --- 1-я часть: задачи, которые стали просроченными "за сутки" и НЕ были перенесены
-    due_yesterday_rows = get_tasks_due_on(yesterday_str)
-    newly_overdue = [
-        r for r in due_yesterday_rows
-        if r["status"] in ("open", "in_progress") and int(r["id"]) not in postponed_ids
-    ]
+def render_morning_summary(summary: dict) -> str:
+    """Текст сводки из результата db.get_morning_summary — в базу больше не ходим."""
+    newly_overdue = summary["overdue"]
+    postponed_yesterday = summary["postponed"]
 
     # Текст
     lines = []
     lines.append("🧾 <b>Ежедневный отчёт за сутки</b>\n")
-    lines.append(f"🌟Задач в работе всего: <b>{total_open_like}</b> (назначенные и взятые в работу)")
-    lines.append(f"🔥 Выполнено за сутки: <b>{closed_last_day}</b>")
+    lines.append(f"🌟Задач в работе всего: <b>{summary['open_like']}</b> (назначенные и взятые в работу)")
+    lines.append(f"🔥 Выполнено за сутки: <b>{summary['closed']}</b>")
     lines.append(f"❌ Просроченных задач за сутки: <b>{len(newly_overdue)}</b>")
-    lines.append(f"⛔️ Общее число просроченных задач в работе сейчас: <b>{overall_overdue_count}</b>\n")
+    lines.append(f"⛔️ Общее число просроченных задач в работе сейчас: <b>{summary['overdue_total']}</b>\n")
 
     if newly_overdue:
         lines.append("<b>Список просроченных задач за сутки:</b>")
@@ -146,18 +100,18 @@ def build_morning_summary(now_local: datetime) -> str:
             lines.append(
                 f"ID: <code>{t['id']}</code>\n"
                 f"Описание: {t['task']}\n"
-                f"Исполнитель: {_assignee_with_nick(t['assignee'], t['telegram_id'])}\n"
+                f"Исполнитель: {_assignee_with_nick(t['assignee'], t['nick'])}\n"
                 f"Дедлайн: {dl}\n"
             )
 
     if postponed_yesterday:
         lines.append("<b>Список переносов (вчера не успели и перенесли дедлайн):</b>")
-        for (t, oldd, newd) in postponed_yesterday:
+        for t in postponed_yesterday:
             lines.append(
                 f"ID: <code>{t['id']}</code>\n"
                 f"Описание: {t['task']}\n"
-                f"Исполнитель: {_assignee_with_nick(t['assignee'], t['telegram_id'])}\n"
-                f"Перенос: {_fmt_date(oldd)} → {_fmt_date(newd)}\n"
+                f"Исполнитель: {_assignee_with_nick(t['assignee'], t['nick'])}\n"
+                f"Перенос: {_fmt_date(t['old_deadline'])} → {_fmt_date(t['new_deadline'])}\n"
             )
 
     lines.append("⬇️Отчёт всех задач по исполнителям внизу⬇️")
@@ -173,11 +127,11 @@ def main():
     # 1) текст
     text = build_morning_summary(now_local)
 
-    # 2) персональные PDF по людям (open/in_progress)
+    # 2) общий PDF по людям (open/in_progress) — собирается в памяти: (имя, поток)
     combined_pdf = build_combined_pdf_report(now_local)
 
     recipients = [str(VADIM_CHAT_ID), *map(str, ASSISTANT_CHAT_IDS)]
-    sent = set()
+    sent = []
     for cid in recipients:
         cid = (cid or "").strip()
         if not cid or cid in sent:
@@ -187,14 +141,16 @@ def main():
             _send(cid, text)
         except Exception:
             pass
-        # один общий файл
-        if combined_pdf:
-            try:
-                _send_document(cid, combined_pdf, caption="📎 Отчёт по всем исполнителям")
-            
-            except Exception:
-                pass
-        sent.add(cid)
+        sent.append(cid)
+
+    # один общий файл: грузим один раз, остальным — по file_id
+    if combined_pdf:
+        try:
+            broadcast_document(sent, combined_pdf, caption="📎 Отчёт по всем исполнителям")
+        except Exception:
+            pass
+        finally:
+            combined_pdf[1].close()
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import re
-from dateutil import parser as dateparser
+from functools import lru_cache
+
+from deadlines import parse_deadline, today_local
 
 TASK_KEYWORDS = [
     "сделай", "нужно", "надо", "проверь", "подготов", "собер", "отправ",
@@ -9,22 +11,90 @@ TASK_KEYWORDS = [
 PRIORITY_WORDS = {"срочно", "важно", "asap", "urgent", "critical"}
 MENTION_RE = re.compile(r"@\w+", re.IGNORECASE)
 
+# ---------- матчер ключевых слов и справочника исполнителей, собирается один раз ----------
+# Ключевые слова — основы, ищутся подстрокой (как раньше `k in t`) одной альтернацией.
+# Имена — целыми словами (как раньше \bимя\b), но с падежными формами (Вадим → Вадиму/Вадимом,
+# Маша → Маше/Машей, Андрей → Андрею): формы разворачиваются заранее в словарь «словоформа →
+# имена», текст режется на слова один раз — дальше только поиск в словаре, без regex на каждое имя.
+_WORD_RE = re.compile(r"\w+")
+_RU_ENDINGS = (
+    ("ь", ("ь", "я", "ю", "ем", "е")),
+    ("й", ("й", "я", "ю", "ем", "е", "и")),
+    ("а", ("а", "ы", "и", "е", "у", "ой", "ою", "ей")),
+    ("я", ("я", "и", "е", "ю", "ей", "ею")),
+)
+_RU_CONSONANT_ENDINGS = ("", "а", "у", "ом", "е", "ым", "ем", "ы", "ой")
+
+def _word_forms(word: str) -> frozenset[str]:
+    """Слово имени → его падежные формы (только кириллица от 3 букв; остальное — как есть)."""
+    if len(word) < 3 or not re.fullmatch(r"[а-яё]+", word):
+        return frozenset((word,))
+    for tail, endings in _RU_ENDINGS:
+        if word.endswith(tail):
+            return frozenset(word[:-1] + e for e in endings)
+    if word[-1] in "еёиоуыэю":
+        return frozenset((word,))
+    return frozenset(word + e for e in _RU_CONSONANT_ENDINGS)
+
+class TextMatcher:
+    """Все совпадения: ключевые слова задачи и приоритета, исполнители — за один разбор текста."""
+
+    def __init__(self, assignee_names=()):
+        self._kw_kind = {**{k: "task" for k in TASK_KEYWORDS}, **{w: "priority" for w in PRIORITY_WORDS}}
+        self._kw_re = re.compile("|".join(re.escape(k) for k in sorted(self._kw_kind, key=len, reverse=True)))
+        # первая словоформа имени → [(имя, формы остальных слов)]
+        self._names: dict[str, list[tuple[str, tuple[frozenset, ...]]]] = {}
+        for name in assignee_names:
+            words = _WORD_RE.findall((name or "").lower())
+            if not words:
+                continue
+            rest = tuple(_word_forms(w) for w in words[1:])
+            for form in _word_forms(words[0]):
+                self._names.setdefault(form, []).append((name, rest))
+
+    def scan(self, text_lower: str) -> dict[str, list[str]]:
+        """Текст в нижнем регистре → {"task": [...], "priority": [...], "assignee": [...]} без повторов."""
+        hits = {"task": [], "priority": [], "assignee": []}
+        for kw in self._kw_re.findall(text_lower):
+            kind = self._kw_kind[kw]
+            if kw not in hits[kind]:
+                hits[kind].append(kw)
+        if self._names:
+            spans = []  # (начало, конец, имя) в словах
+            words = _WORD_RE.findall(text_lower)
+            for i, w in enumerate(words):
+                for name, rest in self._names.get(w, ()):
+                    if all(i + j + 1 < len(words) and words[i + j + 1] in forms for j, forms in enumerate(rest)):
+                        spans.append((i, i + 1 + len(rest), name))
+            for a, b, name in spans:
+                # вложенное упоминание («Иван» внутри «Иван Петров») не считаем
+                if name not in hits["assignee"] and not any(
+                    a2 <= a and b <= b2 and (b2 - a2) > (b - a) for a2, b2, _ in spans
+                ):
+                    hits["assignee"].append(name)
+        return hits
+
+@lru_cache(maxsize=8)
+def _matcher_for(assignee_names: tuple[str, ...]) -> TextMatcher:
+    return TextMatcher(assignee_names)
+
+def get_matcher(assignee_names=()) -> TextMatcher:
+    """Матчер пересобирается, только когда меняется список исполнителей."""
+    return _matcher_for(tuple(assignee_names or ()))
+
 def looks_like_task(text: str) -> bool:
     t = (text or "").lower()
     if len(t.split()) < 3:
         return False
-    return any(k in t for k in TASK_KEYWORDS)
+    return bool(get_matcher().scan(t)["task"])
 
 def extract_deadline(text: str, default_tz=None) -> str | None:
-    try:
-        d = dateparser.parse(text, dayfirst=True, fuzzy=True)
-        return d.strftime("%Y-%m-%d") if d else None
-    except Exception:
-        return None
+    """Дедлайн внутри сообщения («подготовь к пятнице») — см. deadlines.parse_deadline."""
+    return parse_deadline(text, free_text=True)
 
 def extract_priority(text: str) -> str:
     t = (text or "").lower()
-    return "high" if any(w in t for w in PRIORITY_WORDS) else "normal"
+    return "high" if get_matcher().scan(t)["priority"] else "normal"
 
 def strip_bot_mention(text: str, bot_username: str) -> str:
     if not bot_username:
@@ -32,17 +102,47 @@ def strip_bot_mention(text: str, bot_username: str) -> str:
     return re.sub(rf"@{re.escape(bot_username)}\b", "", text or "", flags=re.IGNORECASE).strip()
 
 def detect_assignee(text: str, assignee_names: list[str]) -> tuple[str | None, list[str]]:
-    """Эвристика: (однозначное_имя|None, [возможные])"""
-    t = (text or "").lower()
-    hits = []
-    for name in assignee_names:
-        nm = (name or "").lower().strip()
-        if not nm:
-            continue
-        if re.search(rf"\b{re.escape(nm)}\b", t):
-            hits.append(name)
+    """
+    Эвристика: (однозначное_имя|None, [возможные]); имена — с падежными формами.
+    Вложенные имена («Иван» и «Иван Петров») в одном упоминании — засчитывается самое длинное.
+    """
+    found = set(get_matcher(assignee_names).scan((text or "").lower())["assignee"])
+    hits = [n for n in assignee_names if n in found]  # порядок — как в справочнике
     if len(hits) == 1:
         return hits[0], hits
     if len(hits) > 1:
         return None, hits
     return None, []
+
+# ---------- пакетный режим: те же эвристики на список сообщений ----------
+BATCH_FIELDS = ("looks_like_task", "priority", "deadline", "assignee", "candidates")
+
+def analyze_batch(texts, assignee_names=(), *, today=None) -> dict[str, list]:
+    """
+    Эвристики на пачку сообщений (фолбэк, когда LLM не ответил): результат по столбцам,
+    {поле: [значение для texts[i]]} с полями BATCH_FIELDS — те же значения, что дают
+    looks_like_task / extract_priority / extract_deadline / detect_assignee по одному.
+    Нижний регистр и scan матчера — один раз на сообщение, одинаковые тексты — один раз,
+    матчер и «сегодня» — один раз на пачку.
+    """
+    matcher = get_matcher(assignee_names)
+    names = list(assignee_names or ())
+    today = today or today_local()
+    lowered = [(t or "").lower() for t in texts]
+    rows: dict[str, tuple] = {}
+    for t in lowered:
+        if t in rows:
+            continue
+        hits = matcher.scan(t)
+        found = set(hits["assignee"])
+        cands = [n for n in names if n in found]
+        rows[t] = (
+            len(t.split()) >= 3 and bool(hits["task"]),
+            "high" if hits["priority"] else "normal",
+            parse_deadline(t, today, free_text=True),
+            cands[0] if len(cands) == 1 else None,
+            cands,
+        )
+    cols = {f: [rows[t][k] for t in lowered] for k, f in enumerate(BATCH_FIELDS)}
+    cols["candidates"] = [list(c) for c in cols["candidates"]]  # у повторов — свои списки
+    return cols
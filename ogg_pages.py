@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Нарезка Ogg/Opus на самостоятельные куски по границам страниц контейнера (без ffmpeg).
+
+Страница Ogg: заголовок 27 байт ('OggS', версия, флаги, granule, serial, номер, CRC, число
+сегментов) + таблица сегментов + данные. Opus-поток: страница OpusHead, страница(ы) OpusTags
+(granule = 0), дальше звук; granule — число сэмплов 48 кГц на конец страницы.
+
+Кусок = копия заголовочных страниц + подряд идущие звуковые страницы. Режем только там, где
+следующая страница не продолжает пакет (флаг continued), granule сдвигаем к началу куска,
+номера страниц перенумеровываем, на последней ставим EOS и пересчитываем CRC.
+"""
+import struct
+import zlib
+
+OPUS_RATE = 48000
+
+_HDR = struct.Struct("<4sBBqIIIB")  # capture, version, flags, granule, serial, seqno, crc, nsegs
+_CONTINUED, _BOS, _EOS = 0x01, 0x02, 0x04
+_NO_GRANULE = -1  # на странице не закончился ни один пакет
+
+# CRC Ogg — CRC-32 (poly 0x04C11DB7) без отражения, init 0, без финального xor. zlib.crc32 —
+# отражённый вариант того же полинома: разворачиваем биты в байтах на входе и в результате
+_REV8 = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+
+def ogg_crc(data: bytes) -> int:
+    raw = zlib.crc32(data.translate(_REV8), 0xFFFFFFFF) ^ 0xFFFFFFFF
+    return int(f"{raw:032b}"[::-1], 2)
+
+
+def iter_pages(f):
+    """Страницы из бинарного потока: (flags, granule, serial, seqno, segment_table, data)."""
+    while True:
+        hdr = f.read(_HDR.size)
+        if not hdr:
+            return
+        if len(hdr) < _HDR.size:
+            raise ValueError("ogg: обрезанный заголовок страницы")
+        capture, version, flags, granule, serial, seqno, _crc, nsegs = _HDR.unpack(hdr)
+        if capture != b"OggS" or version != 0:
+            raise ValueError("ogg: нет сигнатуры OggS")
+        table = f.read(nsegs)
+        data = f.read(sum(table))
+        if len(table) < nsegs or len(data) < sum(table):
+            raise ValueError("ogg: обрезанная страница")
+        yield flags, granule, serial, seqno, table, data
+
+
+def write_page(out, flags: int, granule: int, serial: int, seqno: int, table: bytes, data: bytes):
+    page = bytearray(_HDR.pack(b"OggS", 0, flags, granule, serial, seqno, 0, len(table)))
+    page += table
+    page += data
+    struct.pack_into("<I", page, 22, ogg_crc(bytes(page)))
+    out.write(page)
+
+
+def split_opus(f, max_segment_s: float, new_out):
+    """
+    Поток Ogg/Opus → список потоков (new_out() — куда писать; на выходе позиция 0), каждый
+    ≈ max_segment_s (режем на первой допустимой границе страницы после лимита).
+    None — не одиночный Ogg/Opus-поток (mp3, несколько логических потоков, битый файл).
+    """
+    try:
+        pages = list(iter_pages(f))
+    except ValueError:
+        return None
+    if not pages or not pages[0][5].startswith(b"OpusHead") or len({p[2] for p in pages}) != 1:
+        return None
+
+    n_head = 0
+    while n_head < len(pages) and pages[n_head][1] == 0:
+        n_head += 1
+    head, audio = pages[:n_head], pages[n_head:]
+    if n_head < 2 or not audio:
+        return None
+
+    # границы: после страницы i, если у неё известен granule и следующая не продолжает пакет
+    max_samples = int(max_segment_s * OPUS_RATE)
+    groups, cur, base = [], [], 0
+    for i, page in enumerate(audio):
+        cur.append(page)
+        granule = page[1]
+        nxt = audio[i + 1] if i + 1 < len(audio) else None
+        if (nxt is not None and granule != _NO_GRANULE and not nxt[0] & _CONTINUED
+                and granule - base >= max_samples):
+            groups.append((base, cur))
+            cur, base = [], granule
+    if cur:
+        groups.append((base, cur))
+
+    outs = []
+    for base, group in groups:
+        out = new_out()
+        seq = 0
+        for flags, granule, serial, _, table, data in head:
+            write_page(out, flags & ~_EOS, granule, serial, seq, table, data)
+            seq += 1
+        for j, (flags, granule, serial, _, table, data) in enumerate(group):
+            flags &= ~(_BOS | _EOS)
+            if j == len(group) - 1:
+                flags |= _EOS
+            write_page(out, flags, granule - base if granule != _NO_GRANULE else granule,
+                       serial, seq, table, data)
+            seq += 1
+        out.seek(0)
+        outs.append(out)
+    return outs
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Разбивка текста на строки для PDF-отчётов с кэшированием замеров.
+
+pdfmetrics.stringWidth для TTF/Type1 — это просто сумма ширин глифов (без кернинга),
+поэтому ширину любой строки можно собрать из таблицы «символ → ширина».
+Таблица одна на (шрифт, кегль), ширины целых слов дополнительно лежат в LRU:
+одни и те же «Дедлайн:», «Переносов дедлайна:», имена меряются один раз на отчёт.
+"""
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+
+WORD_CACHE_SIZE = 8192
+
+
+class LineWrapper:
+    """Перенос строк по реальной ширине для одного (шрифт, кегль)."""
+
+    def __init__(self, font_name: str, font_size: float):
+        self.font_name = font_name
+        self.font_size = font_size
+        self._glyphs: dict[str, float] = {}
+        self.word_width = lru_cache(maxsize=WORD_CACHE_SIZE)(self._measure)
+        self.space_w = self._measure(" ")
+
+    def _measure(self, s: str) -> float:
+        glyphs = self._glyphs
+        w = 0.0
+        for ch in s:
+            gw = glyphs.get(ch)
+            if gw is None:
+                gw = glyphs[ch] = pdfmetrics.stringWidth(ch, self.font_name, self.font_size)
+            w += gw
+        return w
+
+    def _split_hard(self, word: str, max_width_pt: float) -> list[str]:
+        """Рубим безпробельный фрагмент на максимально длинные влезающие куски (минимум 1 символ)."""
+        glyphs = self._glyphs
+        out = []
+        start, n = 0, len(word)
+        while start < n:
+            w, end = 0.0, start
+            while end < n:
+                gw = glyphs.get(word[end])
+                if gw is None:
+                    gw = self._measure(word[end])
+                if w + gw > max_width_pt:
+                    break
+                w += gw
+                end += 1
+            end = max(end, start + 1)
+            out.append(word[start:end])
+            start = end
+        return out
+
+    def wrap(self, text: str, max_width_pt: float) -> list[str]:
+        """
+        Режем текст на строки не шире max_width_pt (в pt).
+        Перенос по словам; слово шире строки рубим жёстко. Пустые абзацы сохраняем.
+        """
+        word_width = self.word_width
+        space_w = self.space_w
+        lines = []
+        for para in (text or "").split("\n"):
+            words = para.split(" ") if para else [""]
+            cur = ""
+            cur_w = 0.0
+
+            for w in words:
+                token = (w + " ") if w else " "
+                token_w = (word_width(w) + space_w) if w else space_w
+
+                if token_w <= (max_width_pt - cur_w):
+                    cur += token
+                    cur_w += token_w
+                elif word_width(w) > max_width_pt:
+                    if cur.strip():
+                        lines.append(cur.rstrip())
+                        cur, cur_w = "", 0.0
+                    chunks = self._split_hard(w, max_width_pt)
+                    lines.extend(chunks[:-1])
+                    cur = chunks[-1] + " "
+                    cur_w = self._measure(cur)
+                else:
+                    if cur.strip():
+                        lines.append(cur.rstrip())
+                    cur = token
+                    cur_w = token_w
+
+            if cur.strip() or para == "":
+                lines.append(cur.rstrip())
+        return lines
+
+    def wrap_section(self, items) -> list[list[str]]:
+        """Пакетный перенос: items = [(text, max_width_pt), ...] → строки для каждого элемента."""
+        return [self.wrap(text, width) for text, width in items]
+
+
+_WRAPPERS: dict[tuple[str, float], LineWrapper] = {}
+
+def get_wrapper(font_name: str, font_size: float) -> LineWrapper:
+    """Общий LineWrapper на процесс для (шрифт, кегль) — таблица глифов и LRU слов переиспользуются."""
+    key = (font_name, font_size)
+    wr = _WRAPPERS.get(key)
+    if wr is None:
+        wr = _WRAPPERS[key] = LineWrapper(font_name, font_size)
+    return wr
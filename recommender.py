@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Подсказка исполнителя по истории без LLM: BM25 по описаниям одобренных задач.
+
+Документ = все одобренные задачи (open / in_progress / done) одного исполнителя — по полю
+assignee, то есть уже после переназначений. Сам BM25 — в bm25.py (без БД). Индекс в памяти,
+перестраивается, когда сменилась эпоха tasks (cache_epoch), но не чаще раза в
+RECOMMENDER_REFRESH_S — история копится медленно, а задачи меняются постоянно. Запрос — словарь термов × десятки исполнителей, доли миллисекунды.
+"""
+import time
+
+from bm25 import AssigneeIndex
+from db import get_approved_task_texts, get_cache_epochs
+
+RECOMMENDER_REFRESH_S = 300
+# уверенная подсказка: счёт не ниже порога и заметно выше второго места
+RECOMMEND_MIN_SCORE = 3.0
+RECOMMEND_MIN_MARGIN = 1.3
+
+
+def confident_pick(recs: list[tuple[str, float]]) -> str | None:
+    """Первое место, если оно уверенное — иначе None (пусть решает ассистент)."""
+    if not recs or recs[0][1] < RECOMMEND_MIN_SCORE:
+        return None
+    if len(recs) > 1 and recs[0][1] < recs[1][1] * RECOMMEND_MIN_MARGIN:
+        return None
+    return recs[0][0]
+
+
+_INDEX: tuple = (None, 0.0, None)  # (эпоха tasks, когда собран, индекс)
+
+def get_index() -> AssigneeIndex:
+    global _INDEX
+    epoch, built_at, index = _INDEX
+    now = time.monotonic()
+    if index is None or (now - built_at >= RECOMMENDER_REFRESH_S and get_cache_epochs(("tasks",)) != epoch):
+        epoch = get_cache_epochs(("tasks",))
+        docs: dict[str, list[str]] = {}
+        for name, text in get_approved_task_texts():
+            docs.setdefault(name, []).append(text)
+        _INDEX = (epoch, now, AssigneeIndex(docs))
+    return _INDEX[2]
+
+def recommend_assignees(text: str, k: int = 3, names=None) -> list[tuple[str, float]]:
+    """Топ-k исполнителей для текста по истории; names — актуальный справочник (уволенных не советуем)."""
+    return get_index().recommend(text, k, names)
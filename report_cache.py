@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш готовых отчётов (PDF/XLSX/CSV).
+
+Ключ — (вид отчёта, параметры, версия данных). Версия — сумма эпох cache_epoch, их бампают
+триггеры на tasks, task_reassignments, deadline_changes и assignees (см. db._ensure_schema), поэтому
+повторный запрос без записей в базу отдаёт уже собранные байты, а любая правка —
+промах и пересборка. Хранилище — таблица report_cache, общая для бота, scheduler
+и утреннего cron; вытеснение LRU по last_used_at.
+"""
+import io
+import json
+import logging
+import tempfile
+
+from app_config import REPORT_CACHE_MAX_ENTRIES
+from db import get_data_version, get_cached_report, put_cached_report
+
+log = logging.getLogger("bot.report_cache")
+
+REPORT_CACHE_MAX_BYTES = 20 * 1024 * 1024  # крупнее не кэшируем — не раздуваем базу
+# Отчёты собираем в памяти; если файл вырос больше порога — SpooledTemporaryFile
+# сам уходит во временный файл (и удаляется при close()).
+REPORT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+def new_report_buffer():
+    """Буфер под файл отчёта: в памяти до REPORT_SPOOL_MAX_BYTES, дальше — временный файл."""
+    return tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_BYTES, mode="w+b")
+
+
+def _params_key(params) -> str:
+    return json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def cached_report(kind: str, params, filename: str, build):
+    """
+    build() собирает отчёт и возвращает поток, спозиционированный на 0.
+    Возвращает (filename, поток): при попадании — BytesIO из кэша, иначе — свежий поток из build().
+    Имя файла всегда текущее (в нём штамп времени), кэшируются только байты.
+    """
+    if REPORT_CACHE_MAX_ENTRIES <= 0:
+        return filename, build()
+
+    key = _params_key(params)
+    try:
+        # версию читаем ДО сборки: запись во время сборки даст лишний промах, но не устаревший кэш
+        version = get_data_version()
+        data = get_cached_report(kind, key, version)
+    except Exception as e:
+        log.warning("report_cache: lookup %s failed: %s", kind, e, exc_info=True)
+        return filename, build()
+    if data is not None:
+        return filename, io.BytesIO(data)
+
+    buf = build()
+    size = buf.seek(0, io.SEEK_END)
+    buf.seek(0)
+    if size <= REPORT_CACHE_MAX_BYTES:
+        try:
+            put_cached_report(kind, key, version, buf.read(), REPORT_CACHE_MAX_ENTRIES)
+        except Exception as e:
+            # кэш — оптимизация: не смогли сохранить, отдаём отчёт как есть
+            log.warning("report_cache: store %s failed: %s", kind, e, exc_info=True)
+        buf.seek(0)
+    return filename, buf
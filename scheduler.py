@@ -4,12 +4,14 @@ import io
 import csv
 import time
 import json
+import hashlib
 import requests
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 from html import escape as h
 
-from app_config import BOT_TOKEN, TZ, VADIM_CHAT_ID, ASSISTANT_CHAT_IDS
+from app_config import BOT_TOKEN, TZ, VADIM_CHAT_ID, ASSISTANT_CHAT_IDS, PDF_RENDER_WORKERS, CHANGE_LOG_RETENTION_DAYS
 from db import (
     get_conn,
     tasks_sent_between,
@@ -17,21 +19,27 @@ from db import (
     list_unique_assignees,
     get_reassignments_between,
     get_deadline_changes_between,
-    get_deadline_changes_for_task,
+    iter_tasks_with_history,
     enqueue_outbox,
-    pop_due_outbox,
+    claim_due_outbox,
     mark_outbox_sent,
     get_closed_tasks_between,
     count_open_like,
     count_closed_between,
     get_overdue_open_tasks,
+    get_report_file_id,
+    save_report_file_id,
+    forget_report_file_id,
+    prune_change_log,
 )
+from report_cache import cached_report, new_report_buffer
 
 # --- опционально: openpyxl для старого XLSX-отчёта (пусть остаётся для обратной совместимости)
 try:
     import openpyxl
     from openpyxl.styles import Font, Alignment
     from openpyxl.utils import get_column_letter
+    from openpyxl.cell import WriteOnlyCell
 except Exception:
     openpyxl = None
 
@@ -123,8 +131,7 @@ ASSISTANTS_BEGIN_PAUSE_S = 2.0
 ASSISTANT_DELAY_S  = 1.25   # пауза между ассистентами
 ASSIGNEE_BATCH_SIZE = 25    # после каждых 25 — микро-пауза
 ASSIGNEE_BATCH_PAUSE_S = 1.0
-
-REPORT_DIR = "/tmp"  # куда класть xlsx/csv/pdf
+REPORT_FANOUT_WORKERS = 4   # параллельная рассылка file_id остальным адресатам
 
 def is_work_time(dt):
     local = dt.astimezone(TZINFO)
@@ -256,15 +263,40 @@ def send_long(chat_id, text, *, chunk=3800, base_delay_s=0.0):
         send(chat_id, head + part, base_delay_s=base_delay_s, _allow_chunk=False)
         time.sleep(0.3)
 
-def send_document(chat_id, file_path, *, caption=None, base_delay_s: float = 0.0):
+def _document_file_id(r) -> str | None:
+    try:
+        return r.json()["result"]["document"]["file_id"]
+    except Exception:
+        return None
+
+def _document_parts(document):
+    """
+    document — путь к файлу ИЛИ пара (имя_файла, поток).
+    Возвращает (имя, поток|None); None означает «открыть путь самим».
+    """
+    if isinstance(document, (tuple, list)):
+        name, stream = document
+        return name, stream
+    return os.path.basename(document), None
+
+def send_document(chat_id, document, *, caption=None, base_delay_s: float = 0.0) -> str | None:
     """
     Отправка документа с ретраями 429 и паузами.
+    document — путь к файлу или пара (имя, поток) из build_*_report.
+    Поток не закрываем: им владеет вызывающий.
+    Возвращает Telegram file_id загруженного файла (или None при ошибке).
     """
     if base_delay_s > 0:
         time.sleep(base_delay_s)
 
+    name, stream = _document_parts(document)
     for attempt in range(3):
-        files = {"document": (os.path.basename(file_path), open(file_path, "rb"))}
+        if stream is None:
+            fh = open(document, "rb")
+        else:
+            stream.seek(0)
+            fh = stream
+        files = {"document": (name, fh)}
         data = {"chat_id": str(chat_id)}
         if caption:
             data["caption"] = caption
@@ -276,10 +308,46 @@ def send_document(chat_id, file_path, *, caption=None, base_delay_s: float = 0.0
             time.sleep(0.5)
             continue
         finally:
+            if stream is None:
+                try:
+                    fh.close()
+                except Exception:
+                    pass
+
+        if r.status_code == 429:
             try:
-                files["document"][1].close()
+                retry = r.json().get("parameters", {}).get("retry_after", 1)
             except Exception:
-                pass
+                retry = 1
+            time.sleep(retry + 0.5)
+            continue
+
+        if not r.ok:
+            print(f"[scheduler.sendDocument] FAIL chat={chat_id} code={r.status_code} body={r.text[:300]}")
+            return None
+        print(f"[scheduler.sendDocument] OK chat={chat_id} file={name}")
+        return _document_file_id(r)
+    return None
+
+def send_document_by_id(chat_id, file_id: str, *, caption=None, base_delay_s: float = 0.0) -> bool:
+    """
+    Повторная отправка уже загруженного в Telegram документа по file_id (без multipart).
+    """
+    if base_delay_s > 0:
+        time.sleep(base_delay_s)
+
+    payload = {"chat_id": str(chat_id), "document": file_id}
+    if caption:
+        payload["caption"] = caption
+        payload["parse_mode"] = "HTML"
+
+    for attempt in range(3):
+        try:
+            r = requests.post(f"{TG_API}/sendDocument", json=payload, timeout=20)
+        except Exception as e:
+            print(f"[scheduler.sendDocumentById] EXC chat={chat_id} attempt={attempt+1}: {e}")
+            time.sleep(0.5)
+            continue
 
         if r.status_code == 429:
             try:
@@ -290,10 +358,69 @@ def send_document(chat_id, file_path, *, caption=None, base_delay_s: float = 0.0
             continue
 
         if not r.ok:
-            print(f"[scheduler.sendDocument] FAIL chat={chat_id} code={r.status_code} body={r.text[:300]}")
+            print(f"[scheduler.sendDocumentById] FAIL chat={chat_id} code={r.status_code} body={r.text[:300]}")
+            return False
+        print(f"[scheduler.sendDocumentById] OK chat={chat_id}")
+        return True
+    return False
+
+def _document_sha256(document) -> str:
+    hsh = hashlib.sha256()
+    _, stream = _document_parts(document)
+    if stream is None:
+        with open(document, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                hsh.update(block)
+    else:
+        stream.seek(0)
+        for block in iter(lambda: stream.read(1 << 16), b""):
+            hsh.update(block)
+        stream.seek(0)
+    return hsh.hexdigest()
+
+def broadcast_document(recipients, document, *, caption=None):
+    """
+    Рассылка одного и того же файла нескольким адресатам:
+    - файл грузим в Telegram ОДИН раз (первому адресату) и запоминаем file_id по sha256 содержимого;
+    - остальным параллельно шлём только file_id.
+    Если file_id для такого же содержимого уже есть в кэше — не грузим вовсе.
+    """
+    chats = []
+    for cid in recipients:
+        cid = str(cid or "").strip()
+        if cid and cid not in chats:
+            chats.append(cid)
+    if not chats:
+        return
+
+    digest = _document_sha256(document)
+    file_id = get_report_file_id(digest)
+    rest = chats
+
+    if file_id:
+        # проверяем кэш на первом адресате: протухший file_id → забываем и грузим заново
+        if send_document_by_id(chats[0], file_id, caption=caption):
+            rest = chats[1:]
         else:
-            print(f"[scheduler.sendDocument] OK chat={chat_id} file={os.path.basename(file_path)}")
-        break
+            forget_report_file_id(digest)
+            file_id = None
+
+    while not file_id and rest:
+        cid, rest = rest[0], rest[1:]
+        file_id = send_document(cid, document, caption=caption)
+        if file_id:
+            save_report_file_id(digest, file_id, _document_parts(document)[0])
+
+    if not (file_id and rest):
+        return
+
+    with ThreadPoolExecutor(max_workers=min(REPORT_FANOUT_WORKERS, len(rest))) as pool:
+        futures = {pool.submit(send_document_by_id, cid, file_id, caption=caption): cid for cid in rest}
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"[scheduler.broadcastDocument] ERROR chat={futures[fut]}: {e}")
 
 def _fmt_local(iso_utc: str) -> str:
     if not iso_utc:
@@ -312,209 +439,210 @@ def _fmt_local_date(iso_utc: str) -> str:
         return iso_utc
 
 # --------------------------- СТАРЫЙ XLSX/CSV (оставляем как есть) ---------------------------
-def build_excel_report_file(now=None) -> str:
+def build_excel_report_file(now=None):
     """
     Строит Excel (или CSV при отсутствии openpyxl) с таблицей:
     Человек | ID | Текст задачи | Статус | Когда поставлена | Переносы дедлайна? | История переносов
     Включаем только задачи в статусах open/in_progress.
-    Возвращает путь к файлу.
+    Возвращает пару (имя_файла, поток) — файл собран в памяти, на диск не пишем.
+    Без записей в базу с прошлой сборки отдаётся из кэша отчётов.
     """
     now = (now or datetime.now(TZINFO))
     stamp = now.strftime("%Y%m%d_%H%M")
     base_name_xlsx = f"daily_tasks_report_{stamp}.xlsx"
     base_name_csv  = f"daily_tasks_report_{stamp}.csv"
-    path_xlsx = os.path.join(REPORT_DIR, base_name_xlsx)
-    path_csv  = os.path.join(REPORT_DIR, base_name_csv)
-
-    with get_conn() as c:
-        rows = c.execute(
-            """
-            SELECT * FROM tasks
-            WHERE status IN ('open','in_progress')
-            ORDER BY
-            assignee,
-            CASE WHEN TRIM(COALESCE(deadline, '')) = '' THEN 1 ELSE 0 END,
-            deadline,
-            created_at
-            """
-        ).fetchall()
 
     header = ["Человек", "ID", "Текст задачи", "Статус", "Когда поставлена", "Переносы дедлайна?", "История переносов"]
-    data_rows = []
 
-    for r in rows:
-        dchs = get_deadline_changes_for_task(r["id"])
-        had_postpone = len(dchs) > 0
-        hist = []
-        for d in dchs:
-            by_who = ""
-            try:
-                if hasattr(d, "keys") and "by_who" in d.keys():
-                    by_who = (d["by_who"] or "").strip()
-            except Exception:
+    def data_rows():
+        # курсор + история пачками; строки сразу уходят в writer, список всех строк не копим
+        for r, _reas, dchs in iter_tasks_with_history(("open", "in_progress"), order="assignee"):
+            had_postpone = len(dchs) > 0
+            hist = []
+            for d in dchs:
                 by_who = ""
-
-            when = _fmt_local(d["at"])
-            oldd = d["old_deadline"] or "—"
-            newd = d["new_deadline"] or "—"
-            by = f" (кем: {by_who})" if by_who else ""
-            hist.append(f"{oldd} → {newd} [{when}{by}]")
-
-        data_rows.append([
-            r["assignee"] or "—",
-            r["id"],
-            r["task"],
-            r["status"],
-            _fmt_local(r["created_at"]),
-            "Да" if had_postpone else "Нет",
-            "; ".join(hist) if hist else "—",
-        ])
-
-    if openpyxl:
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Задачи в работе"
-        for j, val in enumerate(header, 1):
-            cell = ws.cell(row=1, column=j, value=val)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="center")
-        for i, row in enumerate(data_rows, 2):
-            for j, val in enumerate(row, 1):
-                ws.cell(row=i, column=j, value=val)
+                try:
+                    if hasattr(d, "keys") and "by_who" in d.keys():
+                        by_who = (d["by_who"] or "").strip()
+                except Exception:
+                    by_who = ""
+
+                when = _fmt_local(d["at"])
+                oldd = d["old_deadline"] or "—"
+                newd = d["new_deadline"] or "—"
+                by = f" (кем: {by_who})" if by_who else ""
+                hist.append(f"{oldd} → {newd} [{when}{by}]")
+
+            yield [
+                r["assignee"] or "—",
+                r["id"],
+                r["task"],
+                r["status"],
+                _fmt_local(r["created_at"]),
+                "Да" if had_postpone else "Нет",
+                "; ".join(hist) if hist else "—",
+            ]
+
+    def build_xlsx():
+        # write_only: строки пишутся в поток листа и не держатся объектами Cell в памяти
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("Задачи в работе")
         widths = [16, 8, 60, 14, 20, 20, 80]
         for idx, w in enumerate(widths, 1):
-            ws.column_dimensions[get_column_letter(idx)].width = w
-        wb.save(path_xlsx)
-        return path_xlsx
-
-    with open(path_csv, "w", newline="", encoding="utf-8-sig") as f:
+            ws.column_dimensions[get_column_letter(idx)].width = w  # до первой строки — иначе не применится
+        head = []
+        for val in header:
+            cell = WriteOnlyCell(ws, value=val)
+            cell.font = Font(bold=True)
+            cell.alignment = Alignment(horizontal="center")
+            head.append(cell)
+        ws.append(head)
+        for row in data_rows():
+            ws.append(row)
+        buf = new_report_buffer()
+        wb.save(buf)
+        buf.seek(0)
+        return buf
+
+    def build_csv():
+        buf = new_report_buffer()
+        f = io.TextIOWrapper(buf, encoding="utf-8-sig", newline="")
         writer = csv.writer(f, delimiter=";")
         writer.writerow(header)
-        writer.writerows(data_rows)
-    return path_csv
+        for row in data_rows():
+            writer.writerow(row)
+        f.flush()
+        f.detach()  # буфер остаётся открытым
+        buf.seek(0)
+        return buf
 
-# --------------------------- НОВОЕ: персональные PDF-отчёты ---------------------------
-# ВНИМАНИЕ: заменить существующую _pdf_draw_wrapped в scheduler.py
+    if openpyxl:
+        return cached_report("daily_xlsx", None, base_name_xlsx, build_xlsx)
+    return cached_report("daily_csv", None, base_name_csv, build_csv)
 
+# --------------------------- НОВОЕ: персональные PDF-отчёты ---------------------------
 from reportlab.pdfbase import pdfmetrics
+from pdf_layout import get_wrapper
+
+MM_TO_PT = 72.0 / 25.4
+
+def _pdf_draw_lines(c, lines, x_mm, y_mm, *, font_size=10, line_spacing=1.3):
+    """Рисует готовые строки сверху вниз. Возвращает новую координату y (в мм)."""
+    x_pt = x_mm * MM_TO_PT
+    y_pt = y_mm * MM_TO_PT
+    step_pt = font_size * line_spacing
+    for ln in lines:
+        c.drawString(x_pt, y_pt, ln)
+        y_pt -= step_pt
+    return y_pt / MM_TO_PT
 
 def _pdf_draw_wrapped(c, text, x_mm, y_mm, *, max_width_mm=170, font_name="Helvetica", font_size=10, line_spacing=1.3):
     """
     Рисует многострочный текст с переносами по реальной ширине.
-    - Ширина измеряется pdfmetrics.stringWidth (в pt).
+    - Ширина считается через pdf_layout.LineWrapper (таблица глифов + LRU ширин слов).
     - Переносим по словам; очень длинные «слова» (URL/без пробелов) рубим жёстко.
     - Возвращает новую координату y (в мм).
     """
-    # перевод мм -> pt
-    MM_TO_PT = 72.0 / 25.4
-    max_width_pt = max_width_mm * MM_TO_PT
-    x_pt = x_mm * MM_TO_PT
-    y_pt = y_mm * MM_TO_PT
-
     c.setFont(font_name, font_size)
+    lines = get_wrapper(font_name, font_size).wrap(text, max_width_mm * MM_TO_PT)
+    return _pdf_draw_lines(c, lines, x_mm, y_mm, font_size=font_size, line_spacing=line_spacing)
 
-    def split_hard(word, remain_pt):
-        """Рубим очень длинные безпробельные фрагменты так, чтобы куски влазили."""
-        out = []
-        start = 0
-        while start < len(word):
-            lo, hi = 1, len(word) - start
-            # бинарный поиск максимального вместимого куска
-            while lo <= hi:
-                mid = (lo + hi) // 2
-                chunk = word[start:start+mid]
-                w = pdfmetrics.stringWidth(chunk, font_name, font_size)
-                if w <= remain_pt:
-                    lo = mid + 1
-                else:
-                    hi = mid - 1
-            take = max(1, hi)
-            out.append(word[start:start+take])
-            start += take
-            # на следующий кусок у нас будет полная строка, не остаток
-            remain_pt = max_width_pt
-        return out
-
-    lines = []
-    for para in (text or "").split("\n"):
-        words = para.split(" ") if para else [""]
-        cur = ""
-        cur_w = 0.0
 
-        for w in words:
-            # слово + пробел
-            token = (w + " ") if w else " "
-            token_w = pdfmetrics.stringWidth(token, font_name, font_size)
-
-            if token_w <= (max_width_pt - cur_w):
-                cur += token
-                cur_w += token_w
-            else:
-                # если само слово шире строки — рубим жёстко на куски
-                if pdfmetrics.stringWidth(w, font_name, font_size) > max_width_pt:
-                    # сперва дописываем текущую строку, если в ней что-то есть
-                    if cur.strip():
-                        lines.append(cur.rstrip())
-                        cur, cur_w = "", 0.0
-                    chunks = split_hard(w, max_width_pt)
-                    for i, ch in enumerate(chunks):
-                        if i < len(chunks) - 1:
-                            lines.append(ch)
-                        else:
-                            cur = ch + " "
-                            cur_w = pdfmetrics.stringWidth(cur, font_name, font_size)
-                else:
-                    # перенос по словам
-                    if cur.strip():
-                        lines.append(cur.rstrip())
-                    cur = token
-                    cur_w = token_w
-
-        if cur.strip() or para == "":
-            lines.append(cur.rstrip())
-
-    # рисуем
-    # межстрочный шаг в мм исходя из font_size (pt)
-    line_h_mm = (font_size * line_spacing) / (72.0 / 25.4)
-    for ln in lines:
-        c.drawString(x_pt, y_pt, ln)
-        y_pt -= line_h_mm * MM_TO_PT
-
-    return y_pt / MM_TO_PT
+def _collect_openlike_sections():
+    """
+    Все данные для PDF-отчётов за 3 запроса (вместо 2 запросов на каждую задачу):
+    задачи open/in_progress + ник исполнителя, число переносов дедлайна, цепочки переназначений.
+    Возвращает [(name, tid, disp, [task_dict, ...]), ...] в порядке assignee, id.
+    Словари — простые (не sqlite3.Row), чтобы их можно было передать в процесс-воркер.
+    """
+    with get_conn() as c:
+        rows = c.execute("""
+            SELECT t.id, t.task, t.assignee, t.telegram_id, t.deadline,
+                   (SELECT a.telegram_nickname FROM assignees a
+                     WHERE a.telegram_id = t.telegram_id AND t.telegram_id <> ''
+                     LIMIT 1) AS nick
+              FROM tasks t
+             WHERE t.status IN ('open','in_progress')
+             ORDER BY t.assignee, t.id
+        """).fetchall()
+        postpones = {
+            r["task_id"]: r["n"] for r in c.execute("""
+                SELECT d.task_id, COUNT(*) AS n
+                  FROM deadline_changes d
+                  JOIN tasks t ON t.id = d.task_id
+                 WHERE t.status IN ('open','in_progress')
+                 GROUP BY d.task_id
+            """)
+        }
+        moves: dict[int, list[str]] = {}
+        for r in c.execute("""
+            SELECT r.task_id, r.old_assignee, r.new_assignee
+              FROM task_reassignments r
+              JOIN tasks t ON t.id = r.task_id
+             WHERE t.status IN ('open','in_progress')
+             ORDER BY r.task_id, r.at, r.id
+        """):
+            moves.setdefault(r["task_id"], []).append(f"{r['old_assignee']} → {r['new_assignee']}")
+
+    by_person: dict[tuple[str, str], dict] = {}
+    for r in rows:
+        key = ((r["assignee"] or "—"), (r["telegram_id"] or ""))
+        sec = by_person.get(key)
+        if sec is None:
+            nick = (r["nick"] or "").strip()
+            disp = key[0]
+            if nick:
+                disp += f" ({nick if nick.startswith('@') else '@' + nick})"
+            sec = by_person[key] = {"disp": disp, "tasks": []}
+        sec["tasks"].append({
+            "id": r["id"],
+            "task": r["task"],
+            "deadline": r["deadline"] or "—",
+            "postpones": postpones.get(r["id"], 0),
+            "moves": "; ".join(moves.get(r["id"], [])) or "—",
+        })
+    return [(name, tid, sec["disp"], sec["tasks"]) for (name, tid), sec in by_person.items()]
+
+def _pdf_draw_task(cpdf, t, x_left, y, font):
+    # все четыре блока карточки переносим одним вызовом, затем рисуем
+    header, dl, postpones, moves = get_wrapper(font, 10).wrap_section([
+        (f"• [ID {t['id']}] {t['task']}", 180 * MM_TO_PT),
+        (f"Дедлайн: {t['deadline']}", 175 * MM_TO_PT),
+        (f"Переносов дедлайна: {t['postpones']}", 175 * MM_TO_PT),
+        (f"Переназначения: {t['moves']}", 175 * MM_TO_PT),
+    ])
+    cpdf.setFont(font, 10)
+    y = _pdf_draw_lines(cpdf, header, x_left, y)
+    y = _pdf_draw_lines(cpdf, dl, x_left + 5, y)
+    y = _pdf_draw_lines(cpdf, postpones, x_left + 5, y)
+    y = _pdf_draw_lines(cpdf, moves, x_left + 5, y)
+    return y
 
 
-def build_combined_pdf_report(now=None) -> str | None:
+def build_combined_pdf_report(now=None):
     """
     Строит ОДИН общий PDF: секции по исполнителям (Имя (@ник)),
     внутри — список всех его open/in_progress задач.
-    Возвращает путь к PDF или None, если reportlab недоступен.
+    Возвращает пару (имя_файла, поток) или None, если reportlab недоступен.
+    Без записей в базу с прошлой сборки отдаётся из кэша отчётов.
     """
     if canvas is None:
         return None
 
-    from db import get_nickname_by_tid, get_reassignments_for_task  # локальный импорт
     now = now or datetime.now(TZINFO)
+    fname = f"tasks_all_{now.strftime('%Y%m%d_%H%M')}.pdf"
+    return cached_report("combined_pdf", None, fname, _render_combined_pdf)
 
-    # 1) Все задачи в работе
-    with get_conn() as c:
-        rows = c.execute("""
-            SELECT * FROM tasks
-            WHERE status IN ('open','in_progress')
-            ORDER BY assignee, id
-        """).fetchall()
 
-    # 2) Группируем по исполнителю
-    by_person: dict[tuple[str, str], list] = {}
-    for r in rows:
-        key = ((r["assignee"] or "—"), (r["telegram_id"] or ""))
-        by_person.setdefault(key, []).append(r)
+def _render_combined_pdf():
+    # 1-2) Все задачи в работе, сгруппированные по исполнителю
+    sections = _collect_openlike_sections()
 
-    # 3) Имя файла
-    fname = f"tasks_all_{now.strftime('%Y%m%d_%H%M')}.pdf"
-    path = os.path.join(REPORT_DIR, fname)
+    # 3) Буфер
+    buf = new_report_buffer()
 
     # 4) PDF + шрифты
-    cpdf = canvas.Canvas(path, pagesize=A4)
+    cpdf = canvas.Canvas(buf, pagesize=A4)
     width, height = A4
     x_left = 15  # мм
     y = (height / mm) - 20
@@ -530,7 +658,7 @@ def build_combined_pdf_report(now=None) -> str | None:
     cpdf.setFont(font, 10)
 
     # 5) По исполнителям
-    for (name, tid), tasks in by_person.items():
+    for name, tid, disp, tasks in sections:
         # новая страница для шапки секции при нехватке места
         if y < 30:
             cpdf.showPage()
@@ -538,11 +666,6 @@ def build_combined_pdf_report(now=None) -> str | None:
             cpdf.setFont(font, 10)
 
         # Шапка секции: Имя (@ник)
-        nick = get_nickname_by_tid(tid)
-        disp = (name or "—")
-        if nick:
-            disp += f" ({nick if nick.startswith('@') else '@' + nick})"
-
         cpdf.setFont(font_b, 12)
         cpdf.drawString(x_left * mm, y * mm, disp)
         y -= 7
@@ -560,106 +683,88 @@ def build_combined_pdf_report(now=None) -> str | None:
                 y = (height / mm) - 20
                 cpdf.setFont(font, 10)
 
-            header = f"• [ID {t['id']}] {t['task']}"
-            y = _pdf_draw_wrapped(cpdf, header, x_left, y, max_width_mm=180, font_name=font, font_size=10, line_spacing=1.3)
+            y = _pdf_draw_task(cpdf, t, x_left, y, font)
+            y -= 3  # межстрочный отступ между задачами
 
+        y -= 4  # отступ между секциями
 
-            dl = (t["deadline"] or "—")
-            y = _pdf_draw_wrapped(cpdf, f"Дедлайн: {dl}", x_left + 5, y, max_width_mm=175, font_name=font, font_size=10, line_spacing=1.3)
+    cpdf.save()
+    buf.seek(0)
+    return buf
 
-            dchs = get_deadline_changes_for_task(t["id"])
-            y = _pdf_draw_wrapped(cpdf, f"Переносов дедлайна: {len(dchs)}", x_left + 5, y, max_width_mm=175, font_name=font, font_size=10, line_spacing=1.3)
 
+def _render_personal_pdf(disp: str, tasks: list[dict], out):
+    """Рисует персональный PDF одного исполнителя в поток out."""
+    cpdf = canvas.Canvas(out, pagesize=A4)
+    reg, reg_b = _ensure_pdf_font()
+    font = reg or "Helvetica"
+    font_b = reg_b or "Helvetica-Bold"
 
-            reas = get_reassignments_for_task(t["id"])
-            moves = "; ".join([f"{x['old_assignee']} → {x['new_assignee']}" for x in reas]) if reas else "—"
-            y = _pdf_draw_wrapped(cpdf, f"Переназначения: {moves}", x_left + 5, y, max_width_mm=175, font_name=font, font_size=10, line_spacing=1.3)
+    width, height = A4
+    x_left = 15
+    y = (height / mm) - 20
 
+    cpdf.setFont(font_b, 16)
+    cpdf.drawString(x_left * mm, y * mm, disp)
+    y -= 10
+    cpdf.setFont(font, 10)
 
-            y -= 3  # межстрочный отступ между задачами
+    for t in tasks:
+        if y < 20:
+            cpdf.showPage()
+            y = (height / mm) - 20
+            cpdf.setFont(font, 10)
 
-        y -= 4  # отступ между секциями
+        y = _pdf_draw_task(cpdf, t, x_left, y, font)
+        y -= 3
 
     cpdf.save()
-    return path
 
+def _pdf_worker_init():
+    # шрифт регистрируем один раз на процесс-воркер, а не на каждый документ
+    _ensure_pdf_font()
 
-def build_personal_pdf_reports(now=None) -> list[tuple[str, str]]:
+def _render_personal_pdf_job(job) -> bytes:
+    disp, tasks = job
+    out = io.BytesIO()
+    _render_personal_pdf(disp, tasks, out)
+    return out.getvalue()
+
+def build_personal_pdf_reports(now=None, *, workers: int | None = None) -> list[tuple[str, tuple]]:
     """
-    Возвращает список (display_name, pdf_path) для всех исполнителей, у которых есть задачи open/in_progress.
+    Возвращает список (display_name, (имя_файла, поток)) для всех исполнителей,
+    у которых есть задачи open/in_progress. Потоки закрывает вызывающий.
+    workers > 1 — рендерим документы параллельно в пуле процессов
+    (по умолчанию PDF_RENDER_WORKERS из конфига; 0/1 — последовательно).
     """
     if canvas is None:
         return []
 
-    from db import get_nickname_by_tid, get_reassignments_for_task
     now = now or datetime.now(TZINFO)
+    workers = PDF_RENDER_WORKERS if workers is None else workers
 
-    with get_conn() as c:
-        rows = c.execute("""
-            SELECT * FROM tasks
-            WHERE status IN ('open','in_progress')
-            ORDER BY assignee, id
-        """).fetchall()
-
-    by_person = {}
-    for r in rows:
-        key = (r["assignee"] or "—", r["telegram_id"] or "")
-        by_person.setdefault(key, []).append(r)
+    sections = [s for s in _collect_openlike_sections() if s[3]]
+    stamp = now.strftime('%Y%m%d_%H%M')
 
     out = []
-    for (name, tid), tasks in by_person.items():
-        if not tasks:
-            continue
-
-        nick = get_nickname_by_tid(tid)
-        disp = name or "—"
-        if nick:
-            disp += f" ({nick if nick.startswith('@') else '@'+nick})"
-
-        filename = f"tasks_{(name or 'no_name').replace(' ', '_')}_{now.strftime('%Y%m%d_%H%M')}.pdf"
-        path = os.path.join(REPORT_DIR, filename)
-
-        cpdf = canvas.Canvas(path, pagesize=A4)
-        reg, reg_b = _ensure_pdf_font()
-        font = reg or "Helvetica"
-        font_b = reg_b or "Helvetica-Bold"
-
-        width, height = A4
-        x_left = 15
-        y = (height / mm) - 20
-
-        cpdf.setFont(font_b, 16)
-        cpdf.drawString(x_left * mm, y * mm, disp)
-        y -= 10
-        cpdf.setFont(font, 10)
-
-        for t in tasks:
-            if y < 20:
-                cpdf.showPage()
-                y = (height / mm) - 20
-                cpdf.setFont(font, 10)
-
-            header = f"• [ID {t['id']}] {t['task']}"
-            y = _pdf_draw_wrapped(cpdf, header, x_left, y, max_width_mm=180, font_name=font, font_size=10, line_spacing=1.3)
-
-
-            dl = (t["deadline"] or "—")
-            y = _pdf_draw_wrapped(cpdf, f"Дедлайн: {dl}", x_left + 5, y, max_width_mm=175, font_name=font, font_size=10, line_spacing=1.3)
-
-
-            dchs = get_deadline_changes_for_task(t["id"])
-            y = _pdf_draw_wrapped(cpdf, f"Переносов дедлайна: {len(dchs)}", x_left + 5, y, max_width_mm=175, font_name=font, font_size=10, line_spacing=1.3)
-
-
-            reas = get_reassignments_for_task(t["id"])
-            moves = "; ".join([f"{x['old_assignee']} → {x['new_assignee']}" for x in reas]) if reas else "—"
-            y = _pdf_draw_wrapped(cpdf, f"Переназначения: {moves}", x_left + 5, y, max_width_mm=175, font_name=font, font_size=10, line_spacing=1.3)
-
-
-            y -= 3
+    if workers and workers > 1 and len(sections) > 1:
+        jobs = [(disp, tasks) for _, _, disp, tasks in sections]
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_pdf_worker_init) as pool:
+            rendered = list(pool.map(_render_personal_pdf_job, jobs))
+        for (name, _, disp, _), data in zip(sections, rendered):
+            filename = f"tasks_{(name or 'no_name').replace(' ', '_')}_{stamp}.pdf"
+            buf = new_report_buffer()
+            buf.write(data)
+            buf.seek(0)
+            out.append((disp, (filename, buf)))
+        return out
 
-        cpdf.save()
-        out.append((disp, path))
+    for name, _, disp, tasks in sections:
+        filename = f"tasks_{(name or 'no_name').replace(' ', '_')}_{stamp}.pdf"
+        buf = new_report_buffer()
+        _render_personal_pdf(disp, tasks, buf)
+        buf.seek(0)
+        out.append((disp, (filename, buf)))
 
     return out
 
@@ -713,7 +818,8 @@ def jobs_tick():
 
     # 0) Если рабочее окно — выгружаем дозревшее из outbox
     if is_work_time(now):
-        due = pop_due_outbox(datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+        # claim, а не просто выборка: тот же outbox параллельно разгребает отправитель api_worker
+        due = claim_due_outbox(datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
         for row in due:
             try:
                 markup = json.loads(row["markup"]) if row["markup"] else None
@@ -827,6 +933,14 @@ def jobs_tick():
             except Exception as e:
                 print(f"[scheduler.user_digest] ERROR send to {chat}: {e}")
 
+    # 4) Журнал изменений для GET /changes — хвост старше CHANGE_LOG_RETENTION_DAYS
+    try:
+        pruned = prune_change_log(CHANGE_LOG_RETENTION_DAYS)
+        if pruned:
+            print(f"[scheduler.change_log] pruned {pruned} rows")
+    except Exception as e:
+        print(f"[scheduler.change_log] ERROR prune: {e}")
+
 def build_admin_text_only(now=None) -> str:
     return build_admin_text(now)
 
@@ -836,10 +950,10 @@ def send_admin_report_now(now=None):
     """
     now = now or datetime.now(TZINFO)
     admin_text = build_admin_text(now)
-    report_path = build_excel_report_file(now)
+    report_name, report_buf = build_excel_report_file(now)
 
     recipients = [str(VADIM_CHAT_ID), *map(str, ASSISTANT_CHAT_IDS)]
-    seen = set()
+    seen = []
     for idx, cid in enumerate(recipients, 1):
         if cid in seen or not cid.strip():
             continue
@@ -848,11 +962,15 @@ def send_admin_report_now(now=None):
             send(cid, admin_text, base_delay_s=(0.0 if idx == 1 else ASSISTANT_DELAY_S))
         except Exception as e:
             print(f"[scheduler.force] ERROR text to {cid}: {e}")
-        try:
-            send_document(cid, report_path, caption="📎 Прикреплён файл отчёта.", base_delay_s=0.2)
-        except Exception as e:
-            print(f"[scheduler.force] ERROR doc to {cid}: {e}")
-        seen.add(cid)
+        seen.append(cid)
+
+    # файл грузим один раз, остальным — по file_id
+    try:
+        broadcast_document(seen, (report_name, report_buf), caption="📎 Прикреплён файл отчёта.")
+    except Exception as e:
+        print(f"[scheduler.force] ERROR doc broadcast: {e}")
+    finally:
+        report_buf.close()
 
 def main():
     # простой «ежечасный» цикл
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Разбор расшифровки встречи на поручения.
+
+Конвейер потоковый: строки читаются из источника (тело HTTP-запроса, файл) по одной,
+режутся на перекрывающиеся фрагменты ограниченного размера в токенах, фрагменты сразу
+уходят в LLM параллельно (в полёте не больше 2 × workers — вся расшифровка в памяти
+не лежит), ответы склеиваются и чистятся от дублей на стыках фрагментов.
+"""
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from llm import llm_extract_tasks
+
+# без токенизатора: русский текст в BPE-моделях ≈ 2.5–3.5 символа на токен, берём с запасом
+CHARS_PER_TOKEN = 3.0
+MAX_CHUNKS = 200                # предохранитель по стоимости: дальше расшифровку не читаем
+DEDUPE_JACCARD = 0.7            # порог похожести описаний для склейки дублей
+
+_SENT_SPLIT_RE = re.compile(r"(?<=[.!?…])\s+")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def approx_tokens(s: str) -> int:
+    return int(len(s) / CHARS_PER_TOKEN) + 1
+
+
+def _pieces(lines, max_tokens: int):
+    """Строки → куски не длиннее max_tokens: длинную реплику режем по предложениям, потом по словам."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if approx_tokens(line) <= max_tokens:
+            yield line
+            continue
+        for sent in _SENT_SPLIT_RE.split(line):
+            if approx_tokens(sent) <= max_tokens:
+                yield sent
+                continue
+            cur = []
+            for w in sent.split():
+                if cur and approx_tokens(" ".join(cur + [w])) > max_tokens:
+                    yield " ".join(cur)
+                    cur = []
+                cur.append(w)
+            if cur:
+                yield " ".join(cur)
+
+
+def iter_chunks(lines, max_tokens: int = 1500, overlap_tokens: int = 150):
+    """
+    Генератор фрагментов ≤ max_tokens (оценка approx_tokens). Соседние фрагменты делят
+    хвост ≈ overlap_tokens целыми репликами — поручение на стыке попадёт целиком хотя бы в один.
+    """
+    buf, size, fresh = deque(), 0, False
+    for piece in _pieces(lines, max_tokens):
+        t = approx_tokens(piece)
+        if fresh and size + t > max_tokens:
+            yield "\n".join(buf)
+            tail, tail_size = deque(), 0
+            for p in reversed(buf):
+                pt = approx_tokens(p)
+                if tail_size + pt > overlap_tokens:
+                    break
+                tail.appendleft(p)
+                tail_size += pt
+            buf, size, fresh = tail, tail_size, False
+        while buf and size + t > max_tokens:  # перекрытие + длинный кусок не влезают — жертвуем перекрытием
+            size -= approx_tokens(buf.popleft())
+        buf.append(piece)
+        size += t
+        fresh = True
+    if fresh:
+        yield "\n".join(buf)
+
+
+def _words(s: str) -> set[str]:
+    # короткие служебные слова отбрасываем, числа (номера юнитов, суммы) — никогда
+    return {w for w in _WORD_RE.findall((s or "").lower()) if len(w) > 2 or w.isdigit()}
+
+
+def _same_task(a: dict, b: dict) -> bool:
+    if a["assignee"] and b["assignee"] and a["assignee"] != b["assignee"]:
+        return False
+    wa, wb = a["_words"], b["_words"]
+    if not wa or not wb:
+        return a["task"].lower() == b["task"].lower()
+    return len(wa & wb) / len(wa | wb) >= DEDUPE_JACCARD
+
+
+def merge_tasks(per_chunk: list[list[dict]]) -> list[dict]:
+    """
+    Склейка ответов по фрагментам (в порядке фрагментов) с дедупликацией: похожие описания
+    (Jaccard по словам) у совместимых исполнителей — одна задача; берём описание с большей
+    уверенностью и дополняем пустые поля из дубля.
+    """
+    kept: list[dict] = []
+    for chunk_no, tasks in enumerate(per_chunk, 1):
+        for raw in tasks:
+            # ответ LLM: один кривой элемент (не объект, без описания-строки) не должен ронять всю расшифровку
+            if not isinstance(raw, dict) or not isinstance(raw.get("description"), str) or not raw["description"].strip():
+                continue
+            try:
+                confidence = float(raw.get("confidence") or 0.0)
+            except (TypeError, ValueError):
+                confidence = 0.0
+            t = {
+                "task": raw["description"].strip(),
+                "assignee": str(raw.get("assignee") or "").strip(),
+                "deadline": str(raw.get("deadline") or "").strip(),
+                "priority": "high" if str(raw.get("priority") or "").lower() == "high" else "normal",
+                "confidence": confidence,
+                "chunk": chunk_no,
+            }
+            t["_words"] = _words(t["task"])
+            dup = next((k for k in kept if _same_task(k, t)), None)
+            if dup is None:
+                kept.append(t)
+                continue
+            if t["confidence"] > dup["confidence"]:
+                dup["task"], dup["_words"], dup["confidence"] = t["task"], t["_words"], t["confidence"]
+            dup["assignee"] = dup["assignee"] or t["assignee"]
+            dup["deadline"] = dup["deadline"] or t["deadline"]
+            if t["priority"] == "high":
+                dup["priority"] = "high"
+    for k in kept:
+        k.pop("_words", None)
+    return kept
+
+
+def extract_transcript_tasks(lines, assignee_names, *, meeting=None, meeting_date=None,
+                             workers: int = 4, max_tokens: int = 1500, overlap_tokens: int = 150,
+                             extract=llm_extract_tasks):
+    """
+    Весь конвейер: строки → фрагменты → параллельный LLM → склейка.
+    Возвращает (tasks, stats); stats — число фрагментов и время стадий в мс:
+      read_chunk_ms — чтение источника + нарезка (в сумме, идёт параллельно с LLM),
+      llm_wall_ms   — от первого запроса к LLM до последнего ответа,
+      llm_sum_ms / llm_max_ms — суммарное и худшее время одного фрагмента,
+      merge_ms      — склейка и дедупликация.
+    """
+    workers = max(1, int(workers))
+    results: dict[int, list[dict]] = {}
+    llm_times: list[float] = []
+
+    def run(chunk_text, chunk_no):
+        t0 = time.perf_counter()
+        try:
+            return chunk_no, extract(chunk_text, assignee_names, meeting, meeting_date, chunk_no)
+        finally:
+            llm_times.append(time.perf_counter() - t0)
+
+    def collect(done):
+        for fut in done:
+            chunk_no, tasks = fut.result()
+            results[chunk_no] = tasks
+
+    read_s, n, truncated = 0.0, 0, False
+    t_llm0 = None
+    chunks = iter_chunks(lines, max_tokens, overlap_tokens)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcript-llm") as pool:
+        pending = set()
+        while True:
+            t0 = time.perf_counter()
+            chunk = next(chunks, None)
+            read_s += time.perf_counter() - t0
+            if chunk is None:
+                break
+            if n >= MAX_CHUNKS:
+                truncated = True
+                break
+            n += 1
+            if t_llm0 is None:
+                t_llm0 = time.perf_counter()
+            pending.add(pool.submit(run, chunk, n))
+            if len(pending) >= 2 * workers:  # обратное давление: не читаем дальше, пока LLM не разгребёт
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        done, _ = wait(pending)
+        collect(done)
+    llm_wall = (time.perf_counter() - t_llm0) if t_llm0 is not None else 0.0
+
+    t0 = time.perf_counter()
+    tasks = merge_tasks([results.get(i, []) for i in range(1, n + 1)])
+    merge_s = time.perf_counter() - t0
+
+    stats = {
+        "chunks": n,
+        "truncated": truncated,
+        "raw_tasks": sum(len(v) for v in results.values()),
+        "timings_ms": {
+            "read_chunk_ms": round(read_s * 1e3, 1),
+            "llm_wall_ms": round(llm_wall * 1e3, 1),
+            "llm_sum_ms": round(sum(llm_times) * 1e3, 1),
+            "llm_max_ms": round(max(llm_times, default=0.0) * 1e3, 1),
+            "merge_ms": round(merge_s * 1e3, 1),
+        },
+    }
+    return tasks, stats
@@ -1,19 +1,33 @@
 # -*- coding: utf-8 -*-
-import os, tempfile, requests, logging
+import os, time, asyncio, tempfile, requests, logging
+
+from db import get_voice_transcripts, save_voice_transcript
+from ogg_pages import split_opus
 
 # берём спец. переменные для Whisper, а если их нет — падаем на OpenAI по умолчанию
 WHISPER_BASE_URL = os.environ.get("WHISPER_BASE_URL", "https://api.openai.com/v1").rstrip("/")
 WHISPER_API_KEY  = os.environ.get("WHISPER_API_KEY") or os.environ.get("OPENAI_API_KEY")
 WHISPER_MODEL    = os.environ.get("WHISPER_MODEL", "whisper-1")
+# сколько голосовых расшифровываем одновременно (скачивание + запрос к Whisper)
+VOICE_TRANSCRIBE_CONCURRENCY = int(os.environ.get("VOICE_TRANSCRIBE_CONCURRENCY", "4"))
+# голосовые короче — не расшифровываем (случайные нажатия, «ага»)
+VOICE_MIN_DURATION_S = int(os.environ.get("VOICE_MIN_DURATION_S", "2"))
+# до такого размера аудио держим в памяти, крупнее — SpooledTemporaryFile сам уходит на диск
+VOICE_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+# длинное Ogg/Opus-аудио (записи встреч) режем на куски по столько секунд и шлём в Whisper
+# параллельно — одним файлом оно упирается в таймаут 120 с
+VOICE_SEGMENT_S = int(os.environ.get("VOICE_SEGMENT_S", "300"))
+VOICE_SEGMENT_WORKERS = 3
 
 logger = logging.getLogger("bot.voice")
 
-def _openai_transcribe(path: str) -> str:
+def _openai_transcribe(audio, filename: str = "voice.oga") -> str:
+    """audio — открытый бинарный поток (позиция 0); requests читает его прямо в multipart."""
     url = f"{WHISPER_BASE_URL}/audio/transcriptions"
     headers = {"Authorization": f"Bearer {WHISPER_API_KEY}"} if WHISPER_API_KEY else {}
     files = {
         # Явно укажем MIME — .oga это ogg/opus
-        "file": (os.path.basename(path), open(path, "rb"), "audio/ogg"),
+        "file": (filename, audio, "audio/ogg"),
         "model": (None, WHISPER_MODEL),
         "response_format": (None, "text"),
     }
@@ -29,17 +43,109 @@ def _openai_transcribe(path: str) -> str:
         logger.exception("Whisper transcription failed")
         return ""
 
-async def transcribe_telegram_file(bot, file_id: str) -> str:
-    """Скачиваем файл от Telegram во временную папку → Whisper → текст. Файл удаляем."""
-    tf = tempfile.NamedTemporaryFile(prefix="vt_", delete=False)
-    tf.close()
+def _new_spool():
+    return tempfile.SpooledTemporaryFile(max_size=VOICE_SPOOL_MAX_BYTES)
+
+async def _transcribe_segments(segments, filename: str) -> tuple[str, bool]:
+    """Куски параллельно (≤ VOICE_SEGMENT_WORKERS) и склейка по порядку; упавший кусок — «[…]»."""
+    sem = asyncio.Semaphore(VOICE_SEGMENT_WORKERS)
+
+    async def one(seg):
+        async with sem:
+            return await asyncio.to_thread(_openai_transcribe, seg, filename)
+
     try:
-        f = await bot.get_file(file_id)
-        await f.download_to_drive(custom_path=tf.name)
-        text = _openai_transcribe(tf.name)
-        return text
+        texts = await asyncio.gather(*(one(seg) for seg in segments))
     finally:
-        try:
-            os.unlink(tf.name)
-        except Exception:
-            pass
+        for seg in segments:
+            seg.close()
+    failed = [i for i, t in enumerate(texts, 1) if not t]
+    if failed:
+        logger.warning("Whisper: %d/%d segments failed: %s", len(failed), len(texts), failed)
+    if len(failed) == len(texts):
+        return "", False
+    return " ".join(t or "[…]" for t in texts), not failed
+
+async def transcribe_telegram_file(bot, file_id: str, duration=None) -> tuple[str, bool]:
+    """
+    Скачиваем файл от Telegram в память (крупный — в спул на диске) → Whisper → (текст, полный).
+    Ogg/Opus длиннее VOICE_SEGMENT_S режем по страницам контейнера (ogg_pages) и расшифровываем
+    кусками; если часть кусков не удалась — отдаём остальное, полный=False.
+    """
+    f = await bot.get_file(file_id)
+    filename = os.path.basename(f.file_path or "") or "voice.oga"
+    with _new_spool() as buf:
+        await f.download_to_memory(buf)
+        buf.seek(0)
+        if duration and duration > VOICE_SEGMENT_S:
+            segments = await asyncio.to_thread(split_opus, buf, VOICE_SEGMENT_S, _new_spool)
+            buf.seek(0)
+            if segments and len(segments) > 1:
+                logger.info("Whisper: %ss audio → %d segments", duration, len(segments))
+                return await _transcribe_segments(segments, filename)
+            for seg in segments or ():
+                seg.close()
+        # requests.post синхронный (до 120 с) — уводим в поток, чтобы не стоял event loop бота
+        text = await asyncio.to_thread(_openai_transcribe, buf, filename)
+        return text, bool(text)
+
+async def _transcribe_and_store(bot, file_id: str, file_unique_id: str, duration) -> str:
+    try:
+        text, complete = await transcribe_telegram_file(bot, file_id, duration)
+    except Exception:
+        logger.exception("Voice transcription failed: %s", file_id)
+        text, complete = "", False
+    # пустой или частичный результат (ошибка Whisper) не кэшируем — в следующий раз попробуем снова
+    if text and complete and file_unique_id:
+        await asyncio.to_thread(save_voice_transcript, file_unique_id, text, duration)
+    return text
+
+async def transcribe_voice(bot, file_id: str, file_unique_id: str = "", duration=None) -> tuple[str, bool]:
+    """Одно голосовое через кэш voice_transcripts: (текст, взят_из_кэша)."""
+    if file_unique_id:
+        hit = (await asyncio.to_thread(get_voice_transcripts, [file_unique_id])).get(file_unique_id)
+        if hit is not None:
+            return hit, True
+    return await _transcribe_and_store(bot, file_id, file_unique_id, duration), False
+
+async def transcribe_voice_batch(bot, items, *, concurrency: int = VOICE_TRANSCRIBE_CONCURRENCY):
+    """
+    items: [(file_id, file_unique_id, duration_s)] → (тексты в том же порядке, метрики).
+    Сначала кэш voice_transcripts по file_unique_id (пересланное/повторное аудио не расшифровываем
+    второй раз), одинаковые файлы внутри пачки — одна расшифровка, остальное — не больше
+    concurrency одновременно.
+    """
+    t0 = time.perf_counter()
+    keys = [(fuid or fid) for fid, fuid, _ in items]
+    cached = await asyncio.to_thread(get_voice_transcripts, [fuid for _, fuid, _ in items if fuid])
+    sem = asyncio.Semaphore(max(1, concurrency))
+    busy_s = 0.0
+
+    async def one(file_id, file_unique_id, duration):
+        nonlocal busy_s
+        async with sem:
+            t = time.perf_counter()
+            text = await _transcribe_and_store(bot, file_id, file_unique_id, duration)
+            busy_s += time.perf_counter() - t
+        return text
+
+    todo = {}  # key → (file_id, file_unique_id, duration), первый из дублей
+    for key, (fid, fuid, dur) in zip(keys, items):
+        if key not in cached and key not in todo:
+            todo[key] = (fid, fuid, dur)
+    done = dict(zip(todo, await asyncio.gather(*(one(*args) for args in todo.values())))) if todo else {}
+
+    texts = [cached[k] if k in cached else done.get(k, "") for k in keys]
+    wall_s = time.perf_counter() - t0
+    audio_s = sum(int(d or 0) for k, (_, _, d) in todo.items())
+    stats = {
+        "files": len(items),
+        "cached": sum(1 for k in keys if k in cached),
+        "transcribed": sum(1 for t in done.values() if t),
+        "failed": sum(1 for t in done.values() if not t),
+        "audio_s": audio_s,
+        "wall_s": round(wall_s, 2),
+        "whisper_busy_s": round(busy_s, 2),
+        "audio_s_per_wall_s": round(audio_s / wall_s, 1) if wall_s > 0 else 0.0,
+    }
+    return texts, stats